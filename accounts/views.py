@@ -28,31 +28,9 @@ class UserCreationForm(BaseUserCreationForm):
 @csrf_protect
 @require_http_methods(["GET", "POST"])
 def register(request):
-    """Register view with language-aware slug handling"""
-    from django.utils import translation
-    
-    lang = translation.get_language()
-    current_path = request.path
-    
-    # If on English and accessing Serbian slug, redirect to English slug
-    if lang == 'en' and request.resolver_match.url_name == 'register':
-        from django.urls import reverse
-        register_url = reverse('accounts-english:register_en')
-        return redirect(register_url)
-    # If on Serbian (Latin/Cyrillic) and accessing English slug, redirect to Serbian slug
-    elif lang in ('sr-latn', 'sr-cyrl') and request.resolver_match.url_name == 'register_en':
-        from django.urls import reverse
-        register_url = reverse('accounts-serbian:register')
-        return redirect(register_url)
-    
+    """Register view"""
     if request.user.is_authenticated:
-        # Redirect to correct account URL based on language using proper namespace
-        from django.urls import reverse
-        lang = translation.get_language()
-        namespace = 'accounts-english' if lang == 'en' else 'accounts-serbian'
-        url_name = 'account_en' if lang == 'en' else 'account'
-        account_url = reverse(f'{namespace}:{url_name}')
-        return redirect(account_url)
+        return redirect('accounts:account')
     
     if request.method == 'POST':
         form = UserCreationForm(request.POST)
@@ -70,13 +48,7 @@ def register(request):
             if user:
                 login(request, user)
                 messages.success(request, _('Uspešno ste se registrovali.'))
-                # Redirect to correct account URL based on language using proper namespace
-                from django.urls import reverse
-                lang = translation.get_language()
-                namespace = 'accounts-english' if lang == 'en' else 'accounts-serbian'
-                url_name = 'account_en' if lang == 'en' else 'account'
-                account_url = reverse(f'{namespace}:{url_name}')
-                return redirect(account_url)
+                return redirect('accounts:account')
         else:
             for field, errors in form.errors.items():
                 for error in errors:
@@ -90,30 +62,9 @@ def register(request):
 @csrf_protect
 @require_http_methods(["GET", "POST"])
 def login_view(request):
-    """Login view with language-aware slug handling"""
-    from django.utils import translation
-    
-    lang = translation.get_language()
-    current_path = request.path
-    
-    # If on English and accessing Serbian slug, redirect to English slug
-    if lang == 'en' and request.resolver_match.url_name == 'login':
-        from django.urls import reverse
-        login_url = reverse('accounts-english:login_en')
-        return redirect(login_url)
-    # If on Serbian (Latin/Cyrillic) and accessing English slug, redirect to Serbian slug
-    elif lang in ('sr-latn', 'sr-cyrl') and request.resolver_match.url_name == 'login_en':
-        from django.urls import reverse
-        login_url = reverse('accounts-serbian:login')
-        return redirect(login_url)
-    
+    """Login view"""
     if request.user.is_authenticated:
-        # Redirect to correct account URL based on language using proper namespace
-        from django.urls import reverse
-        namespace = 'accounts-english' if lang == 'en' else 'accounts-serbian'
-        url_name = 'account_en' if lang == 'en' else 'account'
-        account_url = reverse(f'{namespace}:{url_name}')
-        return redirect(account_url)
+        return redirect('accounts:account')
     
     if request.method == 'POST':
         username = request.POST.get('username', '').strip()
@@ -129,12 +80,7 @@ def login_view(request):
                 next_url = request.GET.get('next')
                 if next_url:
                     return redirect(next_url)
-                # Redirect to correct account URL based on language using proper namespace
-                from django.urls import reverse
-                namespace = 'accounts-english' if lang == 'en' else 'accounts-serbian'
-                url_name = 'account_en' if lang == 'en' else 'account'
-                account_url = reverse(f'{namespace}:{url_name}')
-                return redirect(account_url)
+                return redirect('accounts:account')
             else:
                 messages.error(request, _('Pogrešno korisničko ime ili lozinka. Molimo pokušajte ponovo.'))
     
@@ -143,22 +89,7 @@ def login_view(request):
 
 @require_http_methods(["GET", "POST"])
 def logout_view(request):
-    """Logout view with language-aware slug handling"""
-    from django.utils import translation
-    
-    lang = translation.get_language()
-    
-    # If on English and accessing Serbian slug, redirect to English slug
-    if lang == 'en' and request.resolver_match.url_name == 'logout':
-        from django.urls import reverse
-        logout_url = reverse('accounts-english:logout_en')
-        return redirect(logout_url)
-    # If on Serbian (Latin/Cyrillic) and accessing English slug, redirect to Serbian slug
-    elif lang in ('sr-latn', 'sr-cyrl') and request.resolver_match.url_name == 'logout_en':
-        from django.urls import reverse
-        logout_url = reverse('accounts-serbian:logout')
-        return redirect(logout_url)
-    
+    """Logout view"""
     if request.user.is_authenticated:
         logout(request)
         # Simple success message without link (link removed to avoid duplicate messages)
@@ -174,29 +105,9 @@ def logout_view(request):
 
 @require_http_methods(["GET"])
 def account(request):
-    """Account view with language-aware slug handling"""
-    from django.utils import translation
-    
-    lang = translation.get_language()
-    
-    # If on English and accessing Serbian slug, redirect to English slug
-    if lang == 'en' and request.resolver_match.url_name == 'account':
-        from django.urls import reverse
-        account_url = reverse('accounts-english:account_en')
-        return redirect(account_url)
-    # If on Serbian (Latin/Cyrillic) and accessing English slug, redirect to Serbian slug
-    elif lang in ('sr-latn', 'sr-cyrl') and request.resolver_match.url_name == 'account_en':
-        from django.urls import reverse
-        account_url = reverse('accounts-serbian:account')
-        return redirect(account_url)
-    
+    """Account view"""
     if not request.user.is_authenticated:
-        # Redirect to correct login URL based on language using proper namespace
-        from django.urls import reverse
-        namespace = 'accounts-english' if lang == 'en' else 'accounts-serbian'
-        url_name = 'login_en' if lang == 'en' else 'login'
-        login_url = reverse(f'{namespace}:{url_name}')
-        return redirect(login_url)
+        return redirect('accounts:login')
     
     context = {}
     return render(request, 'accounts/account.html', context)
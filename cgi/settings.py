@@ -73,9 +73,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StorageStatsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
+    'core.middleware.CanonicalPathMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -139,6 +141,46 @@ else:
     }
 
 
+# Cache
+# Production uses the database cache: the web service and the cgi-worker service
+# (run_jobs) both invalidate pages and the navigation, so they need one cache
+# they can both reach (a per-instance file or memory cache would only be purged
+# in the process that saved). The table is created by `createcachetable` in the
+# build commands (render.yaml). Development uses local memory and runs jobs
+# eagerly in the web process (JOBS_RUN_EAGERLY).
+if DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'cgi',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': os.environ.get('CACHE_TABLE', 'cgi_cache'),
+            'TIMEOUT': 60 * 60 * 24,
+            'OPTIONS': {
+                'MAX_ENTRIES': 5000,
+            },
+        }
+    }
+
+
+# Topics per page in category listings (keyset pagination, see topics.pagination)
+TOPICS_PAGE_SIZE = 24
+
+# Full-page cache for anonymous readers (see core.page_cache)
+# Pages are purged explicitly when content is saved, so the timeout can be long
+PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', str(not DEBUG)) == 'True'
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Part of every page ETag (see core.conditional) - changes on each deploy so
+# template changes invalidate browser copies
+PAGE_TEMPLATE_VERSION = os.environ.get('RENDER_GIT_COMMIT', '')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -228,6 +270,7 @@ AWS_SECRET_ACCESS_KEY = os.environ.get('R2_SECRET_ACCESS_KEY', '')
 AWS_STORAGE_BUCKET_NAME = os.environ.get('R2_BUCKET_NAME', '')
 AWS_S3_ENDPOINT_URL = os.environ.get('R2_ENDPOINT_URL', '')
 AWS_S3_CUSTOM_DOMAIN = os.environ.get('R2_CUSTOM_DOMAIN', '')
+# Content-addressed uploads get a one-year immutable Cache-Control instead (see core.storage)
 AWS_S3_OBJECT_PARAMETERS = {
     'CacheControl': 'max-age=86400',
 }
@@ -243,6 +286,11 @@ if not DEBUG and AWS_ACCESS_KEY_ID:
 # CKEditor WebP support is patched in apps.py ready() method
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
+# Uploaded files are streamed to a spooled temporary file (at most FILE_UPLOAD_SPOOL_SIZE in memory)
+# and hashed/sniffed on the way (core.upload_handlers); larger files than UPLOAD_MAX_FILE_SIZE are refused
+FILE_UPLOAD_HANDLERS = ['core.upload_handlers.StreamingUploadHandler']
+FILE_UPLOAD_SPOOL_SIZE = int(os.environ.get('FILE_UPLOAD_SPOOL_SIZE', str(1024 * 1024)))
+UPLOAD_MAX_FILE_SIZE = int(os.environ.get('UPLOAD_MAX_FILE_SIZE', str(25 * 1024 * 1024)))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -251,17 +299,57 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Use R2 for media files in production
 if not DEBUG and AWS_ACCESS_KEY_ID:
-    DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
+    DEFAULT_FILE_STORAGE = 'core.storage.MediaStorage'
     AWS_S3_FILE_OVERWRITE = False
     AWS_LOCATION = 'media'
     AWS_S3_REGION_NAME = 'auto'
     AWS_S3_SIGNATURE_VERSION = 's3v4'
 
+# Resized body images (core.image_resize): local disk cache of resized variants
+RESIZED_IMAGE_CACHE_DIR = os.environ.get('RESIZED_IMAGE_CACHE_DIR', '/tmp/cgi-resized')
+RESIZED_IMAGE_CACHE_MAX_BYTES = int(os.environ.get('RESIZED_IMAGE_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+
+# Background jobs (core.jobs): run in-process after commit instead of by the run_jobs worker
+JOBS_RUN_EAGERLY = os.environ.get('JOBS_RUN_EAGERLY', str(DEBUG)).lower() in ('true', '1', 'yes')
+
+# Parallel DeleteObjects requests when cleaning up media (core.batch_delete)
+STORAGE_DELETE_WORKERS = int(os.environ.get('STORAGE_DELETE_WORKERS', '4'))
+# R2 client of core.storage.MediaStorage: connection pool shared by all threads (at least
+# STORAGE_DELETE_WORKERS + the run_jobs concurrency), timeouts in seconds, attempts including retries
+STORAGE_MAX_POOL_CONNECTIONS = int(os.environ.get('STORAGE_MAX_POOL_CONNECTIONS', '20'))
+STORAGE_CONNECT_TIMEOUT = float(os.environ.get('STORAGE_CONNECT_TIMEOUT', '5'))
+STORAGE_READ_TIMEOUT = float(os.environ.get('STORAGE_READ_TIMEOUT', '15'))
+STORAGE_MAX_ATTEMPTS = int(os.environ.get('STORAGE_MAX_ATTEMPTS', '3'))
+# exists() answers are reused for this many seconds; slower calls are logged with their view
+STORAGE_EXISTS_CACHE_SECONDS = int(os.environ.get('STORAGE_EXISTS_CACHE_SECONDS', '15'))
+STORAGE_SLOW_CALL_SECONDS = float(os.environ.get('STORAGE_SLOW_CALL_SECONDS', '1.0'))
+# Media garbage collection (core.media_gc): tombstoned files are deleted after the grace period
+# unless used by then (covers editing sessions: sessions last SESSION_COOKIE_AGE), in batches
+MEDIA_GC_GRACE_SECONDS = int(os.environ.get('MEDIA_GC_GRACE_SECONDS', str(24 * 60 * 60)))
+MEDIA_GC_BATCH_SIZE = int(os.environ.get('MEDIA_GC_BATCH_SIZE', '1000'))
+# Circuit breaker (core.circuit_breaker): consecutive failures before storage calls fail fast,
+# and seconds before a probe call is let through
+STORAGE_BREAKER_FAILURES = int(os.environ.get('STORAGE_BREAKER_FAILURES', '5'))
+STORAGE_BREAKER_RESET_SECONDS = int(os.environ.get('STORAGE_BREAKER_RESET_SECONDS', '30'))
+
 # CKEditor Configuration
 CKEDITOR_UPLOAD_PATH = 'uploads/'
 CKEDITOR_UPLOAD_SLUGIFY_FILENAME = True
 CKEDITOR_ALLOW_NONIMAGE_FILES = False
+# Store uploads under a key derived from their content (dedup + immutable caching, see core.storage)
+CKEDITOR_CONTENT_ADDRESSED_UPLOADS = os.environ.get('CKEDITOR_CONTENT_ADDRESSED_UPLOADS', 'True') == 'True'
+# Upload optimization (core.image_optimizer): longest side in pixels, WebP quality,
+# and the decoded size above which images are optimized by the job worker
+CKEDITOR_IMAGE_MAX_DIMENSION = int(os.environ.get('CKEDITOR_IMAGE_MAX_DIMENSION', '2000'))
+CKEDITOR_IMAGE_WEBP_QUALITY = int(os.environ.get('CKEDITOR_IMAGE_WEBP_QUALITY', '80'))
+CKEDITOR_IMAGE_INLINE_MAX_PIXELS = int(os.environ.get('CKEDITOR_IMAGE_INLINE_MAX_PIXELS', '12000000'))
 CKEDITOR_RESTRICT_BY_USER = False
+# Direct-to-R2 uploads (core.direct_upload): size limit and lifetime of the presigned PUT URL
+# The bucket needs a CORS rule allowing PUT from the admin origin with the Content-Type and
+# Cache-Control request headers (AllowedMethods: PUT, AllowedHeaders: content-type, cache-control)
+CKEDITOR_DIRECT_UPLOADS = os.environ.get('CKEDITOR_DIRECT_UPLOADS', 'True') == 'True'
+CKEDITOR_DIRECT_UPLOAD_MAX_SIZE = int(os.environ.get('CKEDITOR_DIRECT_UPLOAD_MAX_SIZE', str(25 * 1024 * 1024)))
+CKEDITOR_DIRECT_UPLOAD_EXPIRES = int(os.environ.get('CKEDITOR_DIRECT_UPLOAD_EXPIRES', '300'))
 CKEDITOR_BROWSE_SHOW_DIRS = True
 CKEDITOR_CONFIGS = {
     'default': {
@@ -274,6 +362,9 @@ CKEDITOR_CONFIGS = {
         'filebrowserImageUploadUrl': '/ckeditor/upload/',
         'filebrowserImageBrowseUrl': '/ckeditor/browse/',
         'uploadUrl': '/ckeditor/upload/',
+        # Presigned uploads straight to R2, falling back to uploadUrl (static/js/ckeditor-direct-upload.js)
+        'directUploadUrl': '/ckeditor/direct-upload/',
+        'directUploadConfirmUrl': '/ckeditor/direct-upload/confirm/',
     },
 }
 
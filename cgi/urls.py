@@ -25,6 +25,8 @@ from django.conf.urls.i18n import i18n_patterns
 import cgi.admin
 # Import custom CKEditor views
 import core.ckeditor_views
+import core.views
+from core.translated_urls import translated_route
 
 # URLs that should not have language prefix
 urlpatterns = [
@@ -32,23 +34,23 @@ urlpatterns = [
     # Custom CKEditor upload view with tracking (must come before default ckeditor URLs)
     # This overrides the default upload view to track uploads
     path('ckeditor/upload/', core.ckeditor_views.TrackedImageUploadView.as_view(), name='ckeditor_upload'),
+    # Direct-to-R2 uploads (presigned PUT, see core.direct_upload)
+    path('ckeditor/direct-upload/', core.ckeditor_views.DirectUploadView.as_view(), name='ckeditor_direct_upload'),
+    path('ckeditor/direct-upload/confirm/', core.ckeditor_views.DirectUploadConfirmView.as_view(), name='ckeditor_direct_upload_confirm'),
     path('ckeditor/', include('ckeditor_uploader.urls')),
+    # Resized body images (signed URLs, see core.image_resize)
+    path('img/<int:width>/<str:fmt>/<str:signature>/<path:path>', core.views.resized_image, name='resized_image'),
     # Language switcher (set_language view)
     path('i18n/setlang/', include('django.conf.urls.i18n')),
 ]
 
 # URLs with language prefix
 # Serbian (Latin and Cyrillic) use Serbian slugs, English uses English slugs
-# Note: We include the same URLconfs twice with different paths for language-specific slugs
-# We use different instance namespaces to avoid namespace conflicts
+# Translated routes resolve only the segments of the active language (see core.translated_urls)
 urlpatterns += i18n_patterns(
     path('', include('core.urls')),
-    # Serbian slugs (for sr-latn and sr-cyrl)
-    path('teme/', include(('topics.urls', 'topics'), namespace='topics-serbian')),
-    path('korisnici/', include(('accounts.urls', 'accounts'), namespace='accounts-serbian')),
-    # English slugs
-    path('topics/', include(('topics.urls', 'topics'), namespace='topics-english')),
-    path('users/', include(('accounts.urls', 'accounts'), namespace='accounts-english')),
+    path(translated_route('teme/', 'topics/'), include('topics.urls')),
+    path(translated_route('korisnici/', 'users/'), include('accounts.urls')),
     prefix_default_language=True,
 )
 
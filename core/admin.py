@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.http import HttpResponse
 from django.utils.translation import gettext_lazy as _
 import csv
-from .models import UserEmail, CkeditorUpload
+from .models import UserEmail, MediaTombstone, UploadOptimization, Job, DeadJob
 
 
 @admin.register(UserEmail)
@@ -36,10 +36,67 @@ class UserEmailAdmin(admin.ModelAdmin):
     export_all_as_csv.short_description = _('Izvezi sve emailove u CSV')
 
 
-@admin.register(CkeditorUpload)
-class CkeditorUploadAdmin(admin.ModelAdmin):
-    list_display = ('file_path', 'uploaded_by', 'is_used', 'used_in_model', 'uploaded_at')
-    list_filter = ('is_used', 'used_in_model', 'uploaded_at')
+@admin.register(MediaTombstone)
+class MediaTombstoneAdmin(admin.ModelAdmin):
+    """Files waiting for the media garbage collector (read-only, see core.media_gc)"""
+    list_display = ('file_path', 'reason', 'created_at')
+    list_filter = ('reason', 'created_at')
     search_fields = ('file_path',)
-    readonly_fields = ('uploaded_at',)
-    date_hierarchy = 'uploaded_at'
+    date_hierarchy = 'created_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(UploadOptimization)
+class UploadOptimizationAdmin(admin.ModelAdmin):
+    """Bytes saved by optimizing uploads (read-only, see core.image_optimizer)"""
+    list_display = ('file_path', 'original_size', 'stored_size', 'saved_bytes', 'created_at')
+    search_fields = ('file_path',)
+    date_hierarchy = 'created_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+def retry_jobs(modeladmin, request, queryset):
+    """Queue the selected jobs again with a fresh set of attempts"""
+    from django.utils import timezone
+    updated = queryset.exclude(status=Job.RUNNING).update(
+        status=Job.PENDING, attempts=0, run_at=timezone.now(), leased_until=None, finished_at=None,
+    )
+    modeladmin.message_user(request, _('Ponovo pokrenuto poslova: %(count)d') % {'count': updated})
+retry_jobs.short_description = _('Pokreni ponovo izabrane poslove')
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_at', 'worker', 'created_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
+    readonly_fields = ('attempts', 'leased_until', 'worker', 'last_error', 'created_at', 'finished_at')
+    date_hierarchy = 'created_at'
+    actions = [retry_jobs]
+
+
+@admin.register(DeadJob)
+class DeadJobAdmin(admin.ModelAdmin):
+    """Dead-letter list: jobs that failed on every attempt"""
+    list_display = ('name', 'attempts', 'finished_at', 'created_at')
+    list_filter = ('name',)
+    search_fields = ('name',)
+    readonly_fields = ('name', 'payload', 'status', 'attempts', 'max_attempts', 'run_at',
+                       'leased_until', 'worker', 'last_error', 'created_at', 'finished_at')
+    actions = [retry_jobs]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(status=Job.DEAD)
+
+    def has_add_permission(self, request):
+        return False
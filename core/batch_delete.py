@@ -0,0 +1,146 @@
+"""
+Batched deletion of media files.
+
+On S3-compatible storage (R2 in production) keys are removed with
+DeleteObjects, up to 1000 keys per request, and batches are sent in parallel
+from a small thread pool. Deleting a missing key succeeds, so no exists()
+round trip is needed. Failures are reported per key. Other storages (local
+files in development) delete file by file.
+
+The S3 path only uses the storage's boto3 client, so it works against any
+S3 stand-in (MinIO, moto server) by pointing AWS_S3_ENDPOINT_URL at it.
+
+Cleanup code doesn't call this directly: removed files get tombstones, and
+the media garbage collector deletes them in batches (see core.media_gc).
+
+Requests go through the storage circuit breaker (core.circuit_breaker): while
+it is open delete_files() raises CircuitOpenError without calling the
+storage, and the sweep job is postponed.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.storage import default_storage
+from .circuit_breaker import CircuitOpenError, storage_breaker
+
+logger = logging.getLogger(__name__)
+
+# S3 DeleteObjects accepts at most 1000 keys per request
+MAX_KEYS_PER_REQUEST = 1000
+
+
+def _max_workers():
+    return getattr(settings, 'STORAGE_DELETE_WORKERS', 4)
+
+
+def is_s3_storage(storage):
+    try:
+        from storages.backends.s3boto3 import S3Boto3Storage
+    except ImportError:
+        return False
+    return isinstance(storage, S3Boto3Storage)
+
+
+def _delete_batch(client, bucket_name, keys_to_paths):
+    """
+    Send one DeleteObjects request.
+
+    Returns:
+        (deleted paths, {path: error message})
+    """
+    try:
+        response = storage_breaker.call(
+            client.delete_objects,
+            Bucket=bucket_name,
+            Delete={'Objects': [{'Key': key} for key in keys_to_paths], 'Quiet': True},
+        )
+    except CircuitOpenError:
+        raise  # The storage went down during this run - the caller postpones the rest
+    except Exception as e:
+        # The whole request failed - report every key of the batch
+        return set(), {path: str(e) for path in keys_to_paths.values()}
+
+    errors = {}
+    for error in response.get('Errors', []):
+        path = keys_to_paths.get(error.get('Key'), error.get('Key'))
+        errors[path] = f"{error.get('Code', 'Error')}: {error.get('Message', '')}".strip()
+    deleted = {path for path in keys_to_paths.values() if path not in errors}
+    return deleted, errors
+
+
+def _delete_s3(storage, paths, max_workers):
+    from storages.utils import clean_name
+
+    # Storage names (e.g. uploads/x.jpg) -> bucket keys (e.g. media/uploads/x.jpg)
+    keys_to_paths = {storage._normalize_name(clean_name(path)): path for path in paths}
+    keys = list(keys_to_paths)
+    batches = [
+        {key: keys_to_paths[key] for key in keys[start:start + MAX_KEYS_PER_REQUEST]}
+        for start in range(0, len(keys), MAX_KEYS_PER_REQUEST)
+    ]
+
+    # boto3 clients are thread-safe (resources are not), so all workers share one
+    client = storage.connection.meta.client
+    bucket_name = storage.bucket_name
+
+    if len(batches) == 1:
+        results = [_delete_batch(client, bucket_name, batches[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+            results = list(executor.map(lambda batch: _delete_batch(client, bucket_name, batch), batches))
+
+    deleted, errors = set(), {}
+    for batch_deleted, batch_errors in results:
+        deleted.update(batch_deleted)
+        errors.update(batch_errors)
+    return deleted, errors
+
+
+def _delete_one_by_one(storage, paths):
+    deleted, errors = set(), {}
+    for path in paths:
+        try:
+            storage_breaker.call(storage.delete, path)
+            deleted.add(path)
+        except CircuitOpenError:
+            raise  # Don't wait for the timeout of every remaining file
+        except Exception as e:
+            errors[path] = str(e)
+    return deleted, errors
+
+
+def delete_files(paths, storage=None, max_workers=None):
+    """
+    Delete many files from storage.
+
+    Args:
+        paths: Storage names of the files (relative to the media root)
+        storage: Storage to delete from (defaults to default_storage)
+        max_workers: Parallel DeleteObjects requests (defaults to STORAGE_DELETE_WORKERS)
+
+    Returns:
+        Dict with 'deleted' (set of paths) and 'errors' ({path: error message})
+
+    Raises:
+        CircuitOpenError: If the storage is down. Files may have been deleted
+            before it went down; deleting them again later is harmless.
+    """
+    storage = storage or default_storage
+    paths = {path.lstrip('/') for path in paths if path}
+    if not paths:
+        return {'deleted': set(), 'errors': {}}
+    storage_breaker.raise_if_open()
+
+    if is_s3_storage(storage):
+        deleted, errors = _delete_s3(storage, paths, max_workers or _max_workers())
+        if hasattr(storage, 'forget'):
+            # DeleteObjects bypasses the storage's exists() cache (see core.storage)
+            storage.forget(deleted)
+    else:
+        deleted, errors = _delete_one_by_one(storage, paths)
+
+    for path, error in errors.items():
+        logger.warning(f"Failed to delete {path}: {error}")
+    logger.info(f"Deleted {len(deleted)} files from storage ({len(errors)} failed)")
+    return {'deleted': deleted, 'errors': errors}
+
@@ -0,0 +1,183 @@
+"""
+Render-ready article HTML.
+
+Description HTML is stored as the editor produced it. render_body_html()
+turns it into the markup readers get, once at save time (see
+topics.translations), so topic pages output it without parsing anything:
+
+- loading="lazy" on every image but the first (which is usually in view)
+  and decoding="async" on all of them
+- width/height from the stored image, so the browser reserves the space
+  before the image arrives (no layout shift; the CSS keeps height: auto)
+- srcset/sizes of resized variants (see core.image_resize)
+
+Attributes the editor already set are kept. Intrinsic dimensions are read
+from the image header only (a ranged GET of the first bytes on R2) and
+cached, so re-rendering a topic doesn't download its images again.
+
+Topic.save renders with cached dimensions only (fetch=False), so saving
+never waits for R2; images whose dimensions aren't cached yet are rendered
+without them and the topics.render_topic_html job renders the topic again
+with the reads. Reads go through the storage circuit breaker (see
+core.circuit_breaker) and are skipped while it is open.
+
+The srcset URLs are signed with SECRET_KEY: after rotating the key, or
+changing RESIZED_IMAGE_WIDTHS, run the render_topic_html command.
+"""
+import hashlib
+import io
+import logging
+import re
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from PIL import Image
+from .image_resize import BODY_IMAGE_SIZES, IMG_TAG_PATTERN, SRC_PATTERN, body_srcset, upload_path
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS_KEY = 'core:image-dimensions:{}'
+DIMENSIONS_TIMEOUT = 60 * 60 * 24 * 30
+# Unreadable images are retried after an hour
+MISSING_TIMEOUT = 60 * 60
+
+# Enough for the headers of nearly every JPEG/PNG/WebP/GIF
+HEADER_BYTES = 64 * 1024
+
+# EXIF orientations that rotate the image by 90 degrees
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def _read(path, storage, length=None):
+    """Read the first `length` bytes of a stored file (all of it when None)"""
+    from .batch_delete import is_s3_storage
+
+    if length and is_s3_storage(storage):
+        from storages.utils import clean_name
+        response = storage.connection.meta.client.get_object(
+            Bucket=storage.bucket_name,
+            Key=storage._normalize_name(clean_name(path)),
+            Range=f'bytes=0-{length - 1}',
+        )
+        return response['Body'].read()
+    with storage.open(path, 'rb') as f:
+        return f.read(length) if length else f.read()
+
+
+def _dimensions_from(data):
+    """Displayed (width, height) from image bytes, or None if the header is incomplete"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+            orientation = image.getexif().get(0x0112)
+    except Exception:
+        return None
+    if orientation in ROTATED_ORIENTATIONS:
+        # Browsers apply the EXIF orientation
+        width, height = height, width
+    return width, height
+
+
+def read_dimensions(path, storage=None):
+    """
+    Intrinsic size of a stored image, reading only its header when possible.
+
+    Returns:
+        (width, height) or None if the file is missing or not an image
+
+    Raises:
+        CircuitOpenError: If the storage is down (nothing was read)
+    """
+    from .circuit_breaker import CircuitOpenError, storage_breaker
+
+    storage = storage or default_storage
+    try:
+        header = storage_breaker.call(_read, path, storage, HEADER_BYTES)
+        dimensions = _dimensions_from(header)
+        if dimensions is None and len(header) >= HEADER_BYTES:
+            # Header is past the first bytes (e.g. a large EXIF block)
+            dimensions = _dimensions_from(storage_breaker.call(_read, path, storage))
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        logger.warning(f"Failed to read dimensions of {path}: {str(e)}")
+        return None
+    return dimensions
+
+
+def _dimensions_key(path):
+    return DIMENSIONS_KEY.format(hashlib.md5(path.encode('utf-8')).hexdigest())
+
+
+def cached_dimensions(path):
+    """Dimensions from the cache: (width, height), () for an unreadable image, None if not cached"""
+    cached = cache.get(_dimensions_key(path))
+    return tuple(cached) if cached is not None else None
+
+
+def image_dimensions(path):
+    """Cached read_dimensions() (None while the storage is down, without caching that)"""
+    from .circuit_breaker import CircuitOpenError
+
+    cached = cached_dimensions(path)
+    if cached is not None:
+        return cached or None
+    try:
+        dimensions = read_dimensions(path)
+    except CircuitOpenError:
+        return None
+    cache.set(_dimensions_key(path), dimensions or (), DIMENSIONS_TIMEOUT if dimensions else MISSING_TIMEOUT)
+    return dimensions
+
+
+def _has_attribute(attrs, name):
+    return re.search(rf'\s{name}\s*=', attrs, re.IGNORECASE) is not None
+
+
+def render_body_html(html, sizes=BODY_IMAGE_SIZES, fetch=True, missing=None):
+    """
+    Add loading/decoding hints, intrinsic dimensions and srcset to the images of description HTML.
+
+    Args:
+        html: Description HTML as stored
+        sizes: sizes attribute for the srcset (how wide body images are rendered)
+        fetch: Read images whose dimensions aren't cached (False: render them without dimensions)
+        missing: Optional list receiving the paths rendered without dimensions because
+            they weren't cached (only with fetch=False)
+
+    Returns:
+        Render-ready HTML (the input unchanged when it has no images)
+    """
+    if not html or '<img' not in html.lower():
+        return html
+
+    position = 0
+
+    def replace(match):
+        nonlocal position
+        position += 1
+        attrs = match.group(1).rstrip()
+        extra = []
+
+        if position > 1 and not _has_attribute(attrs, 'loading'):
+            extra.append('loading="lazy"')
+        if not _has_attribute(attrs, 'decoding'):
+            extra.append('decoding="async"')
+
+        src = SRC_PATTERN.search(attrs)
+        path = upload_path(src.group(2)) if src else None
+        if path:
+            if not _has_attribute(attrs, 'width') and not _has_attribute(attrs, 'height'):
+                if fetch:
+                    dimensions = image_dimensions(path)
+                else:
+                    dimensions = cached_dimensions(path)
+                    if dimensions is None and missing is not None:
+                        missing.append(path)
+                if dimensions:
+                    extra.append(f'width="{dimensions[0]}" height="{dimensions[1]}"')
+            if not _has_attribute(attrs, 'srcset'):
+                extra.append(f'srcset="{body_srcset(path)}" sizes="{sizes}"')
+
+        return f'<img{attrs} {" ".join(extra)}>' if extra else f'<img{attrs}>'
+
+    return IMG_TAG_PATTERN.sub(replace, html)
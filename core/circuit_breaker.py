@@ -0,0 +1,137 @@
+"""
+Circuit breaker for media storage calls.
+
+When R2 is slow or unreachable every storage call waits for its timeout
+(and retries) before failing. Cleanup after an admin save may touch many
+files, so one outage would make each save wait that long per file.
+
+storage_breaker counts consecutive failed storage calls. After
+STORAGE_BREAKER_FAILURES of them it opens: calls fail immediately with
+CircuitOpenError instead of reaching the network. Deletions run in
+background jobs (see core.jobs, core.media_gc); a job that hits the open
+breaker is postponed until the breaker may close, without using up an
+attempt. After
+STORAGE_BREAKER_RESET_SECONDS one call is let through as a probe: success
+closes the breaker, failure opens it again.
+
+State is per process: each gunicorn worker and the job worker find out
+about an outage on their own, after a few failed calls.
+"""
+import logging
+import threading
+import time
+from django.conf import settings
+from .jobs import Postpone
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Postpone):
+    """Raised instead of calling the storage while the breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failures` consecutive failures -> half-open after
+    `reset_seconds` (one probe call) -> closed on success, open on failure.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, name, failures=None, reset_seconds=None):
+        self.name = name
+        self._failures_setting = failures
+        self._reset_setting = reset_seconds
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def max_failures(self):
+        return self._failures_setting or getattr(settings, 'STORAGE_BREAKER_FAILURES', 5)
+
+    @property
+    def reset_seconds(self):
+        return self._reset_setting or getattr(settings, 'STORAGE_BREAKER_RESET_SECONDS', 30)
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def retry_in(self):
+        """Seconds until the breaker lets a probe through (0 when calls are allowed)"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0
+            return max(self._opened_at + self.reset_seconds - time.monotonic(), 0)
+
+    def raise_if_open(self):
+        """
+        Raise CircuitOpenError while the breaker is open and the probe isn't due yet.
+        Unlike check() this doesn't take the half-open probe slot, so tasks use
+        it to be postponed up front and make their storage calls through call().
+        """
+        retry_in = self.retry_in()
+        if retry_in:
+            raise CircuitOpenError(f"{self.name} unavailable (circuit open)", delay=retry_in)
+
+    def check(self):
+        """
+        Raise CircuitOpenError unless a call may be made now.
+        In the half-open state only the first caller gets through (the probe),
+        and it must report the outcome with record_success() or record_failure()
+        (call() does both).
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.OPEN:
+                remaining = self._opened_at + self.reset_seconds - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpenError(f"{self.name} unavailable (circuit open)", delay=remaining)
+                self._state = self.HALF_OPEN
+                self._probing = False
+            if self._probing:
+                raise CircuitOpenError(f"{self.name} unavailable (probing)", delay=self.reset_seconds)
+            self._probing = True
+            logger.info(f"Circuit {self.name}: probing")
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit {self.name}: closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.max_failures:
+                if self._state != self.OPEN:
+                    logger.warning(
+                        f"Circuit {self.name}: open after {self._failures} failures, "
+                        f"retrying in {self.reset_seconds}s"
+                    )
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def call(self, func, *args, **kwargs):
+        """Call func through the breaker (CircuitOpenError while open)"""
+        self.check()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+
+storage_breaker = CircuitBreaker('storage')
@@ -1,5 +1,6 @@
 """
-Custom CKEditor upload view that tracks uploads for orphaned file cleanup.
+Custom CKEditor upload view that tracks uploads for orphaned file cleanup,
+and the endpoints of direct-to-R2 uploads (see core.direct_upload).
 """
 from ckeditor_uploader.views import ImageUploadView, get_upload_filename
 from ckeditor_uploader.backends import get_backend
@@ -9,7 +10,14 @@ from django.http import HttpResponse, JsonResponse
 from django.utils.html import escape
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
+from django.views import View
+from django.core.files.base import ContentFile
 from .upload_tracker import track_upload
+from .image_optimizer import optimize_upload, record_sizes
+from .storage import content_addressed_name, content_addressed_uploads, hash_chunks
+from .jobs import enqueue
+from . import direct_upload
+from .direct_upload import DirectUploadError, direct_uploads_enabled
 import os
 import logging
 
@@ -71,7 +79,11 @@ class TrackedImageUploadView(ImageUploadView):
             
             # Check if file is an image (use both filewrapper check and extension check)
             # This ensures WebP files are recognized even if filewrapper doesn't recognize them
-            if not (filewrapper.is_image or is_image_by_extension) and not allow_nonimages:
+            # The streaming upload handler also sniffs the content, so a renamed non-image is refused
+            is_image = filewrapper.is_image or is_image_by_extension
+            if hasattr(uploaded_file, 'image_format'):
+                is_image = is_image and uploaded_file.image_format is not None
+            if not is_image and not allow_nonimages:
                 error_msg = "Invalid file type. Only image files are allowed."
                 if ck_func_num:
                     # Legacy format for old CKEditor
@@ -92,27 +104,61 @@ class TrackedImageUploadView(ImageUploadView):
                         }
                     }, status=400)
             
-            # Generate filepath and save
-            filepath = get_upload_filename(uploaded_file.name, request)
-            saved_path = filewrapper.save_as(filepath)
+            # Scale down, strip metadata and convert to WebP before storing
+            # Images too large to decode here are optimized by the job worker after saving
+            upload_name = uploaded_file.name
+            original_size = uploaded_file.size
+            stored_size = original_size
+            deferred = False
+            try:
+                optimized, deferred = optimize_upload(uploaded_file)
+            except Exception as e:
+                # Store the upload as-is rather than failing it
+                logger.warning(f"Failed to optimize upload {upload_name}: {str(e)}")
+                optimized = None
+            if optimized:
+                upload_name = os.path.splitext(upload_name)[0] + optimized.extension
+                filewrapper = backend(storage, ContentFile(optimized.content, name=upload_name))
+                stored_size = len(optimized.content)
             
-            # Track the upload in database (for general tracking)
+            if content_addressed_uploads() and not deferred:
+                # Key derived from the stored bytes: a repeated upload is already there
+                # (deferred uploads change when the job optimizes them, so they get a regular name)
+                if optimized:
+                    digest = hash_chunks([optimized.content])
+                elif getattr(uploaded_file, 'sha256', None):
+                    digest = uploaded_file.sha256  # Computed while streaming (core.upload_handlers)
+                else:
+                    digest = hash_chunks(uploaded_file.chunks())
+                    uploaded_file.seek(0)
+                filepath = content_addressed_name(digest, os.path.splitext(upload_name)[1])
+                if storage.exists(filepath):
+                    saved_path = filepath
+                    logger.info(f"Upload {upload_name} already stored as {filepath}")
+                else:
+                    saved_path = filewrapper.save_as(filepath)
+            else:
+                # Generate filepath and save
+                filepath = get_upload_filename(upload_name, request)
+                saved_path = filewrapper.save_as(filepath)
+            
+            # Track the upload (a tombstone: deleted later unless saved content uses it)
             # saved_path is relative to media root (e.g., "uploads/2024/01/15/image.jpg")
             try:
-                track_upload(saved_path, user=request.user if request.user.is_authenticated else None)
+                track_upload(saved_path)
             except Exception as e:
                 # Log tracking error but don't fail the upload
                 logger.warning(f"Failed to track upload {saved_path}: {str(e)}")
+            logger.info(f"Stored upload {saved_path}: {original_size} -> {stored_size} bytes")
+            if not deferred:
+                # Deferred uploads are recorded by the job once they are optimized
+                try:
+                    record_sizes(saved_path, original_size, stored_size)
+                except Exception as e:
+                    logger.warning(f"Failed to record sizes of {saved_path}: {str(e)}")
             
-            # Also track in session for this editing session
-            # This allows us to check only uploads from current editing session when saving
-            if 'ckeditor_uploads' not in request.session:
-                request.session['ckeditor_uploads'] = []
-            
-            # Add this upload to session (store the file path)
-            if saved_path not in request.session['ckeditor_uploads']:
-                request.session['ckeditor_uploads'].append(saved_path)
-                request.session.modified = True  # Mark session as modified
+            if deferred:
+                enqueue('core.optimize_upload', path=saved_path)
             
             # Get the URL for the uploaded file
             url = utils.get_media_url(saved_path)
@@ -169,3 +215,89 @@ class TrackedImageUploadView(ImageUploadView):
                     }
                 }, status=500)
 
+
+
+def _upload_error(message, status=400):
+    return JsonResponse({
+        "uploaded": 0,
+        "error": {
+            "message": message
+        }
+    }, status=status)
+
+
+def _is_staff(user):
+    # Same check as staff_member_required, answered with JSON instead of a login redirect
+    return user.is_active and user.is_staff
+
+
+class DirectUploadView(View):
+    """
+    Issue a presigned PUT URL so the browser uploads straight to R2 (see core.direct_upload).
+    Expects POST fields name, type and size; answers 400 when direct uploads
+    aren't available, and the editor then uses TrackedImageUploadView.
+    Staff only: readers can register accounts, but must not get upload URLs.
+    """
+    
+    def post(self, request, **kwargs):
+        if not _is_staff(request.user):
+            return _upload_error("Authentication required.", status=403)
+        
+        storage = utils.storage
+        if not direct_uploads_enabled(storage):
+            return _upload_error("Direct uploads are not available.")
+        
+        try:
+            size = int(request.POST.get("size", ""))
+        except ValueError:
+            return _upload_error("Invalid file size.")
+        
+        try:
+            upload = direct_upload.presign(
+                request, storage, request.POST.get("name", ""), request.POST.get("type", ""), size,
+            )
+        except DirectUploadError as e:
+            return _upload_error(str(e))
+        except Exception as e:
+            logger.error(f"Failed to presign upload: {str(e)}", exc_info=True)
+            return _upload_error(f"Upload failed: {str(e)}", status=500)
+        return JsonResponse(upload)
+
+
+class DirectUploadConfirmView(View):
+    """
+    Register a file the browser uploaded to R2 and queue its optimization.
+    Responds like TrackedImageUploadView. Staff only, like DirectUploadView.
+    """
+    
+    def post(self, request, **kwargs):
+        if not _is_staff(request.user):
+            return _upload_error("Authentication required.", status=403)
+        
+        storage = utils.storage
+        if not direct_uploads_enabled(storage):
+            return _upload_error("Direct uploads are not available.")
+        
+        try:
+            saved_path, size = direct_upload.confirm(request, storage, request.POST.get("key", ""))
+        except DirectUploadError as e:
+            return _upload_error(str(e))
+        except Exception as e:
+            logger.error(f"Failed to confirm upload: {str(e)}", exc_info=True)
+            return _upload_error(f"Upload failed: {str(e)}", status=500)
+        
+        # Already tracked when the key was issued
+        logger.info(f"Stored direct upload {saved_path}: {size} bytes")
+        
+        # Not seen by the server before storing, so always optimized afterwards
+        enqueue('core.optimize_upload', path=saved_path)
+        
+        url = utils.get_media_url(saved_path)
+        if not url.startswith('http'):
+            url = request.build_absolute_uri(url)
+        
+        return JsonResponse({
+            "uploaded": 1,
+            "fileName": os.path.basename(saved_path),
+            "url": url
+        })
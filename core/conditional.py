@@ -0,0 +1,89 @@
+"""
+Conditional GET support (ETag / Last-Modified / 304) for content pages.
+
+Views are wrapped with @conditional_page(validators_func). The validators
+function is cheap (indexed lookups of the page's own rows, no aggregates) and
+returns the parts the page content depends on plus an optional last-modified
+datetime. The
+ETag combines those parts with everything else that shows up on every page:
+the active language, the template version, the navigation version and the
+reader's cookies (login state and CSRF token). Matching requests get a 304
+before the view runs any heavy queries or renders templates.
+
+Pages that are also page-cached put @cache_public_page outside this
+decorator: cached pages are revalidated from the cache entry itself, so these
+validators only run for readers the page cache does not serve (logged-in
+readers, query strings) and on cache misses.
+"""
+import hashlib
+from django.conf import settings
+from django.utils import translation
+from django.views.decorators.http import condition
+from .page_cache import csrf_secret
+
+
+def _navigation_state():
+    from topics.navigation import navigation_version, navigation_modified
+    return navigation_version(), navigation_modified()
+
+
+def compute_validators(request, parts, last_modified=None):
+    """
+    Build (etag, last_modified) for a page.
+
+    Args:
+        request: Current request
+        parts: Values the page content depends on (ids, timestamps, ...)
+        last_modified: Newest content timestamp (optional)
+    """
+    nav_version, nav_modified = _navigation_state()
+    cookies = request.COOKIES
+    key = repr([
+        request.get_full_path(),
+        translation.get_language(),
+        getattr(settings, 'PAGE_TEMPLATE_VERSION', ''),
+        nav_version,
+        cookies.get(settings.SESSION_COOKIE_NAME, ''),
+        csrf_secret(request),
+        *parts,
+    ])
+    etag = '"{}"'.format(hashlib.md5(key.encode('utf-8')).hexdigest())
+
+    if last_modified is not None and nav_modified is not None:
+        last_modified = max(last_modified, nav_modified)
+    return etag, last_modified
+
+
+def conditional_page(validators_func):
+    """
+    Decorator adding ETag/Last-Modified validators to a page view.
+
+    validators_func(request, *args, **kwargs) returns (parts, last_modified),
+    or None when the page has no stable validators (e.g. it will redirect).
+    """
+    def validators(request, *args, **kwargs):
+        # Both condition() callbacks need the same values - compute once
+        if not hasattr(request, '_page_validators'):
+            result = None
+            # One-off flash messages make the page unique to this response
+            if request.method in ('GET', 'HEAD') and 'messages' not in request.COOKIES:
+                computed = validators_func(request, *args, **kwargs)
+                if computed is not None:
+                    result = compute_validators(request, *computed)
+            request._page_validators = result
+        return request._page_validators
+
+    def etag_func(request, *args, **kwargs):
+        result = validators(request, *args, **kwargs)
+        return result[0] if result else None
+
+    def last_modified_func(request, *args, **kwargs):
+        result = validators(request, *args, **kwargs)
+        return result[1] if result else None
+
+    return condition(etag_func=etag_func, last_modified_func=last_modified_func)
+
+
+def static_page_validators(request, *args, **kwargs):
+    """Validators for pages whose content only comes from templates and navigation"""
+    return (), None
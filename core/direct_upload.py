@@ -0,0 +1,175 @@
+"""
+Direct-to-R2 CKEditor uploads.
+
+The regular upload view receives the whole file (holding a worker for the
+client transfer, then again for the transfer to R2). With direct uploads the
+browser sends the file to the bucket itself:
+
+1. POST /ckeditor/direct-upload/ {name, type, size}
+   -> presigned PUT URL for one key under uploads/, valid for
+      CKEDITOR_DIRECT_UPLOAD_EXPIRES seconds, and the headers to send with it
+      (the signed Content-Type and Cache-Control)
+2. The browser PUTs the file to the bucket
+3. POST /ckeditor/direct-upload/confirm/ {key}
+   -> the object is checked (content type, size up to
+      CKEDITOR_DIRECT_UPLOAD_MAX_SIZE, image header) and queued for
+      optimization; the response is the same JSON as the regular upload view
+      returns
+
+R2 doesn't support presigned POST policies, so a PUT URL can't limit the
+size up front; objects that break the limits are deleted on confirmation.
+The bucket's CORS rules must allow PUT with the Content-Type and
+Cache-Control headers from the admin origin.
+
+Only staff users (who edit content in the admin) get upload URLs.
+
+Keys are issued per session, so only keys the server handed out can be
+confirmed. Each issued key is tracked like a regular upload (track_upload)
+right away, so an object sent but never confirmed is garbage collected as
+well (see core.media_gc). The object is optimized by the job worker under
+the same name (see core.image_optimizer); it can't be content-addressed
+(core.storage) because the server never sees the bytes before the key is
+chosen.
+
+Only S3-compatible storage supports this (any S3 stand-in such as MinIO works
+through AWS_S3_ENDPOINT_URL); elsewhere the editor falls back to the regular
+upload view (static/js/ckeditor-direct-upload.js).
+"""
+import logging
+import os
+from django.conf import settings
+from .batch_delete import is_s3_storage
+
+logger = logging.getLogger(__name__)
+
+# Content types by extension, matching the image extensions the upload view accepts
+CONTENT_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+}
+
+# Session key holding the keys issued to this session and not confirmed yet
+SESSION_KEY = 'ckeditor_direct_uploads'
+
+# Issued keys kept per session (older ones can no longer be confirmed)
+MAX_PENDING = 50
+
+
+class DirectUploadError(Exception):
+    """Upload request or confirmation rejected (the message is shown to the editor)"""
+
+
+def direct_uploads_enabled(storage):
+    return getattr(settings, 'CKEDITOR_DIRECT_UPLOADS', True) and is_s3_storage(storage)
+
+
+def max_size():
+    return getattr(settings, 'CKEDITOR_DIRECT_UPLOAD_MAX_SIZE', 25 * 1024 * 1024)
+
+
+def expires():
+    return getattr(settings, 'CKEDITOR_DIRECT_UPLOAD_EXPIRES', 300)
+
+
+def _bucket_key(storage, path):
+    from storages.utils import clean_name
+    return storage._normalize_name(clean_name(path))
+
+
+def upload_key(name, request, storage):
+    """Storage name for a direct upload: the regular upload path plus a random suffix"""
+    from ckeditor_uploader.views import get_upload_filename
+
+    # The object doesn't exist until the browser sends it, so the name is made
+    # unique up front instead of asking the storage for an available one
+    root, extension = os.path.splitext(get_upload_filename(name, request))
+    return storage.get_alternative_name(root, extension.lower()).replace('\\', '/')
+
+
+def presign(request, storage, name, content_type, size):
+    """
+    Issue a presigned PUT URL for one upload.
+
+    Args:
+        request: Upload request (the key is remembered in its session)
+        storage: S3 storage the file goes to
+        name: Original file name
+        content_type: Content type the browser will send
+        size: File size in bytes, as reported by the browser
+
+    Returns:
+        Dict with 'key' (storage name), 'url' and 'headers' (headers to PUT the file with)
+
+    Raises:
+        DirectUploadError: If the file type or size is not accepted
+    """
+    extension = os.path.splitext(name)[1].lower()
+    if CONTENT_TYPES.get(extension) != content_type:
+        raise DirectUploadError("Invalid file type. Only image files are allowed.")
+    if not 0 < size <= max_size():
+        raise DirectUploadError(f"File is larger than {max_size() // (1024 * 1024)} MB.")
+
+    key = upload_key(name, request, storage)
+    cache_control = storage.get_object_parameters(key).get('CacheControl')
+    # Signed headers: the browser must send exactly these
+    params = {'Bucket': storage.bucket_name, 'Key': _bucket_key(storage, key), 'ContentType': content_type}
+    headers = {'Content-Type': content_type}
+    if cache_control:
+        params['CacheControl'] = cache_control
+        headers['Cache-Control'] = cache_control
+
+    url = storage.connection.meta.client.generate_presigned_url(
+        'put_object', Params=params, ExpiresIn=expires(),
+    )
+
+    from .upload_tracker import track_upload
+    track_upload(key)
+
+    pending = request.session.get(SESSION_KEY, [])
+    pending.append(key)
+    request.session[SESSION_KEY] = pending[-MAX_PENDING:]
+    return {'key': key, 'url': url, 'headers': headers}
+
+
+def confirm(request, storage, key):
+    """
+    Register an object the browser uploaded with a presigned PUT URL.
+
+    Returns:
+        (storage name, size in bytes)
+
+    Raises:
+        DirectUploadError: If the key wasn't issued to this session, the object
+            is missing, or it has the wrong type or size or isn't an image
+            (the object is deleted then)
+    """
+    from .body_html import read_dimensions
+
+    pending = request.session.get(SESSION_KEY, [])
+    if key not in pending:
+        raise DirectUploadError("Unknown upload.")
+
+    try:
+        head = storage.connection.meta.client.head_object(
+            Bucket=storage.bucket_name, Key=_bucket_key(storage, key),
+        )
+    except Exception as e:
+        logger.warning(f"Direct upload {key} not found: {str(e)}")
+        raise DirectUploadError("Upload not found.")
+
+    pending.remove(key)
+    request.session[SESSION_KEY] = pending
+
+    # The PUT URL doesn't limit the size, and the signed type says nothing about the bytes
+    if not 0 < head['ContentLength'] <= max_size():
+        storage.delete(key)
+        raise DirectUploadError(f"File is larger than {max_size() // (1024 * 1024)} MB.")
+    expected_type = CONTENT_TYPES.get(os.path.splitext(key)[1].lower())
+    if head.get('ContentType') != expected_type or read_dimensions(key, storage) is None:
+        storage.delete(key)
+        raise DirectUploadError("Invalid file type. Only image files are allowed.")
+
+    return key, head['ContentLength']
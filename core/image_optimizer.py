@@ -0,0 +1,214 @@
+"""
+Upload-time optimization of CKEditor body images.
+
+Editors paste camera photos of several megabytes, with EXIF (GPS position,
+camera serial) attached. Before an upload is stored it is:
+- scaled down to CKEDITOR_IMAGE_MAX_DIMENSION on the longest side,
+- rotated by its EXIF orientation, then stripped of all metadata except the
+  color profile,
+- re-encoded to WebP at CKEDITOR_IMAGE_WEBP_QUALITY.
+
+The optimized file is only used when it is smaller than the upload.
+
+JPEGs are decoded at reduced scale (Pillow draft mode), so even large photos
+are optimized inside the upload request. Images that would still decode to
+more than CKEDITOR_IMAGE_INLINE_MAX_PIXELS (huge PNGs) are stored as uploaded
+and optimized by the job worker under the same name and format, because the
+editor already holds their URL.
+
+Both paths record the sizes before and after in an UploadOptimization row
+(record_sizes), so the savings can be checked in the admin.
+"""
+import io
+import logging
+import os
+import tempfile
+from typing import NamedTuple
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# GIFs are left alone (animations would lose their frames)
+# MPO is how Pillow opens many phone JPEGs (the extra frames are previews/depth maps)
+OPTIMIZABLE_FORMATS = {'JPEG', 'MPO', 'PNG', 'WEBP'}
+
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+
+class OptimizedImage(NamedTuple):
+    content: bytes
+    extension: str
+    width: int
+    height: int
+
+
+def max_dimension():
+    return getattr(settings, 'CKEDITOR_IMAGE_MAX_DIMENSION', 2000)
+
+
+def webp_quality():
+    return getattr(settings, 'CKEDITOR_IMAGE_WEBP_QUALITY', 80)
+
+
+def inline_max_pixels():
+    return getattr(settings, 'CKEDITOR_IMAGE_INLINE_MAX_PIXELS', 12_000_000)
+
+
+def open_image(file):
+    """
+    Open an upload for optimizing.
+
+    Returns:
+        PIL image (JPEGs prepared for reduced-scale decoding), or None when
+        the file is not an image this module optimizes
+    """
+    try:
+        image = Image.open(file)
+    except (OSError, Image.DecompressionBombError):
+        return None
+    if image.format not in OPTIMIZABLE_FORMATS:
+        return None
+    if image.format != 'MPO' and getattr(image, 'is_animated', False):
+        return None
+    if image.format in ('JPEG', 'MPO'):
+        # Decode at the smallest 1/2, 1/4 or 1/8 scale that still covers the target size
+        limit = max_dimension()
+        image.draft('RGB', (limit, limit))
+    return image
+
+
+def needs_worker(image):
+    """Whether decoding the image is too heavy to do inside the upload request"""
+    width, height = image.size
+    return width * height > inline_max_pixels()
+
+
+def encode(image, image_format='WEBP'):
+    """
+    Scale down, apply the EXIF orientation, drop metadata and encode.
+
+    Args:
+        image: Image from open_image()
+        image_format: Output format (WEBP, JPEG or PNG)
+
+    Returns:
+        OptimizedImage
+    """
+    icc_profile = image.info.get('icc_profile')
+    # Rotating by the orientation tag first means no EXIF is needed afterwards
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if image_format == 'JPEG' or not has_alpha:
+        image = image.convert('RGB')
+    else:
+        image = image.convert('RGBA')
+
+    limit = max_dimension()
+    image.thumbnail((limit, limit), Image.LANCZOS)
+
+    options = {'format': image_format}
+    if image_format == 'WEBP':
+        options.update(quality=webp_quality(), method=4)
+    elif image_format == 'JPEG':
+        options.update(quality=getattr(settings, 'CKEDITOR_IMAGE_QUALITY', 85), optimize=True, progressive=True)
+    else:
+        options.update(optimize=True)
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+
+    buffer = io.BytesIO()
+    image.save(buffer, **options)
+    return OptimizedImage(buffer.getvalue(), EXTENSIONS[image_format], *image.size)
+
+
+def optimize_upload(uploaded_file):
+    """
+    Optimize an uploaded file inside the request.
+
+    Returns:
+        (OptimizedImage or None, deferred). The image is None when the upload
+        should be stored as-is; deferred is True when the stored file should be
+        optimized by the job worker instead (see optimize_stored_image).
+    """
+    image = open_image(uploaded_file)
+    try:
+        if image is None:
+            return None, False
+        if needs_worker(image):
+            return None, True
+        optimized = encode(image)
+    finally:
+        uploaded_file.seek(0)
+
+    original_size = uploaded_file.size
+    if len(optimized.content) >= original_size:
+        return None, False
+    logger.info(
+        f"Optimized {uploaded_file.name}: {original_size} -> {len(optimized.content)} bytes "
+        f"({optimized.width}x{optimized.height} WebP)"
+    )
+    return optimized, False
+
+
+def record_sizes(path, original_size, stored_size):
+    """Store the sizes of an upload before and after optimizing"""
+    from .models import UploadOptimization
+    UploadOptimization.objects.update_or_create(
+        file_path=path,
+        defaults={'original_size': original_size, 'stored_size': stored_size},
+    )
+
+
+def _overwrite(path, content, storage):
+    """
+    Replace a stored file's content under the same name.
+
+    Never deletes first (a failed write would lose the image) and never goes
+    through storage.save(), which picks another name for an existing file
+    when AWS_S3_FILE_OVERWRITE is off.
+    """
+    from .batch_delete import is_s3_storage
+
+    if is_s3_storage(storage):
+        # A PUT to an existing key replaces the object atomically
+        storage._save(path, ContentFile(content))
+        return
+    # Local storage (development): write next to the file, then rename over it
+    full_path = storage.path(path)
+    directory, name = os.path.split(full_path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f'.{name}.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        if storage.file_permissions_mode is not None:
+            os.chmod(temp_path, storage.file_permissions_mode)
+        os.replace(temp_path, full_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def optimize_stored_image(path, storage):
+    """
+    Optimize a stored image in place: same name and format, so URLs already
+    in editor content stay valid.
+
+    Returns:
+        (original size, stored size) in bytes
+    """
+    with storage.open(path, 'rb') as f:
+        original = f.read()
+    image = open_image(io.BytesIO(original))
+    if image is None:
+        return len(original), len(original)
+
+    optimized = encode(image, 'JPEG' if image.format == 'MPO' else image.format)
+    if len(optimized.content) >= len(original):
+        return len(original), len(original)
+
+    _overwrite(path, optimized.content, storage)
+    logger.info(f"Optimized {path} in place: {len(original)} -> {len(optimized.content)} bytes")
+    return len(original), len(optimized.content)
@@ -0,0 +1,178 @@
+"""
+Image reference index.
+
+ImageReference rows map every media file to the objects, fields and languages
+that use it: the thumbnail and each image embedded in the description HTML
+of all three languages. Rows are synced from the object's own content on save
+and removed on delete, so finding out whether a file is still used anywhere
+is one indexed query over the files in question, no matter how many topics
+exist.
+"""
+import logging
+from topics.languages import LANGUAGE_SUFFIXES, translated_columns
+
+logger = logging.getLogger(__name__)
+
+# File fields indexed as-is
+IMAGE_FIELDS = ('thumbnail',)
+
+# JSON fields listing generated files (see core.thumbnails)
+DERIVATIVE_FIELDS = ('thumbnail_derivatives',)
+
+# HTML fields parsed for embedded images (one column per language)
+HTML_FIELDS = ('short_description', 'full_description')
+
+# Every column an instance's references are built from (a save that changes none
+# of them cannot add or remove a reference)
+IMAGE_COLUMNS = IMAGE_FIELDS + DERIVATIVE_FIELDS + tuple(translated_columns(HTML_FIELDS))
+
+
+def _reference_model(reference_model):
+    if reference_model is None:
+        from .models import ImageReference as reference_model
+    return reference_model
+
+
+def normalize_path(path):
+    """Media path without a leading slash"""
+    return path[1:] if path.startswith('/') else path
+
+
+def instance_references(instance):
+    """
+    Collect the media references of an instance.
+
+    Returns:
+        Set of (file_path, field_name, language) tuples
+    """
+    from .utils import extract_images_from_html
+
+    references = set()
+    for field_name in IMAGE_FIELDS:
+        file = getattr(instance, field_name, None)
+        if file:
+            references.add((normalize_path(file.name), field_name, ''))
+
+    for field_name in DERIVATIVE_FIELDS:
+        derivatives = getattr(instance, field_name, None) or {}
+        for variant in derivatives.get('variants', []):
+            references.add((normalize_path(variant['name']), field_name, ''))
+
+    for base_name in HTML_FIELDS:
+        for lang, suffix in LANGUAGE_SUFFIXES.items():
+            field_name = f'{base_name}{suffix}'
+            html = getattr(instance, field_name, None)
+            if html:
+                for path in extract_images_from_html(html):
+                    references.add((normalize_path(path), field_name, lang))
+    return references
+
+
+def instance_image_paths(instance):
+    """All media paths an instance references (any field, any language)"""
+    return {path for path, _, _ in instance_references(instance)}
+
+
+def sync_image_references(instance, reference_model=None):
+    """
+    Update the index rows of an instance from its current content.
+    Only the difference to the stored rows is written.
+
+    Args:
+        instance: Saved model instance (or historical model instance in migrations)
+        reference_model: ImageReference model class (defaults to the current model)
+
+    Returns:
+        Set of paths the instance no longer references
+    """
+    reference_model = _reference_model(reference_model)
+    model_name = instance._meta.label
+
+    desired = instance_references(instance)
+    existing = {
+        (row.file_path, row.field_name, row.language): row.pk
+        for row in reference_model.objects.filter(model_name=model_name, object_id=instance.pk)
+    }
+
+    stale_ids = [pk for key, pk in existing.items() if key not in desired]
+    if stale_ids:
+        reference_model.objects.filter(pk__in=stale_ids).delete()
+
+    added = [
+        reference_model(
+            file_path=path, model_name=model_name, object_id=instance.pk,
+            field_name=field_name, language=lang,
+        )
+        for path, field_name, lang in desired - set(existing)
+    ]
+    if added:
+        reference_model.objects.bulk_create(added, ignore_conflicts=True)
+
+    desired_paths = {path for path, _, _ in desired}
+    return {path for path, _, _ in existing if path not in desired_paths}
+
+
+def remove_image_references(instance, reference_model=None):
+    """
+    Remove the index rows of a deleted instance.
+
+    Returns:
+        Set of paths the instance referenced
+    """
+    reference_model = _reference_model(reference_model)
+    rows = reference_model.objects.filter(model_name=instance._meta.label, object_id=instance.pk)
+    paths = set(rows.values_list('file_path', flat=True))
+    rows.delete()
+    return paths
+
+
+def referenced_paths(paths):
+    """Subset of the given paths referenced by any saved object"""
+    from .models import ImageReference
+
+    paths = {normalize_path(path) for path in paths}
+    if not paths:
+        return set()
+    return set(
+        ImageReference.objects.filter(file_path__in=paths)
+        .values_list('file_path', flat=True).distinct()
+    )
+
+
+def unreferenced_paths(paths):
+    """Subset of the given paths no saved object references any more"""
+    paths = {normalize_path(path) for path in paths}
+    return paths - referenced_paths(paths)
+
+
+def rebuild_references(model_classes, reference_model=None):
+    """
+    Rebuild the whole index.
+
+    Args:
+        model_classes: Model classes to index (e.g. [Topic, Category])
+        reference_model: ImageReference model class (defaults to the current model)
+
+    Returns:
+        Number of rows written
+    """
+    reference_model = _reference_model(reference_model)
+    reference_model.objects.all().delete()
+
+    count = 0
+    for model_class in model_classes:
+        batch = []
+        for instance in model_class.objects.iterator(chunk_size=100):
+            for path, field_name, lang in instance_references(instance):
+                batch.append(reference_model(
+                    file_path=path, model_name=model_class._meta.label, object_id=instance.pk,
+                    field_name=field_name, language=lang,
+                ))
+            if len(batch) >= 500:
+                reference_model.objects.bulk_create(batch, ignore_conflicts=True)
+                count += len(batch)
+                batch = []
+        if batch:
+            reference_model.objects.bulk_create(batch, ignore_conflicts=True)
+            count += len(batch)
+    return count
@@ -0,0 +1,264 @@
+"""
+On-demand resizing of article body images.
+
+Images embedded in descriptions through CKEditor (uploads/...) have no size
+variants. Instead of generating every width up front, body <img> tags get a
+srcset of signed URLs of the form
+
+    /img/<width>/<format>/<signature>/uploads/2024/01/15/photo.webp
+
+served by core.views.resized_image. The signature (HMAC of path, width and
+format with SECRET_KEY) means only URLs the site rendered are served, and
+widths are limited to RESIZED_IMAGE_WIDTHS, so the endpoint can't be used to
+make the server resize arbitrary files to arbitrary sizes.
+
+Resized files are kept in a local disk cache (RESIZED_IMAGE_CACHE_DIR), capped
+at RESIZED_IMAGE_CACHE_MAX_BYTES. A hit refreshes the file's mtime, and the
+least recently used files are evicted when the cap is exceeded. Concurrent
+misses for the same variant inside a process wait for one resize instead of
+each doing their own (single flight). Across processes a file is written to
+a temporary name and renamed, so readers never see a partial file. Responses
+are cacheable for a year: a URL always names the same variant.
+"""
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+import threading
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare, salted_hmac
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (320, 640, 960, 1280, 1920)
+
+# Only CKEditor uploads are resized
+SOURCE_PREFIX = 'uploads/'
+
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Evict down to this share of the cap, so eviction doesn't run on every write
+EVICT_TO = 0.9
+
+
+def allowed_widths():
+    return tuple(getattr(settings, 'RESIZED_IMAGE_WIDTHS', DEFAULT_WIDTHS))
+
+
+def signature(path, width, fmt):
+    """Signature of a variant URL (16 hex characters)"""
+    return salted_hmac('core.image_resize', f'{path}:{width}:{fmt}').hexdigest()[:16]
+
+
+def is_valid(path, width, fmt, sig):
+    return (
+        path.startswith(SOURCE_PREFIX)
+        and '..' not in path.split('/')
+        and width in allowed_widths()
+        and fmt in FORMATS
+        and constant_time_compare(sig, signature(path, width, fmt))
+    )
+
+
+def resized_url(path, width, fmt='webp'):
+    """Signed URL of a resized variant of a media file"""
+    return reverse('resized_image', args=[width, fmt, signature(path, width, fmt), path])
+
+
+class DiskCache:
+    """Size-capped directory of resized files, evicting least recently used first"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None  # Bytes in the cache, counted on first write
+        # key -> Event set when the in-flight resize of that key finishes
+        self._in_flight = {}
+
+    def file_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """Path of a cached file (refreshing its LRU position), or None"""
+        path = self.file_path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get_or_create(self, key, create):
+        """
+        Path of a cached file, calling create() -> bytes on a miss.
+        Only one thread per key runs create(); others wait for its result.
+        """
+        while True:
+            path = self.get(key)
+            if path:
+                return path
+            with self._lock:
+                event = self._in_flight.get(key)
+                leader = event is None
+                if leader:
+                    event = self._in_flight[key] = threading.Event()
+            if not leader:
+                event.wait()
+                continue  # The leader's file is there now (or it failed and we try ourselves)
+            try:
+                return self._store(key, create())
+            finally:
+                with self._lock:
+                    del self._in_flight[key]
+                event.set()
+
+    def _store(self, key, content):
+        path = self.file_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(content)
+            over_limit = self._size > self.max_bytes
+        if over_limit:
+            self.evict(keep=path)
+        return path
+
+    def _entries(self):
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if entry.is_file() and not entry.name.startswith('.tmp-'):
+                        yield entry
+
+    def _scan_size(self):
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def evict(self, keep=None):
+        """
+        Delete least recently used files until the cache is below EVICT_TO of the cap.
+        The file at `keep` (the one just written, about to be served) is never deleted.
+        """
+        entries = sorted(
+            ((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in self._entries()),
+        )
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TO
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        with self._lock:
+            self._size = total
+        logger.info(f"Resized image cache: evicted {removed} files, {total} bytes left")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache(
+                getattr(settings, 'RESIZED_IMAGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'cgi-resized')),
+                getattr(settings, 'RESIZED_IMAGE_CACHE_MAX_BYTES', 512 * 1024 * 1024),
+            )
+        return _cache
+
+
+def resize(path, width, fmt):
+    """Read a media file from storage and encode it at (at most) the given width"""
+    image_format, _, options = FORMATS[fmt]
+    with default_storage.open(path, 'rb') as f:
+        image = Image.open(f)
+        if image.format in ('JPEG', 'MPO'):
+            # Decode at reduced scale when the source is much larger than the target.
+            # The box covers the target width whether or not EXIF rotates the image by 90 degrees.
+            source_width, source_height = image.size
+            image.draft('RGB', (
+                max(width, round(width * source_width / source_height)),
+                max(width, round(width * source_height / source_width)),
+            ))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha and image_format != 'JPEG' else 'RGB')
+
+    if image.width > width:
+        # Never upscale: smaller sources are served at their own size
+        image = image.resize((width, max(round(image.height * width / image.width), 1)), Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def resized_file(path, width, fmt):
+    """Path of the cached resized variant, resizing it on a miss"""
+    key = hashlib.sha256(f'{path}:{width}:{fmt}'.encode('utf-8')).hexdigest()
+    return get_cache().get_or_create(key, lambda: resize(path, width, fmt))
+
+
+# <img ... src="...">, capturing everything but the closing bracket
+IMG_TAG_PATTERN = re.compile(r'<img\b([^>]*?)\s*/?>', re.IGNORECASE)
+SRC_PATTERN = re.compile(r'\ssrc=(["\'])([^"\']+)\1', re.IGNORECASE)
+
+# Body images are at most the article column wide
+BODY_IMAGE_SIZES = '(max-width: 768px) 100vw, 800px'
+
+
+def upload_path(src):
+    """Media path of an <img> src if it is an uploaded image (uploads/...), else None"""
+    from .utils import extract_images_from_html
+
+    paths = extract_images_from_html(f'<img src="{src}">')
+    return paths.pop() if paths else None
+
+
+def body_srcset(path):
+    """srcset value listing every allowed width of an uploaded image"""
+    return ', '.join(f'{resized_url(path, width)} {width}w' for width in allowed_widths())
+
+
+def rewrite_body_images(html, sizes=BODY_IMAGE_SIZES):
+    """
+    Add a srcset of resized variants to every <img> of an uploaded image in HTML.
+    The original stays in src as the fallback; tags that already have a
+    srcset or point elsewhere are left as they are.
+    """
+    if not html or '<img' not in html.lower():
+        return html
+
+    def replace(match):
+        attrs = match.group(1)
+        src = SRC_PATTERN.search(attrs)
+        if not src or 'srcset=' in attrs.lower():
+            return match.group(0)
+        path = upload_path(src.group(2))
+        if not path:
+            return match.group(0)
+        return f'<img{attrs} srcset="{body_srcset(path)}" sizes="{sizes}">'
+
+    return IMG_TAG_PATTERN.sub(replace, html)
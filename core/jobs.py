@@ -0,0 +1,271 @@
+"""
+Database-backed background jobs.
+
+Slow side effects (storage deletes, e-mail, image processing) are queued as
+Job rows instead of running inside the request. No broker is needed:
+
+- enqueue() writes the row in the current transaction, so a job exists if and
+  only if the change that needs it was committed. The worker cannot see it
+  before the commit.
+- The run_jobs worker leases ready jobs with a conditional UPDATE. While a
+  job runs, a heartbeat thread extends its lease every third of the task's
+  lease_seconds, so long jobs keep their lease; a job whose worker died
+  stops being renewed and becomes available again when its lease runs out.
+- Failed jobs are retried with exponential backoff. After max_attempts they
+  are marked dead and show up in the admin's dead-letter list, where they
+  can be retried.
+- Each task may limit how many of its jobs run at once across all workers.
+- A task raising Postpone is run again later without using up an attempt
+  (e.g. while storage is known to be down, see core.circuit_breaker).
+
+Tasks are plain functions registered with @task('name') and called with the
+job payload as keyword arguments. Modules defining tasks are imported from
+their app's ready() so the worker knows them.
+
+With JOBS_RUN_EAGERLY (default in DEBUG) jobs run in-process right after the
+commit, so development works without a worker.
+
+In production the worker is a separate service (cgi-worker in render.yaml).
+Tasks that purge cached pages or the navigation rely on the cache being
+shared with the web service (the database cache, see CACHES in settings).
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# name -> task options
+_registry = {}
+
+
+class Postpone(Exception):
+    """Raised by a task to run again after `delay` seconds, without counting the attempt"""
+
+    def __init__(self, message='', delay=60):
+        super().__init__(message)
+        self.delay = delay
+
+
+def task(name, max_attempts=5, concurrency=None, lease_seconds=300, backoff_seconds=30):
+    """
+    Register a function as a background task.
+
+    Args:
+        name: Task name stored on the job rows
+        max_attempts: Attempts before the job is marked dead
+        concurrency: Maximum jobs of this task running at once (None = no limit)
+        lease_seconds: How long a job stays leased without a heartbeat from its worker
+            before others may take it over (renewed while it runs)
+        backoff_seconds: Delay before the first retry (doubles on every attempt)
+    """
+    def decorator(func):
+        _registry[name] = {
+            'func': func,
+            'max_attempts': max_attempts,
+            'concurrency': concurrency,
+            'lease_seconds': lease_seconds,
+            'backoff_seconds': backoff_seconds,
+        }
+        return func
+    return decorator
+
+
+def registered_tasks():
+    return dict(_registry)
+
+
+def _run_eagerly():
+    return getattr(settings, 'JOBS_RUN_EAGERLY', settings.DEBUG)
+
+
+def enqueue(name, run_at=None, **payload):
+    """
+    Queue a job in the current transaction.
+
+    Args:
+        name: Registered task name
+        run_at: Earliest time to run (defaults to now)
+        **payload: JSON-serializable keyword arguments for the task
+
+    Returns:
+        The Job row
+    """
+    from .models import Job
+
+    options = _registry.get(name, {})
+    job = Job.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=options.get('max_attempts', 5),
+        run_at=run_at or timezone.now(),
+    )
+    if _run_eagerly():
+        transaction.on_commit(lambda: run_job_by_id(job.pk, worker='eager'))
+    return job
+
+
+def backoff(options, attempts):
+    """Delay before the next attempt: base * 2^(attempts-1), capped at a day, with jitter"""
+    seconds = min(options['backoff_seconds'] * 2 ** max(attempts - 1, 0), 24 * 60 * 60)
+    return timedelta(seconds=seconds * random.uniform(0.8, 1.2))
+
+
+def _ready_filter(now):
+    """Pending jobs that are due, or running jobs whose lease expired (dead worker)"""
+    from .models import Job
+    return (
+        Q(status=Job.PENDING, run_at__lte=now)
+        | Q(status=Job.RUNNING, leased_until__lt=now)
+    )
+
+
+def claim_jobs(worker, limit):
+    """
+    Lease up to `limit` ready jobs for a worker, respecting task concurrency limits.
+
+    Returns:
+        List of leased Job rows
+    """
+    from .models import Job
+
+    now = timezone.now()
+    running = dict(
+        Job.objects.filter(status=Job.RUNNING, leased_until__gte=now)
+        .values_list('name').annotate(count=Count('id'))
+    )
+
+    claimed = []
+    candidates = Job.objects.filter(_ready_filter(now)).order_by('run_at', 'id')[:limit * 4]
+    for job in candidates:
+        if len(claimed) >= limit:
+            break
+        options = _registry.get(job.name)
+        if options is None:
+            continue  # Task not known to this worker (e.g. during a deploy)
+        if options['concurrency'] is not None and running.get(job.name, 0) >= options['concurrency']:
+            continue
+
+        leased_until = now + timedelta(seconds=options['lease_seconds'])
+        # Conditional update: only one worker can move the row out of the ready state
+        updated = Job.objects.filter(Q(pk=job.pk) & _ready_filter(now)).update(
+            status=Job.RUNNING, leased_until=leased_until, worker=worker,
+            attempts=F('attempts') + 1,
+        )
+        if updated:
+            job.status, job.leased_until, job.worker = Job.RUNNING, leased_until, worker
+            job.attempts += 1
+            running[job.name] = running.get(job.name, 0) + 1
+            claimed.append(job)
+    return claimed
+
+
+class _LeaseHeartbeat(threading.Thread):
+    """Extends the lease of a running job every third of the lease time until stopped"""
+
+    def __init__(self, job, lease_seconds):
+        super().__init__(name=f'job-heartbeat-{job.pk}', daemon=True)
+        self.job = job
+        self.lease_seconds = lease_seconds
+        self._stopped = threading.Event()
+
+    def run(self):
+        from django.db import connection
+        from .models import Job
+
+        try:
+            while not self._stopped.wait(self.lease_seconds / 3):
+                renewed = Job.objects.filter(pk=self.job.pk, worker=self.job.worker, status=Job.RUNNING).update(
+                    leased_until=timezone.now() + timedelta(seconds=self.lease_seconds),
+                )
+                if not renewed:
+                    logger.warning(f"Job {self.job.name} #{self.job.pk} lost its lease")
+                    return
+        except Exception as e:
+            # The lease runs out and another worker may take the job over
+            logger.warning(f"Failed to renew the lease of job {self.job.name} #{self.job.pk}: {str(e)}")
+        finally:
+            # The thread's own database connection
+            connection.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def run_job(job):
+    """Run a leased job (renewing its lease meanwhile) and record the outcome"""
+    from .models import Job
+
+    options = _registry.get(job.name)
+    try:
+        if options is None:
+            raise LookupError(f"Unknown task: {job.name}")
+        heartbeat = _LeaseHeartbeat(job, options['lease_seconds'])
+        heartbeat.start()
+        try:
+            options['func'](**job.payload)
+        finally:
+            heartbeat.stop()
+    except Postpone as e:
+        retry_at = timezone.now() + timedelta(seconds=e.delay)
+        logger.info(f"Job {job.name} #{job.pk} postponed until {retry_at}: {str(e)}")
+        Job.objects.filter(pk=job.pk, worker=job.worker).update(
+            status=Job.PENDING, leased_until=None, run_at=retry_at, attempts=F('attempts') - 1,
+        )
+        return False
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts or options is None:
+            logger.error(f"Job {job.name} #{job.pk} failed permanently: {error}")
+            Job.objects.filter(pk=job.pk, worker=job.worker).update(
+                status=Job.DEAD, last_error=error, leased_until=None, finished_at=timezone.now(),
+            )
+        else:
+            retry_at = timezone.now() + backoff(options, job.attempts)
+            logger.warning(f"Job {job.name} #{job.pk} failed (attempt {job.attempts}), retrying at {retry_at}")
+            Job.objects.filter(pk=job.pk, worker=job.worker).update(
+                status=Job.PENDING, last_error=error, leased_until=None, run_at=retry_at,
+            )
+        return False
+
+    Job.objects.filter(pk=job.pk, worker=job.worker).update(
+        status=Job.DONE, leased_until=None, finished_at=timezone.now(),
+    )
+    return True
+
+
+def run_job_by_id(job_id, worker):
+    """Claim and run one specific job (used for eager execution)"""
+    from .models import Job
+
+    now = timezone.now()
+    options = _registry.get(Job.objects.filter(pk=job_id).values_list('name', flat=True).first())
+    lease_seconds = options['lease_seconds'] if options else 300
+    updated = Job.objects.filter(Q(pk=job_id) & _ready_filter(now)).update(
+        status=Job.RUNNING, leased_until=now + timedelta(seconds=lease_seconds), worker=worker,
+        attempts=F('attempts') + 1,
+    )
+    if not updated:
+        return False
+    return run_job(Job.objects.get(pk=job_id))
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def purge_finished(days=7):
+    """Delete finished jobs older than `days` (dead jobs are kept for inspection)"""
+    from .models import Job
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Job.objects.filter(status=Job.DONE, finished_at__lt=cutoff).delete()
+    return deleted
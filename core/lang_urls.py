@@ -0,0 +1,152 @@
+"""
+Language-aware URL generation behind the lang_url template tag.
+
+Serbian and English pages use different path segments (teme/topics,
+o-nama/about, ...; see core.translated_urls). reverse() walks the resolver
+for every call, which adds up for a tag that runs for every nav entry and
+every topic card.
+
+The first time a (language, view name) pair is used it is reversed once with
+placeholder arguments and compiled into a route: a format string plus the
+path converters of its arguments. Later calls validate the arguments against
+the converters and format the string. Formatted URLs are also kept in a
+bounded memo, so URLs repeated on a page (nav dropdowns, recent topics) are
+a single dictionary lookup.
+"""
+import re
+import threading
+from functools import lru_cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import reverse, resolve, get_script_prefix, NoReverseMatch, Resolver404
+from django.urls.converters import get_converters
+from django.utils import translation
+from django.utils.http import RFC3986_SUBDELIMS, quote
+
+# Placeholder arguments used when compiling a route (valid for str/slug/path converters)
+PLACEHOLDER = 'langurlarg{}x'
+
+# Formatted URL memo size (a page needs a few dozen distinct URLs)
+MEMO_SIZE = 4096
+
+_ROUTE_CONVERTER = re.compile(r'<(?:(?P<converter>[^>:]+):)?(?P<parameter>[^>]+)>')
+_UNCOMPILED = object()
+
+_routes = {}
+_routes_lock = threading.Lock()
+
+
+def reverse_uncompiled(lang, view_name, args=()):
+    """
+    Reverse a view name for a language with reverse().
+    Used to compile routes and for views whose arguments cannot be compiled.
+    """
+    with translation.override(lang):
+        try:
+            return reverse(view_name, args=args)
+        except NoReverseMatch:
+            return '#'
+
+
+def _compile_route(lang, view_name, arg_count):
+    """
+    Compile a (language, view name) pair into (format string, converters).
+
+    Returns:
+        The compiled route, or _UNCOMPILED if the URL has to be reversed on
+        every call (including views whose converters reject the placeholders,
+        e.g. <int:...>, and view names that don't exist)
+    """
+    placeholders = [PLACEHOLDER.format(index) for index in range(arg_count)]
+    url = reverse_uncompiled(lang, view_name, placeholders)
+    if url == '#':
+        return _UNCOMPILED
+
+    # Each argument has to show up exactly once to be formatted back in
+    if any(url.count(placeholder) != 1 for placeholder in placeholders):
+        return _UNCOMPILED
+
+    converters = []
+    if arg_count:
+        prefix = get_script_prefix()
+        try:
+            with translation.override(lang):
+                match = resolve('/' + url[len(prefix):] if url.startswith(prefix) else url)
+        except Resolver404:
+            return _UNCOMPILED
+        available = get_converters()
+        for found in _ROUTE_CONVERTER.finditer(match.route or ''):
+            converter = available.get(found.group('converter') or 'str')
+            if converter is None:
+                return _UNCOMPILED
+            converters.append(converter)
+        if len(converters) != arg_count:
+            return _UNCOMPILED
+
+    template = url.replace('{', '{{').replace('}', '}}')
+    for index, placeholder in enumerate(placeholders):
+        template = template.replace(placeholder, '{%d}' % index)
+    return template, tuple(converters)
+
+
+def _get_route(lang, view_name, arg_count):
+    key = (lang, get_script_prefix(), view_name, arg_count)
+    try:
+        return _routes[key]
+    except KeyError:
+        pass
+    with _routes_lock:
+        if key not in _routes:
+            _routes[key] = _compile_route(lang, view_name, arg_count)
+        return _routes[key]
+
+
+def _format_route(route, args):
+    """Validate arguments against the route converters and fill them in"""
+    template, converters = route
+    values = []
+    for converter, arg in zip(converters, args):
+        try:
+            text = str(converter.to_url(arg))
+        except ValueError:
+            return '#'
+        if not re.fullmatch(converter.regex, text):
+            return '#'
+        values.append(quote(text, safe=RFC3986_SUBDELIMS + '/~:@'))
+    return template.format(*values)
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _memoized_url(lang, script_prefix, view_name, args):
+    route = _get_route(lang, view_name, len(args))
+    if route is _UNCOMPILED:
+        return reverse_uncompiled(lang, view_name, args)
+    return _format_route(route, args)
+
+
+def language_url(lang, view_name, args=()):
+    """
+    Language-aware URL for a view.
+
+    Args:
+        lang: Active language code
+        view_name: Logical view name (e.g. 'topics:topic_detail', 'core:about')
+        args: Positional URL arguments
+
+    Returns:
+        URL path, or '#' if the view cannot be reversed with these arguments
+    """
+    return _memoized_url(lang, get_script_prefix(), view_name, tuple(str(arg) for arg in args))
+
+
+def clear():
+    """Forget compiled routes and memoized URLs"""
+    with _routes_lock:
+        _routes.clear()
+    _memoized_url.cache_clear()
+
+
+@receiver(setting_changed)
+def _clear_on_setting_change(sender, setting, **kwargs):
+    if setting in ('ROOT_URLCONF', 'LANGUAGES', 'LANGUAGE_CODE'):
+        clear()
@@ -0,0 +1,90 @@
+"""
+Management command to measure language-aware URL generation.
+
+Renders the URLs of a typical page (the two navigation dropdowns, a full page
+of topic cards and the fixed header/footer links) with the uncompiled
+reverse() + rewrite path, the compiled route table and the memoized tag, and
+prints the time per page for each.
+
+Usage:
+    python manage.py benchmark_lang_url
+    python manage.py benchmark_lang_url --pages 500 --language en
+"""
+import timeit
+from django.core.management.base import BaseCommand
+from django.utils import translation
+from core import lang_urls
+from topics.models import TopicCard
+from topics.languages import normalize_language
+
+FIXED_VIEWS = [
+    'core:home', 'core:about', 'core:contact', 'topics:category_list', 'topics:search',
+    'accounts:login', 'accounts:register', 'accounts:account',
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark language-aware URL generation (lang_url) per page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=200, help='Number of simulated pages per run')
+        parser.add_argument('--language', default='sr-latn', help='Language to generate URLs for')
+
+    def handle(self, *args, **options):
+        lang = options['language']
+        pages = options['pages']
+        
+        with translation.override(lang):
+            calls = self._page_calls(normalize_language(lang))
+            self.stdout.write(f'{len(calls)} URLs per page, {pages} pages per run')
+            
+            def uncompiled():
+                for view_name, view_args in calls:
+                    lang_urls.reverse_uncompiled(lang, view_name, view_args)
+            
+            def compiled():
+                for view_name, view_args in calls:
+                    route = lang_urls._get_route(lang, view_name, len(view_args))
+                    if route is None:
+                        continue
+                    if route is lang_urls._UNCOMPILED:
+                        lang_urls.reverse_uncompiled(lang, view_name, view_args)
+                    else:
+                        lang_urls._format_route(route, view_args)
+            
+            def memoized():
+                for view_name, view_args in calls:
+                    lang_urls.language_url(lang, view_name, view_args)
+            
+            lang_urls.clear()
+            # Warm up the route table and the memo
+            compiled()
+            memoized()
+            
+            results = []
+            for label, func in (('uncompiled', uncompiled), ('compiled', compiled), ('memoized', memoized)):
+                seconds = min(timeit.repeat(func, number=pages, repeat=3))
+                results.append((label, seconds / pages * 1e6))
+        
+        baseline = results[0][1]
+        for label, per_page in results:
+            self.stdout.write(f'{label:>11}: {per_page:9.1f} us/page ({baseline / per_page:5.1f}x)')
+        self.stdout.write(
+            self.style.SUCCESS(f'Saving per page: {baseline - results[-1][1]:.1f} us')
+        )
+
+    def _page_calls(self, lang):
+        """(view name, args) pairs a category page generates"""
+        cards = list(
+            TopicCard.objects.filter(language=lang).exclude(category_slug='')
+            .values_list('category_slug', 'slug')[:24]
+        )
+        category_slugs = sorted({category_slug for category_slug, _ in cards}) or ['kategorija']
+        if not cards:
+            cards = [('kategorija', f'tema-{index}') for index in range(24)]
+        
+        calls = [(view_name, ()) for view_name in FIXED_VIEWS]
+        # Desktop and mobile navigation dropdowns
+        calls += [('topics:category_detail', (slug,)) for slug in category_slugs] * 2
+        calls += [('topics:topic_detail', card) for card in cards]
+        return calls
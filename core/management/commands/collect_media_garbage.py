@@ -0,0 +1,39 @@
+"""
+Management command running a media garbage collection sweep (see core.media_gc).
+Deletes tombstoned files older than the grace period that nothing uses.
+The run_jobs worker queues the same sweep every hour.
+
+Usage:
+    python manage.py collect_media_garbage --dry-run
+    python manage.py collect_media_garbage
+    python manage.py collect_media_garbage --grace-hours 1
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from core.circuit_breaker import CircuitOpenError
+from core.media_gc import sweep
+
+
+class Command(BaseCommand):
+    help = 'Delete tombstoned media files past their grace period that are not referenced'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+        parser.add_argument('--grace-hours', type=float, default=None,
+                            help='Grace period in hours (default MEDIA_GC_GRACE_SECONDS)')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        grace = timedelta(hours=options['grace_hours']) if options['grace_hours'] is not None else None
+        self.stdout.write(f"Collecting media garbage{' (dry run)' if dry_run else ''}...")
+        
+        try:
+            stats = sweep(dry_run=dry_run, grace=grace, progress=self.stdout.write)
+        except CircuitOpenError as e:
+            raise CommandError(f'Storage unavailable, try again later: {e}')
+        
+        action = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {stats['deleted']} files of {stats['tombstones']} tombstones "
+            f"({stats['live']} still in use, {stats['failed']} failed)"
+        ))
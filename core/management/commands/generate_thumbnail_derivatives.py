@@ -0,0 +1,36 @@
+"""
+Management command to queue responsive derivatives for existing thumbnails.
+New uploads get their derivatives automatically; this backfills thumbnails
+uploaded before derivatives existed (or all of them with --all, e.g. after
+changing THUMBNAIL_WIDTHS).
+
+Usage:
+    python manage.py generate_thumbnail_derivatives
+    python manage.py generate_thumbnail_derivatives --all
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.thumbnails import queue_derivatives
+from topics.models import Topic, Category
+
+
+class Command(BaseCommand):
+    help = 'Queue responsive derivative generation for topic and category thumbnails'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Regenerate for every thumbnail, not only those without derivatives')
+
+    def handle(self, *args, **options):
+        count = 0
+        with transaction.atomic():
+            for model in (Category, Topic):
+                objects = model.objects.exclude(thumbnail='').only('thumbnail', 'thumbnail_derivatives')
+                for instance in objects.iterator(chunk_size=500):
+                    if options['all'] or not instance.thumbnail_derivatives:
+                        queue_derivatives(instance)
+                        count += 1
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Queued derivative generation for {count} thumbnails')
+        )
@@ -0,0 +1,26 @@
+"""
+Management command to rebuild the image reference index.
+The index is updated on every save and delete, so this is only needed after
+bulk imports or direct database changes.
+
+Usage:
+    python manage.py rebuild_image_references
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.image_references import rebuild_references
+from topics.models import Topic, Category
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the index of media files referenced by topics and categories'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding image references...')
+        
+        with transaction.atomic():
+            count = rebuild_references([Topic, Category])
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully indexed {count} references')
+        )
@@ -0,0 +1,53 @@
+"""
+Management command to reconcile the media bucket against the database.
+Deletes uploads and thumbnails that no topic or category references.
+Runs as a dry run unless --delete is given.
+
+Usage:
+    python manage.py reconcile_media
+    python manage.py reconcile_media --delete --min-age-hours 48
+    python manage.py reconcile_media --delete --checkpoint /tmp/reconcile.json
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.media_reconcile import MEDIA_PREFIXES, reconcile_media
+
+
+class Command(BaseCommand):
+    help = 'Delete media files in the bucket that are not referenced by any topic or category'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true', help='Delete orphaned files (default is a dry run)')
+        parser.add_argument('--min-age-hours', type=float, default=24,
+                            help='Skip files modified more recently than this (default 24)')
+        parser.add_argument('--checkpoint', default='',
+                            help='Checkpoint file for resuming an interrupted run')
+        parser.add_argument('--prefix', action='append', dest='prefixes',
+                            help=f'Media prefix to reconcile (repeatable, default: {", ".join(MEDIA_PREFIXES)})')
+        parser.add_argument('--workers', type=int, default=None, help='Parallel delete requests')
+
+    def handle(self, *args, **options):
+        if settings.DEBUG or not settings.AWS_ACCESS_KEY_ID:
+            raise CommandError('Media reconciliation needs the R2 (S3) media storage.')
+        
+        dry_run = not options['delete']
+        self.stdout.write(f"Reconciling media{' (dry run)' if dry_run else ''}...")
+        
+        stats = reconcile_media(
+            prefixes=tuple(options['prefixes'] or MEDIA_PREFIXES),
+            dry_run=dry_run,
+            min_age=timedelta(hours=options['min_age_hours']),
+            checkpoint_path=options['checkpoint'] or None,
+            workers=options['workers'],
+            progress=self.stdout.write,
+        )
+        
+        self.stdout.write(
+            f"Listed {stats['listed']}: {stats['referenced']} referenced, {stats['young']} too recent, "
+            f"{stats['protected']} referenced on recheck"
+        )
+        action = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(
+            self.style.SUCCESS(f"{action} {stats['deleted']} orphaned files ({stats['failed']} failed)")
+        )
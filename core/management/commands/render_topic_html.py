@@ -0,0 +1,26 @@
+"""
+Management command to re-render the topic translation rows, including the
+render-ready description HTML (see core.body_html).
+Needed after rotating SECRET_KEY (the srcset URLs are signed) or changing
+RESIZED_IMAGE_WIDTHS; rows are otherwise rendered on every topic save.
+
+Usage:
+    python manage.py render_topic_html
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from topics.translations import rebuild_translations
+
+
+class Command(BaseCommand):
+    help = 'Re-render the translation rows and description HTML of all topics'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rendering topic HTML...')
+        
+        with transaction.atomic():
+            count = rebuild_translations()
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rendered {count} translation rows')
+        )
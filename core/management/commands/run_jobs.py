@@ -0,0 +1,106 @@
+"""
+Management command running the background job worker (see core.jobs).
+Leases ready jobs and runs them in a thread pool until stopped.
+Every hour it also purges finished jobs and queues a media garbage
+collection sweep (see core.media_gc).
+
+Jobs purge cached pages and the navigation (e.g. after generating thumbnail
+derivatives), so the worker must use the same cache as the web service: it
+warns on start when the cache is local to its own process or instance.
+
+Usage:
+    python manage.py run_jobs
+    python manage.py run_jobs --concurrency 8 --poll-interval 1
+    python manage.py run_jobs --once
+"""
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from core.jobs import claim_jobs, purge_finished, registered_tasks, run_job, worker_name
+from core.media_gc import schedule_sweep
+
+# Finished jobs are purged, and media garbage collected, at most once per hour
+PURGE_INTERVAL = 60 * 60
+
+# Cache backends the web service can't see the worker's changes in
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def _run_in_thread(job):
+    try:
+        return run_job(job)
+    finally:
+        # Each thread has its own database connection
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Jobs run at once (default 4)')
+        parser.add_argument('--poll-interval', type=float, default=2,
+                            help='Seconds to wait when no job is ready (default 2)')
+        parser.add_argument('--once', action='store_true', help='Run the ready jobs and exit')
+
+    def handle(self, *args, **options):
+        concurrency = max(options['concurrency'], 1)
+        worker = worker_name()
+        stopping = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write('Stopping after running jobs finish...')
+            stopping.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        if settings.CACHES['default']['BACKEND'] in LOCAL_CACHE_BACKENDS:
+            self.stderr.write(self.style.WARNING(
+                "The default cache is local to this worker: page and navigation purges "
+                "made by jobs won't reach the web service (see CACHES in settings)"
+            ))
+        self.stdout.write(f"Worker {worker} running tasks: {', '.join(sorted(registered_tasks()))}")
+        processed = failed = 0
+        last_purge = 0
+        running = set()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while not stopping.is_set():
+                close_old_connections()
+                if time.monotonic() - last_purge > PURGE_INTERVAL:
+                    purge_finished()
+                    schedule_sweep()
+                    last_purge = time.monotonic()
+
+                jobs = claim_jobs(worker, concurrency - len(running)) if len(running) < concurrency else []
+                for job in jobs:
+                    running.add(executor.submit(_run_in_thread, job))
+
+                if not running:
+                    if options['once']:
+                        break
+                    stopping.wait(options['poll_interval'])
+                    continue
+
+                done, running = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    processed += 1
+                    if not future.result():
+                        failed += 1
+
+            # Let leased jobs finish instead of waiting for their leases to expire
+            for future in wait(running).done:
+                processed += 1
+                if not future.result():
+                    failed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} jobs ({failed} failed)'))
@@ -0,0 +1,158 @@
+"""
+Mark-and-sweep garbage collection of media files.
+
+Files that may have become garbage get a tombstone (MediaTombstone) instead
+of being deleted on the spot:
+- every CKEditor upload, when it is stored (it is garbage unless content
+  using it is saved within the grace period)
+- images removed from an object's content or thumbnail
+- all images of a deleted object
+
+Tombstones are written in the transaction of the change, so a rolled back
+save leaves none, and a committed one can't lose them.
+
+The sweep (collect_media_garbage command, or the core.collect_media_garbage
+job the worker queues every hour) handles tombstones older than
+MEDIA_GC_GRACE_SECONDS in batches of MEDIA_GC_BATCH_SIZE:
+1. mark: paths referenced by saved content (the ImageReference index), and
+   paths tombstoned again within the grace period (e.g. the same image
+   uploaded again), are live
+2. sweep: the remaining files are deleted from storage in one batched request
+3. the batch's tombstones are deleted
+
+Selecting and marking a batch, and deleting its tombstones, are two short
+transactions; the storage requests run between them, outside any
+transaction, so no row locks are held while waiting on the network. A crash
+in between leaves the tombstones, and the next sweep repeats the batch;
+deleting a file again is harmless, so sweeps are idempotent (two sweeps
+running at once may also send the same deletions). Files that failed to
+delete keep their tombstones and are retried by the next sweep.
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SWEEP_TASK = 'core.collect_media_garbage'
+
+
+def grace_period():
+    return timedelta(seconds=getattr(settings, 'MEDIA_GC_GRACE_SECONDS', 24 * 60 * 60))
+
+
+def batch_size():
+    return getattr(settings, 'MEDIA_GC_BATCH_SIZE', 1000)
+
+
+def tombstone(paths, reason):
+    """
+    Record files that may be garbage (in the current transaction).
+
+    Args:
+        paths: Storage names of the files
+        reason: MediaTombstone reason (UPLOAD, REMOVED or DELETED)
+    """
+    from .models import MediaTombstone
+
+    paths = {path.lstrip('/') for path in paths if path}
+    if paths:
+        MediaTombstone.objects.bulk_create(
+            MediaTombstone(file_path=path, reason=reason) for path in sorted(paths)
+        )
+
+
+def mark(paths, cutoff):
+    """
+    Live paths among the given ones.
+
+    Args:
+        paths: Candidate paths (tombstoned before the cutoff)
+        cutoff: End of the grace period; paths tombstoned after it are still in use
+
+    Returns:
+        Set of paths that must be kept
+    """
+    from .image_references import referenced_paths
+    from .models import MediaTombstone
+
+    live = referenced_paths(paths)
+    live |= set(
+        MediaTombstone.objects.filter(file_path__in=paths, created_at__gt=cutoff)
+        .values_list('file_path', flat=True)
+    )
+    return live
+
+
+def sweep(dry_run=False, grace=None, progress=None):
+    """
+    Delete the files of tombstones older than the grace period, unless they are live.
+
+    Args:
+        dry_run: Only count and log what would be deleted (tombstones are kept)
+        grace: Grace period (defaults to MEDIA_GC_GRACE_SECONDS)
+        progress: Optional callable receiving a status line after each batch
+
+    Returns:
+        Dict of counters (tombstones, live, deleted, failed)
+
+    Raises:
+        CircuitOpenError: If the storage is down (handled batches stay handled)
+    """
+    from .batch_delete import delete_files
+    from .models import MediaTombstone
+
+    cutoff = timezone.now() - (grace if grace is not None else grace_period())
+    stats = dict.fromkeys(('tombstones', 'live', 'deleted', 'failed'), 0)
+    last_id = 0
+
+    while True:
+        with transaction.atomic():
+            # skip_locked: tombstones being written by a running save are left for the next batch
+            batch = list(
+                MediaTombstone.objects.select_for_update(skip_locked=True)
+                .filter(pk__gt=last_id, created_at__lte=cutoff)
+                .order_by('pk')[:batch_size()]
+            )
+            if not batch:
+                break
+            paths = {item.file_path for item in batch}
+            live = mark(paths, cutoff)
+        last_id = batch[-1].pk
+        stats['tombstones'] += len(batch)
+        garbage = paths - live
+        stats['live'] += len(live)
+
+        if dry_run:
+            stats['deleted'] += len(garbage)
+            for path in sorted(garbage):
+                logger.info(f"Would delete {path}")
+        else:
+            result = delete_files(garbage) if garbage else {'deleted': set(), 'errors': {}}
+            stats['deleted'] += len(result['deleted'])
+            stats['failed'] += len(result['errors'])
+            # Failed files keep their tombstones for the next sweep
+            handled = [item.pk for item in batch if item.file_path not in result['errors']]
+            with transaction.atomic():
+                MediaTombstone.objects.filter(pk__in=handled).delete()
+
+        if progress:
+            progress(f"{stats['tombstones']} tombstones, {stats['deleted']} "
+                     f"{'to delete' if dry_run else 'deleted'}, {stats['live']} live")
+
+    logger.info(
+        f"Media GC: {stats['tombstones']} tombstones, {stats['live']} live, "
+        f"{stats['deleted']} {'to delete' if dry_run else 'deleted'}, {stats['failed']} failed"
+    )
+    return stats
+
+
+def schedule_sweep():
+    """Queue a sweep job unless one is already waiting or running (called by the run_jobs worker)"""
+    from .jobs import enqueue
+    from .models import Job
+
+    if not Job.objects.filter(name=SWEEP_TASK, status__in=(Job.PENDING, Job.RUNNING)).exists():
+        enqueue(SWEEP_TASK)
@@ -0,0 +1,192 @@
+"""
+Full-bucket media reconciliation.
+
+Lists the media prefixes of the bucket page by page (list_objects_v2, 1000
+keys per page) and deletes objects that no saved object references.
+
+Memory stays flat regardless of the bucket size:
+- The listing is streamed; only the current page (at most 1000 keys) and
+  its orphan candidates are held.
+- Referenced paths (from the ImageReference index) are kept as a sorted
+  array of 64-bit hashes, 8 bytes per reference. A key whose hash is in the
+  array is kept. A hash collision can only keep an orphan, never delete a
+  used file.
+- Keys that are not in the array are checked exactly against the database
+  right before deletion, which also protects files referenced by content
+  saved while the run is in progress.
+
+Progress is written to a checkpoint file after each page, so an interrupted
+run resumes after the last processed key (StartAfter), not from the start.
+"""
+import hashlib
+import json
+import logging
+import os
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from .batch_delete import delete_files
+
+logger = logging.getLogger(__name__)
+
+# Prefixes (relative to the media root) that hold uploaded media
+MEDIA_PREFIXES = ('uploads/', 'topics/thumbnails/', 'categories/thumbnails/')
+
+
+def path_hash(path):
+    """64-bit hash of a storage path"""
+    return int.from_bytes(hashlib.blake2b(path.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class ReferenceSet:
+    """Sorted array of 64-bit path hashes with binary-search membership"""
+
+    def __init__(self, hashes):
+        self._hashes = array('Q', sorted(set(hashes)))
+
+    @classmethod
+    def from_database(cls):
+        from .models import ImageReference
+        paths = ImageReference.objects.values_list('file_path', flat=True).distinct().iterator(chunk_size=5000)
+        return cls(path_hash(path) for path in paths)
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def __contains__(self, path):
+        value = path_hash(path)
+        index = bisect_left(self._hashes, value)
+        return index < len(self._hashes) and self._hashes[index] == value
+
+    @property
+    def nbytes(self):
+        return self._hashes.itemsize * len(self._hashes)
+
+
+def load_checkpoint(path):
+    """Checkpoint: {prefix: last processed key or None when the prefix is done}"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, state):
+    if not path:
+        return
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def iter_pages(client, bucket_name, prefix, start_after=None):
+    """Yield pages (lists of object dicts) of a prefix listing"""
+    kwargs = {'Bucket': bucket_name, 'Prefix': prefix, 'MaxKeys': 1000}
+    if start_after:
+        kwargs['StartAfter'] = start_after
+    while True:
+        response = client.list_objects_v2(**kwargs)
+        yield response.get('Contents', [])
+        if not response.get('IsTruncated'):
+            return
+        kwargs.pop('StartAfter', None)
+        kwargs['ContinuationToken'] = response['NextContinuationToken']
+
+
+def _delete_orphans(candidates, dry_run, workers, stats, cutoff):
+    """Exact database check, then batched delete of the remaining candidates"""
+    from .media_gc import mark
+    from .models import MediaTombstone
+
+    if not candidates:
+        return
+    # Referenced paths, and paths tombstoned within the grace period: a repeated
+    # content-addressed upload reuses the stored object without changing its LastModified
+    orphans = set(candidates) - mark(set(candidates), cutoff)
+    stats['protected'] += len(candidates) - len(orphans)
+    if dry_run:
+        stats['deleted'] += len(orphans)
+        for path in sorted(orphans):
+            logger.info(f"Would delete {path}")
+        return
+    result = delete_files(orphans, max_workers=workers)
+    stats['deleted'] += len(result['deleted'])
+    stats['failed'] += len(result['errors'])
+
+    # Tombstones of deleted files are no longer needed
+    MediaTombstone.objects.filter(file_path__in=result['deleted']).delete()
+
+
+def reconcile_media(prefixes=MEDIA_PREFIXES, dry_run=True, min_age=timedelta(days=1),
+                    checkpoint_path=None, workers=None, progress=None):
+    """
+    Delete bucket objects under the media prefixes that nothing references.
+
+    Args:
+        prefixes: Media prefixes to reconcile (relative to the media root)
+        dry_run: Only count and log what would be deleted
+        min_age: Objects modified more recently are skipped (uploads in progress)
+        checkpoint_path: JSON file to resume from and to record progress in (ignored in dry runs)
+        workers: Parallel DeleteObjects requests (defaults to STORAGE_DELETE_WORKERS)
+        progress: Optional callable receiving a status line after each page
+
+    Returns:
+        Dict of counters (listed, referenced, young, protected, deleted, failed)
+    """
+    from storages.utils import clean_name
+
+    storage = default_storage
+    client = storage.connection.meta.client
+    bucket_name = storage.bucket_name
+    location = storage._normalize_name('')
+    location = f'{location.rstrip("/")}/' if location else ''
+
+    references = ReferenceSet.from_database()
+    logger.info(f"Loaded {len(references)} referenced paths ({references.nbytes} bytes)")
+
+    if dry_run:
+        # A dry run must not make a later real run skip keys
+        checkpoint_path = None
+    cutoff = timezone.now() - min_age
+    state = load_checkpoint(checkpoint_path)
+    stats = dict.fromkeys(('listed', 'referenced', 'young', 'protected', 'deleted', 'failed'), 0)
+
+    for prefix in prefixes:
+        if prefix in state and state[prefix] is None:
+            continue  # Finished in an earlier run
+
+        key_prefix = storage._normalize_name(clean_name(prefix))
+        if prefix.endswith('/') and not key_prefix.endswith('/'):
+            key_prefix += '/'
+
+        for page in iter_pages(client, bucket_name, key_prefix, state.get(prefix)):
+            candidates = []
+            for obj in page:
+                stats['listed'] += 1
+                path = obj['Key'][len(location):]
+                if path in references:
+                    stats['referenced'] += 1
+                elif obj['LastModified'] > cutoff:
+                    stats['young'] += 1
+                else:
+                    candidates.append(path)
+
+            # Everything up to the last key of the page is handled (a page has at most 1000 keys)
+            _delete_orphans(candidates, dry_run, workers, stats, cutoff)
+            if page:
+                state[prefix] = page[-1]['Key']
+                save_checkpoint(checkpoint_path, state)
+            if progress:
+                progress(f"{prefix}: {stats['listed']} listed, {stats['deleted']} "
+                         f"{'to delete' if dry_run else 'deleted'}")
+
+        state[prefix] = None
+        save_checkpoint(checkpoint_path, state)
+
+    # A complete run starts from scratch next time
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return stats
@@ -0,0 +1,77 @@
+"""
+Canonical URL and storage instrumentation middleware.
+
+Translated routes (see core.translated_urls) only resolve in their own
+language, so an old link or a hand-typed URL with segments of another
+language (/en/teme/, /sr-latn/about/) ends in a 404. This middleware turns
+such 404s into one permanent, cacheable redirect to the canonical path,
+replacing the per-view redirect checks.
+
+StorageStatsMiddleware counts the R2 calls each request makes (see
+core.storage_stats).
+"""
+import logging
+from django.http import HttpResponsePermanentRedirect
+from django.utils import translation
+from django.utils.cache import patch_cache_control
+from . import storage_stats
+from .translated_urls import translate_path
+
+logger = logging.getLogger(__name__)
+
+# Browsers and proxies may cache the redirect for a day
+REDIRECT_MAX_AGE = 24 * 60 * 60
+
+
+class CanonicalPathMiddleware:
+    """Redirect paths with path segments of another language to the canonical URL"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.status_code != 404 or request.method not in ('GET', 'HEAD'):
+            return response
+
+        lang = translation.get_language_from_path(request.path_info)
+        if not lang:
+            # Paths without a language prefix are handled by LocaleMiddleware
+            return response
+
+        target = translate_path(request.path_info, lang)
+        if not target or target == request.path:
+            return response
+
+        query_string = request.META.get('QUERY_STRING', '')
+        if query_string:
+            target = f'{target}?{query_string}'
+        redirect = HttpResponsePermanentRedirect(target)
+        patch_cache_control(redirect, public=True, max_age=REDIRECT_MAX_AGE)
+        return redirect
+
+
+class StorageStatsMiddleware:
+    """
+    Count the storage calls of each request. Requests that made any are
+    logged (debug level), and staff see the totals in a Server-Timing header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats, tokens = storage_stats.start_request(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            storage_stats.end_request(tokens)
+
+        if stats.calls:
+            logger.debug(f"{request.method} {request.path}: storage {stats.summary()}")
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_staff:
+                response['Server-Timing'] = (
+                    f'storage;dur={stats.seconds * 1000:.1f};desc="{stats.calls} storage calls"'
+                )
+        return response
@@ -0,0 +1,95 @@
+# Generated by Django 4.2.27 on 2026-10-18 06:13
+
+import re
+from urllib.parse import urlparse
+from django.db import migrations, models
+
+
+# Frozen copies of the core.image_references / core.utils helpers as of this
+# migration, so later changes to those modules don't change what it does
+
+LANGUAGE_SUFFIXES = {'sr-latn': '', 'sr-cyrl': '_sr_cyrl', 'en': '_en'}
+
+HTML_FIELDS = ('short_description', 'full_description')
+
+IMG_SRC_PATTERN = re.compile(r'<img[^>]+src=["\']([^"\']+)["\']', re.IGNORECASE)
+
+
+def extract_images_from_html(html_content):
+    """uploads/ paths of the images in description HTML"""
+    paths = set()
+    for url in IMG_SRC_PATTERN.findall(html_content or ''):
+        path = urlparse(url).path
+        if path.startswith('/'):
+            path = path[1:]
+        if '/media/' in path:
+            path = path.split('/media/')[1]
+        elif path.startswith('media/'):
+            path = path[6:]
+        if path.startswith('uploads/'):
+            paths.add(path)
+    return paths
+
+
+def instance_references(instance):
+    references = set()
+    if instance.thumbnail:
+        references.add((instance.thumbnail.name.lstrip('/'), 'thumbnail', ''))
+    for base_name in HTML_FIELDS:
+        for lang, suffix in LANGUAGE_SUFFIXES.items():
+            field_name = f'{base_name}{suffix}'
+            for path in extract_images_from_html(getattr(instance, field_name, None)):
+                references.add((path, field_name, lang))
+    return references
+
+
+def populate_image_references(apps, schema_editor):
+    ImageReference = apps.get_model('core', 'ImageReference')
+    for model_class in (apps.get_model('topics', 'Topic'), apps.get_model('topics', 'Category')):
+        batch = []
+        for instance in model_class.objects.iterator(chunk_size=100):
+            batch.extend(
+                ImageReference(
+                    file_path=path, model_name=model_class._meta.label, object_id=instance.pk,
+                    field_name=field_name, language=lang,
+                )
+                for path, field_name, lang in instance_references(instance)
+            )
+            if len(batch) >= 500:
+                ImageReference.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        if batch:
+            ImageReference.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('topics', '0009_topictranslation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_path', models.CharField(max_length=500, verbose_name='Putanja fajla')),
+                ('model_name', models.CharField(max_length=100, verbose_name='Model')),
+                ('object_id', models.PositiveIntegerField(verbose_name='ID instance')),
+                ('field_name', models.CharField(max_length=100, verbose_name='Polje')),
+                ('language', models.CharField(blank=True, max_length=10, verbose_name='Jezik')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Kreirano')),
+            ],
+            options={
+                'verbose_name': 'Referenca slike',
+                'verbose_name_plural': 'Reference slika',
+                'indexes': [models.Index(fields=['model_name', 'object_id'], name='core_imageref_object_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='imagereference',
+            constraint=models.UniqueConstraint(fields=('file_path', 'model_name', 'object_id', 'field_name'), name='core_imagereference_unique'),
+        ),
+        migrations.RunPython(populate_image_references, migrations.RunPython.noop),
+    ]
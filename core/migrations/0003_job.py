@@ -0,0 +1,50 @@
+# Generated by Django 4.2.27 on 2026-10-18 06:17
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_imagereference'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Zadatak')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Podaci')),
+                ('status', models.CharField(choices=[('pending', 'Na čekanju'), ('running', 'U toku'), ('done', 'Završen'), ('dead', 'Neuspešan')], default='pending', max_length=10, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Pokušaji')),
+                ('max_attempts', models.PositiveIntegerField(default=5, verbose_name='Maksimalno pokušaja')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Pokreni u')),
+                ('leased_until', models.DateTimeField(blank=True, null=True, verbose_name='Zauzet do')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='Worker')),
+                ('last_error', models.TextField(blank=True, verbose_name='Poslednja greška')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Kreirano')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Završeno')),
+            ],
+            options={
+                'verbose_name': 'Posao',
+                'verbose_name_plural': 'Poslovi',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'run_at'], name='core_job_ready_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DeadJob',
+            fields=[
+            ],
+            options={
+                'verbose_name': 'Neuspešan posao',
+                'verbose_name_plural': 'Neuspešni poslovi',
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('core.job',),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.27 on 2026-10-18 06:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ckeditorupload',
+            name='original_size',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Originalna veličina'),
+        ),
+        migrations.AddField(
+            model_name='ckeditorupload',
+            name='stored_size',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Sačuvana veličina'),
+        ),
+    ]
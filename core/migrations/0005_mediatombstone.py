@@ -0,0 +1,43 @@
+# Generated by Django 4.2.27 on 2026-10-18 06:37
+
+from django.db import migrations, models
+
+
+def tombstone_unused_uploads(apps, schema_editor):
+    # Uploads the old tracking table still listed were not used by saved content;
+    # their grace period starts now
+    CkeditorUpload = apps.get_model('core', 'CkeditorUpload')
+    MediaTombstone = apps.get_model('core', 'MediaTombstone')
+    paths = CkeditorUpload.objects.filter(is_used=False).values_list('file_path', flat=True)
+    MediaTombstone.objects.bulk_create(
+        (MediaTombstone(file_path=path, reason=1) for path in paths.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_ckeditorupload_sizes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_path', models.CharField(db_index=True, max_length=500, verbose_name='Putanja fajla')),
+                ('reason', models.PositiveSmallIntegerField(choices=[(1, 'Upload'), (2, 'Uklonjen iz sadržaja'), (3, 'Obrisan objekat')], verbose_name='Razlog')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Kreirano')),
+            ],
+            options={
+                'verbose_name': 'Fajl za brisanje',
+                'verbose_name_plural': 'Fajlovi za brisanje',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.RunPython(tombstone_unused_uploads, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='CkeditorUpload',
+        ),
+    ]
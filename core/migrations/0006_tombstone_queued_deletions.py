@@ -0,0 +1,30 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:10
+
+from django.db import migrations
+
+
+def tombstone_queued_deletions(apps, schema_editor):
+    # The core.delete_files task is gone: files its unfinished jobs were still
+    # going to delete are left to the media garbage collector instead
+    Job = apps.get_model('core', 'Job')
+    MediaTombstone = apps.get_model('core', 'MediaTombstone')
+    jobs = Job.objects.filter(name='core.delete_files').exclude(status='done')
+    paths = set()
+    for payload in jobs.values_list('payload', flat=True).iterator():
+        paths.update(path.lstrip('/') for path in payload.get('paths', []) if path)
+    MediaTombstone.objects.bulk_create(
+        (MediaTombstone(file_path=path, reason=3) for path in sorted(paths)),
+        batch_size=1000,
+    )
+    jobs.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_mediatombstone'),
+    ]
+
+    operations = [
+        migrations.RunPython(tombstone_queued_deletions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.27 on 2026-10-18 07:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_tombstone_queued_deletions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadOptimization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_path', models.CharField(max_length=500, unique=True, verbose_name='Putanja fajla')),
+                ('original_size', models.PositiveIntegerField(verbose_name='Originalna veličina')),
+                ('stored_size', models.PositiveIntegerField(verbose_name='Sačuvana veličina')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Kreirano')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Ažurirano')),
+            ],
+            options={
+                'verbose_name': 'Optimizacija uploada',
+                'verbose_name_plural': 'Optimizacije uploada',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
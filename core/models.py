@@ -1,6 +1,97 @@
+import copy
 from django.db import models
 from django.utils.translation import gettext_lazy as _
-from django.contrib.auth.models import User
+from django.utils import timezone
+
+
+def _comparable(value):
+    """Files compare by their storage name, everything else by value"""
+    if isinstance(value, models.fields.files.FieldFile):
+        return value.name or ''
+    if isinstance(value, (dict, list)):
+        # JSON values can be changed in place - keep a copy
+        return copy.deepcopy(value)
+    return value
+
+
+class DirtyFieldsMixin:
+    """
+    Remember the field values an object was loaded with, so save() can tell
+    which fields changed without fetching the old row again.
+
+    The snapshot is taken in from_db() and refreshed after every save().
+    Deferred fields are not in the snapshot; assigning one counts as a change.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot()
+        return instance
+
+    def _snapshot(self, fields=None):
+        """Record the current values of the loaded (non-deferred) concrete fields"""
+        loaded = {} if fields is None else getattr(self, '_loaded_values', {})
+        for field in self._meta.concrete_fields:
+            if fields is not None and field.name not in fields and field.attname not in fields:
+                continue
+            if field.attname in self.__dict__:
+                loaded[field.attname] = _comparable(self.__dict__[field.attname])
+        self._loaded_values = loaded
+
+    def get_dirty_fields(self):
+        """
+        Names of the fields changed since the object was loaded or last saved.
+        Every field counts as changed for objects that were not loaded from the database.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return {field.name for field in self._meta.concrete_fields}
+
+        dirty = set()
+        for field in self._meta.concrete_fields:
+            if field.attname not in self.__dict__:
+                continue  # Deferred and never touched
+            if field.attname not in loaded or _comparable(self.__dict__[field.attname]) != loaded[field.attname]:
+                dirty.add(field.name)
+        return dirty
+
+    def has_changed(self, *field_names):
+        """Whether any of the given fields changed since the object was loaded"""
+        return not self.get_dirty_fields().isdisjoint(field_names)
+
+    def get_previous_instance(self):
+        """
+        Unsaved copy of the object with the values it was loaded with,
+        or None for objects that are not in the database yet.
+        """
+        if self._state.adding or self.pk is None:
+            return None
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            # Built by hand with a pk - the old values are only in the database
+            return type(self)._default_manager.filter(pk=self.pk).first()
+
+        values = dict(loaded)
+        # Deferred fields that were assigned since: load their old values while the row still has them
+        missing = [
+            field.attname for field in self._meta.concrete_fields
+            if field.attname in self.__dict__ and field.attname not in values
+        ]
+        if missing:
+            row = type(self)._default_manager.filter(pk=self.pk).values(*missing).first() or {}
+            values.update(row)
+        # from_db() expects the values in field order
+        field_names = [field.attname for field in self._meta.concrete_fields if field.attname in values]
+        return type(self).from_db(self._state.db, field_names, [values[name] for name in field_names])
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._snapshot(kwargs.get('update_fields'))
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._snapshot(fields)
 
 
 class UserEmail(models.Model):
@@ -20,27 +111,134 @@ class UserEmail(models.Model):
         return f"{self.email} ({self.get_source_display()})"
 
 
-class CkeditorUpload(models.Model):
+class MediaTombstone(models.Model):
+    """
+    Media file that may be garbage since created_at (see core.media_gc).
+    Rows are only appended by saves and uploads; the sweep deletes them once
+    the file is deleted or found to be in use.
+    """
+    UPLOAD = 1
+    REMOVED = 2
+    DELETED = 3
+    REASON_CHOICES = [
+        (UPLOAD, _('Upload')),
+        (REMOVED, _('Uklonjen iz sadržaja')),
+        (DELETED, _('Obrisan objekat')),
+    ]
+
+    file_path = models.CharField(_('Putanja fajla'), max_length=500, db_index=True)
+    reason = models.PositiveSmallIntegerField(_('Razlog'), choices=REASON_CHOICES)
+    created_at = models.DateTimeField(_('Kreirano'), auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = _('Fajl za brisanje')
+        verbose_name_plural = _('Fajlovi za brisanje')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.file_path} ({self.get_reason_display()})"
+
+
+class UploadOptimization(models.Model):
     """
-    Track CKEditor uploads to detect orphaned files.
-    When a file is uploaded to CKEditor, it's tracked here.
-    When a topic is saved, we check if tracked uploads are used.
-    If not used, they're deleted from R2.
+    Sizes of a CKEditor upload before and after optimizing (see core.image_optimizer).
+    One row per stored file, written by the upload request or, for images
+    optimized later, by the job worker.
     """
     file_path = models.CharField(_('Putanja fajla'), max_length=500, unique=True)
-    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
-    uploaded_at = models.DateTimeField(_('Uploadovano'), auto_now_add=True)
-    is_used = models.BooleanField(_('Korišćeno'), default=False)
-    used_in_model = models.CharField(_('Korišćeno u'), max_length=100, blank=True)  # 'Topic'
-    used_in_id = models.IntegerField(_('ID instance'), null=True, blank=True)
-    
+    original_size = models.PositiveIntegerField(_('Originalna veličina'))
+    stored_size = models.PositiveIntegerField(_('Sačuvana veličina'))
+    created_at = models.DateTimeField(_('Kreirano'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('Ažurirano'), auto_now=True)
+
     class Meta:
-        verbose_name = _('CKEditor upload')
-        verbose_name_plural = _('CKEditor uploadi')
-        ordering = ['-uploaded_at']
+        verbose_name = _('Optimizacija uploada')
+        verbose_name_plural = _('Optimizacije uploada')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.file_path} ({self.original_size} -> {self.stored_size} bytes)"
+
+    @property
+    def saved_bytes(self):
+        return self.original_size - self.stored_size
+
+
+class ImageReference(models.Model):
+    """
+    Index of media files referenced by content (see core.image_references).
+    One row per (file, object, field): thumbnails and images embedded in the
+    description HTML of every language. Maintained incrementally on save and
+    delete, so orphan checks are an indexed lookup instead of parsing every topic.
+    """
+    file_path = models.CharField(_('Putanja fajla'), max_length=500)
+    model_name = models.CharField(_('Model'), max_length=100)  # 'topics.Topic'
+    object_id = models.PositiveIntegerField(_('ID instance'))
+    field_name = models.CharField(_('Polje'), max_length=100)  # 'full_description_en'
+    language = models.CharField(_('Jezik'), max_length=10, blank=True)  # '' for thumbnails
+    created_at = models.DateTimeField(_('Kreirano'), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Referenca slike')
+        verbose_name_plural = _('Reference slika')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['file_path', 'model_name', 'object_id', 'field_name'],
+                name='core_imagereference_unique',
+            ),
+        ]
         indexes = [
-            models.Index(fields=['is_used', 'uploaded_at']),
+            models.Index(fields=['model_name', 'object_id'], name='core_imageref_object_idx'),
         ]
 
     def __str__(self):
-        return f"{self.file_path} ({'Used' if self.is_used else 'Unused'})"
+        return f"{self.file_path} ({self.model_name} #{self.object_id}, {self.field_name})"
+
+
+class Job(models.Model):
+    """
+    Background job (see core.jobs). Rows are written in the same transaction
+    as the change that needs them and picked up by the run_jobs worker.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    DEAD = 'dead'
+    STATUS_CHOICES = [
+        (PENDING, _('Na čekanju')),
+        (RUNNING, _('U toku')),
+        (DONE, _('Završen')),
+        (DEAD, _('Neuspešan')),
+    ]
+
+    name = models.CharField(_('Zadatak'), max_length=100)
+    payload = models.JSONField(_('Podaci'), default=dict, blank=True)
+    status = models.CharField(_('Status'), max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(_('Pokušaji'), default=0)
+    max_attempts = models.PositiveIntegerField(_('Maksimalno pokušaja'), default=5)
+    run_at = models.DateTimeField(_('Pokreni u'), default=timezone.now)
+    leased_until = models.DateTimeField(_('Zauzet do'), null=True, blank=True)
+    worker = models.CharField(_('Worker'), max_length=100, blank=True)
+    last_error = models.TextField(_('Poslednja greška'), blank=True)
+    created_at = models.DateTimeField(_('Kreirano'), auto_now_add=True)
+    finished_at = models.DateTimeField(_('Završeno'), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _('Posao')
+        verbose_name_plural = _('Poslovi')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='core_job_ready_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
+
+
+class DeadJob(Job):
+    """Jobs that used up all attempts (dead-letter view in the admin)"""
+
+    class Meta:
+        proxy = True
+        verbose_name = _('Neuspešan posao')
+        verbose_name_plural = _('Neuspešni poslovi')
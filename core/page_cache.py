@@ -0,0 +1,174 @@
+"""
+Full-page response cache for anonymous readers.
+
+Public views are wrapped with @cache_public_page. Anonymous GET requests
+without a query string are answered from the cache, keyed by path (which
+includes the language prefix), without running the view's queries or
+rendering templates.
+
+Invalidation is explicit: content saves call invalidate_paths() with the
+exact URLs they affect, or clear() when every page changes (e.g. the
+navigation). clear() replaces a generation token that is part of every key,
+so stale pages are simply never read again. The cache is shared by the web
+service and the job worker, whose saves purge pages as well; it outlives
+deploys, so the template version (PAGE_TEMPLATE_VERSION) is part of every key.
+
+Every page contains CSRF tokens (language switcher forms, meta tag). They are
+replaced by a placeholder when a page is stored and filled with the
+requesting reader's token when it is served.
+
+Conditional GETs for cached pages are answered here as well: each entry keeps
+a digest of its content and the Last-Modified the view produced, so a reader
+revalidating a cached page gets its 304 without a single query. The view's
+own validators (core.conditional) only run when the cache misses.
+"""
+import hashlib
+import logging
+import re
+import uuid
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = 'core:page_cache:generation'
+PAGE_KEY = 'core:page:{version}:{generation}:{digest}'
+
+CSRF_PLACEHOLDER = b'__CSRF_TOKEN__'
+CSRF_TOKEN_RE = re.compile(
+    rb'(?<=name="csrfmiddlewaretoken" value=")[A-Za-z0-9]{32,64}'
+    rb'|(?<=<meta name="csrf-token" content=")[A-Za-z0-9]{32,64}'
+)
+
+
+def is_enabled():
+    return getattr(settings, 'PAGE_CACHE_ENABLED', not settings.DEBUG)
+
+
+def _generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, uuid.uuid4().hex, None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def page_key(path, generation=None):
+    """Cache key for a request path (e.g. '/en/topics/geopolitics/')"""
+    if generation is None:
+        generation = _generation()
+    digest = hashlib.md5(path.encode('utf-8')).hexdigest()
+    version = getattr(settings, 'PAGE_TEMPLATE_VERSION', '')
+    return PAGE_KEY.format(version=version, generation=generation, digest=digest)
+
+
+def _is_cacheable_request(request):
+    """
+    Only anonymous GETs without a query string are cached.
+    Readers with a session or pending messages are treated as not anonymous,
+    so the session is never loaded to find out.
+    """
+    if request.method not in ('GET', 'HEAD') or request.GET:
+        return False
+    cookies = request.COOKIES
+    if settings.SESSION_COOKIE_NAME in cookies or 'messages' in cookies:
+        return False
+    return True
+
+
+def _is_cacheable_response(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and response.get('Content-Type', '').startswith('text/html')
+    )
+
+
+def csrf_secret(request):
+    """
+    The reader's CSRF secret - the value their CSRF cookie has once this
+    response is delivered (a first visit gets a new one).
+    """
+    get_token(request)
+    return request.META.get('CSRF_COOKIE', '')
+
+
+def _entry_etag(request, digest):
+    """
+    ETag of a cached page for this reader. The served content only differs
+    between readers by the CSRF token, which follows their CSRF secret.
+    """
+    key = repr([digest, csrf_secret(request)])
+    return '"{}"'.format(hashlib.md5(key.encode('utf-8')).hexdigest())
+
+
+def _serve(request, response, digest, last_modified):
+    """Set the cached page's validators and answer 304 when they match"""
+    etag = _entry_etag(request, digest)
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = last_modified
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=parse_http_date_safe(last_modified) if last_modified else None,
+        response=response,
+    )
+
+
+def cache_public_page(view_func):
+    """
+    Serve anonymous GET requests for a view from the page cache.
+    Only 200 HTML responses are stored; redirects and errors always run the view.
+    Apply it outside @conditional_page so cache hits skip the view's validators.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not is_enabled() or not _is_cacheable_request(request):
+            return view_func(request, *args, **kwargs)
+
+        key = page_key(request.path)
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type, digest, last_modified = cached
+            content = content.replace(CSRF_PLACEHOLDER, get_token(request).encode('ascii'))
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Page-Cache'] = 'HIT'
+            return _serve(request, response, digest, last_modified)
+
+        response = view_func(request, *args, **kwargs)
+        if _is_cacheable_response(response):
+            content = CSRF_TOKEN_RE.sub(CSRF_PLACEHOLDER, response.content)
+            digest = hashlib.md5(content).hexdigest()
+            last_modified = response.get('Last-Modified')
+            timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 60 * 24)
+            cache.set(key, (content, response['Content-Type'], digest, last_modified), timeout)
+            response['X-Page-Cache'] = 'MISS'
+            # Same validators as the hits that follow (the view's ETag would
+            # not match them); unchanged content after a purge still gets a 304
+            return _serve(request, response, digest, last_modified)
+        return response
+
+    return wrapper
+
+
+def invalidate_paths(paths):
+    """Remove the cached pages for the given request paths"""
+    paths = set(paths)
+    if not paths:
+        return
+    generation = _generation()
+    cache.delete_many([page_key(path, generation) for path in paths])
+    logger.debug(f"Page cache: purged {len(paths)} paths")
+
+
+def clear():
+    """Drop every cached page (used when something on all pages changes)"""
+    cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
+    logger.debug("Page cache: cleared")
@@ -0,0 +1,208 @@
+"""
+Media storage and content-addressed upload keys.
+
+CKEditor uploads are stored under a key derived from their content:
+
+    uploads/3f/3fa9...64 hex....webp
+
+The same image uploaded twice maps to the same key, so the second upload
+skips the PUT (one HEAD instead), and the object never changes: R2 serves
+such keys with a one-year immutable Cache-Control instead of the default
+AWS_S3_OBJECT_PARAMETERS, so browsers and the CDN never revalidate them.
+
+The key is the hash of the bytes that are stored, i.e. after optimization
+(see core.image_optimizer). Uploads too large to optimize in the request are
+optimized later by the job worker, which rewrites them under the same name;
+their content changes, so they get a regular upload name and the default
+Cache-Control instead.
+
+MediaStorage also tunes and shares the R2 client:
+- One boto3 client per process, used by every thread. boto3 clients are
+  thread-safe (resources are not), so threads still get their own resource
+  objects, but all of them send through the shared client and its
+  connection pool (STORAGE_MAX_POOL_CONNECTIONS) instead of opening their own.
+- Connect/read timeouts and standard-mode retries (STORAGE_CONNECT_TIMEOUT,
+  STORAGE_READ_TIMEOUT, STORAGE_MAX_ATTEMPTS) instead of botocore's 60 s timeouts.
+- Every call is timed and counted (see core.storage_stats). Uploads and
+  downloads run in the calling thread (no s3transfer thread pool), so the
+  calls are counted for the request that made them.
+- exists() answers are cached for STORAGE_EXISTS_CACHE_SECONDS, both
+  positive and negative. Saves and deletes through this process update the
+  cache; other processes' changes are seen once the entry expires.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from django.conf import settings
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
+from . import storage_stats
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+CONTENT_ADDRESSED_PATTERN = re.compile(r'^uploads/[0-9a-f]{2}/[0-9a-f]{64}\.[a-z0-9]+$')
+
+
+def content_addressed_uploads():
+    return getattr(settings, 'CKEDITOR_CONTENT_ADDRESSED_UPLOADS', True)
+
+
+def hash_chunks(chunks):
+    """SHA-256 hex digest of an iterable of byte chunks"""
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_addressed_name(digest, extension):
+    """Storage name of a content-addressed upload, e.g. uploads/3f/3fa9....webp"""
+    upload_path = getattr(settings, 'CKEDITOR_UPLOAD_PATH', 'uploads/')
+    return os.path.join(upload_path, digest[:2], f'{digest}{extension.lower()}').replace('\\', '/')
+
+
+def is_content_addressed(name):
+    return CONTENT_ADDRESSED_PATTERN.match(name.lstrip('/')) is not None
+
+
+def client_config():
+    """botocore settings of the shared client"""
+    return Config(
+        max_pool_connections=getattr(settings, 'STORAGE_MAX_POOL_CONNECTIONS', 20),
+        connect_timeout=getattr(settings, 'STORAGE_CONNECT_TIMEOUT', 5),
+        read_timeout=getattr(settings, 'STORAGE_READ_TIMEOUT', 15),
+        retries={'total_max_attempts': getattr(settings, 'STORAGE_MAX_ATTEMPTS', 3), 'mode': 'standard'},
+        tcp_keepalive=True,
+    )
+
+
+class ExistsCache:
+    """Short-lived cache of exists() answers, bounded to max_entries names"""
+
+    def __init__(self, ttl, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # name -> (exists, expires)
+
+    def get(self, name):
+        """True/False if cached and not expired, else None"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._entries[name]
+                return None
+            return entry[0]
+
+    def set(self, name, exists):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[name] = (exists, time.monotonic() + self.ttl)
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, names):
+        with self._lock:
+            for name in names:
+                self._entries.pop(name, None)
+
+
+# (endpoint, region, access key) -> (session, client), shared by all storage instances and threads
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class MediaStorage(S3Boto3Storage):
+    """R2 media storage: shared instrumented client, cached exists(), immutable content-addressed uploads"""
+
+    def get_default_settings(self):
+        defaults = super().get_default_settings()
+        if defaults['transfer_config'] is None:
+            # Transfers run in the calling thread: s3transfer's worker threads don't see
+            # the request's context, so their calls would be missing from its stats
+            defaults['transfer_config'] = TransferConfig(use_threads=False)
+        return defaults
+
+    def __init__(self, **settings_overrides):
+        super().__init__(**settings_overrides)
+        self.config = self.config.merge(client_config())
+        self.exists_cache = ExistsCache(getattr(settings, 'STORAGE_EXISTS_CACHE_SECONDS', 15))
+
+    def _shared(self):
+        key = (self.endpoint_url, self.region_name, self.access_key, self.session_profile)
+        with _clients_lock:
+            if key not in _clients:
+                session = self._create_session()
+                client = session.client(
+                    's3',
+                    region_name=self.region_name,
+                    use_ssl=self.use_ssl,
+                    endpoint_url=self.endpoint_url,
+                    config=self.config,
+                    verify=self.verify,
+                )
+                storage_stats.instrument(client)
+                _clients[key] = (session, client)
+            return _clients[key]
+
+    @property
+    def client(self):
+        """The process-wide boto3 client"""
+        return self._shared()[1]
+
+    @property
+    def connection(self):
+        connection = getattr(self._connections, 'connection', None)
+        if connection is None:
+            session, client = self._shared()
+            connection = session.resource(
+                's3',
+                region_name=self.region_name,
+                use_ssl=self.use_ssl,
+                endpoint_url=self.endpoint_url,
+                config=self.config,
+                verify=self.verify,
+            )
+            # Objects and buckets of this resource send through the shared client
+            connection.meta.client = client
+            self._connections.connection = connection
+        return connection
+
+    def get_object_parameters(self, name):
+        params = super().get_object_parameters(name)
+        # Called with the bucket key, which starts with the location (media/)
+        location = f'{self.location.strip("/")}/' if self.location else ''
+        if name.startswith(location) and is_content_addressed(name[len(location):]):
+            params['CacheControl'] = IMMUTABLE_CACHE_CONTROL
+        return params
+
+    def exists(self, name):
+        name = clean_name(name)
+        cached = self.exists_cache.get(name)
+        if cached is not None:
+            return cached
+        exists = super().exists(name)
+        self.exists_cache.set(name, exists)
+        return exists
+
+    def _save(self, name, content):
+        name = super()._save(name, content)
+        self.exists_cache.set(name, True)
+        return name
+
+    def delete(self, name):
+        super().delete(name)
+        self.exists_cache.set(clean_name(name), False)
+
+    def forget(self, names):
+        """Drop cached exists() answers, after objects were changed with the client directly"""
+        self.exists_cache.discard(clean_name(name) for name in names)
@@ -0,0 +1,155 @@
+"""
+Timing and counters of R2 calls.
+
+MediaStorage (core.storage) instruments its boto3 client (instrument()), so
+every S3 API call made through the storage, or through its client directly
+(batch deletes, reconciliation listings, presigned upload checks), is
+counted by operation group:
+
+    HEAD    HeadObject (exists, size)
+    GET     GetObject
+    PUT     PutObject, multipart upload parts, CopyObject
+    DELETE  DeleteObject, DeleteObjects
+    LIST    ListObjects, ListObjectsV2
+
+Counters are kept for the whole process (process_stats) and, through
+StorageStatsMiddleware (core.middleware), for the current request. Calls
+slower than STORAGE_SLOW_CALL_SECONDS are logged with the view that made
+them.
+"""
+import contextvars
+import logging
+import threading
+import time
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+OPERATION_GROUPS = {
+    'HeadObject': 'HEAD',
+    'GetObject': 'GET',
+    'PutObject': 'PUT',
+    'CreateMultipartUpload': 'PUT',
+    'UploadPart': 'PUT',
+    'CompleteMultipartUpload': 'PUT',
+    'AbortMultipartUpload': 'PUT',
+    'CopyObject': 'PUT',
+    'DeleteObject': 'DELETE',
+    'DeleteObjects': 'DELETE',
+    'ListObjects': 'LIST',
+    'ListObjectsV2': 'LIST',
+}
+
+# Keys in the botocore request context holding the call's start time and operation
+STARTED_KEY = 'storage_stats_started'
+OPERATION_KEY = 'storage_stats_operation'
+
+
+def slow_call_seconds():
+    return getattr(settings, 'STORAGE_SLOW_CALL_SECONDS', 1.0)
+
+
+class StorageStats:
+    """Thread-safe call counters per operation group"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._groups = {}
+
+    def record(self, group, seconds, error=False):
+        with self._lock:
+            counters = self._groups.setdefault(group, {'calls': 0, 'errors': 0, 'seconds': 0.0})
+            counters['calls'] += 1
+            counters['errors'] += int(error)
+            counters['seconds'] += seconds
+
+    def snapshot(self):
+        """{group: {'calls', 'errors', 'seconds'}}"""
+        with self._lock:
+            return {group: dict(counters) for group, counters in self._groups.items()}
+
+    @property
+    def calls(self):
+        with self._lock:
+            return sum(counters['calls'] for counters in self._groups.values())
+
+    @property
+    def seconds(self):
+        with self._lock:
+            return sum(counters['seconds'] for counters in self._groups.values())
+
+    def summary(self):
+        """e.g. '3 calls in 120 ms (HEAD 2, PUT 1)'"""
+        groups = ', '.join(f"{group} {counters['calls']}" for group, counters in sorted(self.snapshot().items()))
+        return f"{self.calls} calls in {self.seconds * 1000:.0f} ms ({groups})"
+
+
+process_stats = StorageStats()
+
+# Stats and request of the request being handled (set by StorageStatsMiddleware)
+_request_stats = contextvars.ContextVar('storage_request_stats', default=None)
+_current_request = contextvars.ContextVar('storage_current_request', default=None)
+
+
+def start_request(request):
+    """Start counting calls for a request; returns the request's StorageStats and reset tokens"""
+    stats = StorageStats()
+    tokens = (_request_stats.set(stats), _current_request.set(request))
+    return stats, tokens
+
+
+def end_request(tokens):
+    stats_token, request_token = tokens
+    _request_stats.reset(stats_token)
+    _current_request.reset(request_token)
+
+
+def current_view():
+    """Name of the view handling the current request ('-' outside requests, e.g. in the job worker)"""
+    request = _current_request.get()
+    if request is None:
+        return '-'
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else request.path
+
+
+def before_call(model, context, **kwargs):
+    context[STARTED_KEY] = time.monotonic()
+    context[OPERATION_KEY] = model.name
+
+
+def _record(context, error):
+    """Count a finished call; returns (operation, seconds)"""
+    started = context.pop(STARTED_KEY, None)
+    operation = context.pop(OPERATION_KEY, None)
+    if started is None:
+        return None, 0.0
+    seconds = time.monotonic() - started
+    group = OPERATION_GROUPS.get(operation, operation)
+    process_stats.record(group, seconds, error)
+    request_stats = _request_stats.get()
+    if request_stats is not None:
+        request_stats.record(group, seconds, error)
+    return operation, seconds
+
+
+def after_call(context, http_response, **kwargs):
+    # Missing keys (404 on HEAD) are answers, not failures
+    operation, seconds = _record(context, error=http_response.status_code >= 500)
+    if operation and seconds >= slow_call_seconds():
+        logger.warning(f"Slow storage call: {operation} took {seconds:.2f}s (view {current_view()})")
+
+
+def after_call_error(context, exception, **kwargs):
+    # Connection errors and timeouts, after botocore's retries
+    operation, seconds = _record(context, error=True)
+    if operation:
+        logger.warning(f"Storage call {operation} failed after {seconds:.2f}s (view {current_view()}): {str(exception)}")
+
+
+def instrument(client):
+    """Register the timing hooks on a boto3 client"""
+    events = client.meta.events
+    events.register_first('before-call.s3', before_call)
+    events.register_last('after-call.s3', after_call)
+    events.register_last('after-call-error.s3', after_call_error)
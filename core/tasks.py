@@ -0,0 +1,68 @@
+"""
+Background tasks of the core app (see core.jobs).
+"""
+import logging
+from django.conf import settings
+from django.core.mail import EmailMessage
+from .circuit_breaker import storage_breaker
+from .jobs import task
+
+logger = logging.getLogger(__name__)
+
+
+@task('core.generate_thumbnail_derivatives', concurrency=2, lease_seconds=600)
+def generate_thumbnail_derivatives(model, object_id, source):
+    """Generate responsive derivatives of a thumbnail and record them on the object (see core.thumbnails)"""
+    from django.apps import apps
+    from django.db import transaction
+    from .thumbnails import generate_derivatives
+
+    storage_breaker.raise_if_open()  # Postponed while the storage is down
+    model_class = apps.get_model(model)
+    if not model_class._default_manager.filter(pk=object_id, thumbnail=source).exists():
+        return  # Deleted, or the thumbnail was replaced (the newer upload has its own job)
+
+    derivatives = generate_derivatives(source)
+    with transaction.atomic():
+        # Lock the row so a thumbnail replaced meanwhile doesn't get these derivatives
+        instance = model_class._default_manager.select_for_update().filter(pk=object_id, thumbnail=source).first()
+        if instance is None:
+            return
+        instance.thumbnail_derivatives = derivatives
+        # updated_at (auto_now) feeds the ETag/Last-Modified of the pages showing the thumbnail
+        update_fields = ['thumbnail_derivatives']
+        if any(field.name == 'updated_at' for field in model_class._meta.concrete_fields):
+            update_fields.append('updated_at')
+        instance.save(update_fields=update_fields)
+
+
+@task('core.optimize_upload', concurrency=1, lease_seconds=600)
+def optimize_upload(path):
+    """Optimize a CKEditor upload too large to process in the upload request (see core.image_optimizer)"""
+    from ckeditor_uploader import utils
+    from .image_optimizer import optimize_stored_image, record_sizes
+
+    storage_breaker.raise_if_open()  # Postponed while the storage is down
+    original_size, stored_size = optimize_stored_image(path, utils.storage)
+    record_sizes(path, original_size, stored_size)
+
+
+@task('core.collect_media_garbage', concurrency=1, lease_seconds=3600)
+def collect_media_garbage():
+    """Sweep media tombstones past their grace period (see core.media_gc)"""
+    from .media_gc import sweep
+
+    sweep()
+
+
+@task('core.send_email', max_attempts=8, backoff_seconds=60)
+def send_email(subject, body, to, reply_to=None, from_email=None):
+    """Send an e-mail through the configured backend (SendGrid in production)"""
+    message = EmailMessage(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=to,
+        reply_to=reply_to,
+    )
+    message.send(fail_silently=False)
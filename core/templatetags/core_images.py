@@ -0,0 +1,49 @@
+"""
+Template tags for responsive images
+"""
+from django import template
+from django.utils.html import format_html, format_html_join
+from core.image_resize import rewrite_body_images
+from core.thumbnails import derivative_srcsets
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(src, derivatives=None, sizes='100vw', alt='', css_class='', loading=''):
+    """
+    Render an image with srcset/sizes from its thumbnail derivatives (see core.thumbnails).
+    Browsers pick the smallest AVIF/WebP variant that fits the rendered size;
+    the original stays the fallback. Without derivatives a plain <img> is rendered.
+
+    Example:
+        {% responsive_image card.thumbnail_url card.thumbnail_derivatives sizes="50px" css_class="dropdown-thumbnail" %}
+    """
+    attrs = format_html(' alt="{}"', alt)
+    if css_class:
+        attrs += format_html(' class="{}"', css_class)
+    if loading:
+        attrs += format_html(' loading="{}"', loading)
+    if derivatives and derivatives.get('width'):
+        attrs += format_html(' width="{}" height="{}"', derivatives['width'], derivatives['height'])
+    img = format_html('<img src="{}"{}>', src, attrs)
+
+    srcsets = derivative_srcsets(derivatives)
+    if not srcsets:
+        return img
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((content_type, srcset, sizes) for content_type, srcset in srcsets),
+    )
+    return format_html('<picture>{}{}</picture>', sources, img)
+
+
+@register.filter
+def responsive_body_images(html):
+    """
+    Give uploaded images in description HTML a srcset of resized variants (see core.image_resize).
+
+    Example:
+        {{ content.full_description|responsive_body_images|safe }}
+    """
+    return rewrite_body_images(html)
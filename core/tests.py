@@ -1,3 +1,1275 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from threading import Thread
+from unittest import mock, skipUnless
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from . import lang_urls
+from .batch_delete import delete_files
+from .jobs import Postpone, claim_jobs, enqueue, run_job, run_job_by_id, task
+from .models import ImageReference, Job
 
-# Create your tests here.
+try:
+    from moto import mock_aws
+except ImportError:
+    # moto is a development dependency (requirements-dev.txt)
+    mock_aws = None
+
+calls = []
+
+
+@task('tests.record', concurrency=1)
+def record(value):
+    calls.append(value)
+
+
+@task('tests.fail', max_attempts=2, backoff_seconds=60)
+def fail():
+    raise RuntimeError('storage unavailable')
+
+
+@task('tests.postpone')
+def postpone():
+    raise Postpone('later', delay=120)
+
+
+@task('tests.slow', lease_seconds=0.6)
+def slow():
+    time.sleep(1.5)
+
+
+@override_settings(JOBS_RUN_EAGERLY=False)
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_claim_leases_ready_jobs_once(self):
+        ready = enqueue('tests.record', value=1)
+        enqueue('tests.record', value=2, run_at=timezone.now() + timedelta(hours=1))
+        claimed = claim_jobs('worker-1', 10)
+        self.assertEqual([job.pk for job in claimed], [ready.pk])
+        self.assertEqual(claim_jobs('worker-2', 10), [])
+
+        ready.refresh_from_db()
+        self.assertEqual((ready.status, ready.worker, ready.attempts), (Job.RUNNING, 'worker-1', 1))
+        self.assertGreater(ready.leased_until, timezone.now())
+
+    def test_concurrency_limit(self):
+        enqueue('tests.record', value=1)
+        enqueue('tests.record', value=2)
+        self.assertEqual(len(claim_jobs('worker-1', 10)), 1)
+        self.assertEqual(claim_jobs('worker-2', 10), [])
+
+    def test_unknown_tasks_are_left_alone(self):
+        job = enqueue('tests.unknown')
+        self.assertEqual(claim_jobs('worker-1', 10), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+
+    def test_expired_lease_is_taken_over(self):
+        job = enqueue('tests.record', value=1)
+        claim_jobs('worker-1', 10)
+        Job.objects.filter(pk=job.pk).update(leased_until=timezone.now() - timedelta(seconds=1))
+
+        [job] = claim_jobs('worker-2', 10)
+        self.assertEqual((job.worker, job.attempts), ('worker-2', 2))
+        self.assertTrue(run_job(job))
+        # The first worker no longer owns the row: its outcome is not recorded
+        Job.objects.filter(pk=job.pk).update(status=Job.RUNNING)
+        job.worker = 'worker-1'
+        run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (Job.RUNNING, 'worker-2'))
+
+    def test_success(self):
+        job = enqueue('tests.record', value=7)
+        self.assertTrue(run_job(claim_jobs('worker-1', 1)[0]))
+        job.refresh_from_db()
+        self.assertEqual(calls, [7])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_retry_with_backoff_then_dead_letter(self):
+        job = enqueue('tests.fail')
+        self.assertFalse(run_job(claim_jobs('worker-1', 1)[0]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+        self.assertIn('storage unavailable', job.last_error)
+        # 60 seconds, with jitter
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=45))
+        self.assertEqual(claim_jobs('worker-1', 1), [])
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.assertFalse(run_job(claim_jobs('worker-1', 1)[0]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DEAD, 2))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(claim_jobs('worker-1', 1), [])
+
+    def test_dead_letter_retry(self):
+        from django.contrib.auth.models import User
+        from .models import DeadJob
+
+        job = enqueue('tests.fail')
+        Job.objects.filter(pk=job.pk).update(status=Job.DEAD, attempts=2)
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        self.client.post('/admin/core/deadjob/', {
+            'action': 'retry_jobs', '_selected_action': [job.pk],
+        })
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 0))
+        self.assertFalse(DeadJob.objects.filter(pk=job.pk, status=Job.DEAD).exists())
+
+    def test_postpone_keeps_the_attempt(self):
+        job = enqueue('tests.postpone')
+        self.assertFalse(run_job(claim_jobs('worker-1', 1)[0]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 0))
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=100))
+
+    def test_unknown_task_is_dead(self):
+        job = enqueue('tests.unknown')
+        Job.objects.filter(pk=job.pk).update(status=Job.RUNNING, worker='worker-1', attempts=1)
+        job.refresh_from_db()
+        run_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DEAD)
+
+    @override_settings(JOBS_RUN_EAGERLY=True)
+    def test_eager_jobs_run_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            job = enqueue('tests.record', value=3)
+            self.assertEqual(calls, [])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(calls, [3])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (Job.DONE, 'eager'))
+        # Already done: running it again does nothing
+        self.assertFalse(run_job_by_id(job.pk, 'eager'))
+
+
+@override_settings(JOBS_RUN_EAGERLY=False)
+class RunJobsCommandTests(TransactionTestCase):
+
+    def run_jobs(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        stdout, stderr = StringIO(), StringIO()
+        # One job at a time: the in-memory test database locks whole tables between threads
+        with mock.patch('signal.signal'):
+            call_command(
+                'run_jobs', '--once', '--poll-interval', '0', '--concurrency', '1', stdout=stdout, stderr=stderr,
+            )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_runs_ready_jobs(self):
+        calls.clear()
+        enqueue('tests.record', value=5)
+        stdout, _ = self.run_jobs()
+        self.assertEqual(calls, [5])
+        # The hourly media garbage collection sweep is queued on start
+        self.assertIn('Processed 2 jobs (0 failed)', stdout)
+        self.assertTrue(Job.objects.filter(name='core.collect_media_garbage', status=Job.DONE).exists())
+
+    def test_warns_about_a_local_cache(self):
+        _, stderr = self.run_jobs()
+        self.assertIn('local to this worker', stderr)
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cgi_cache'}}
+        with override_settings(CACHES=shared):
+            _, stderr = self.run_jobs()
+        self.assertEqual(stderr, '')
+
+
+@override_settings(JOBS_RUN_EAGERLY=False)
+class LeaseHeartbeatTests(TransactionTestCase):
+
+    def test_running_job_keeps_its_lease(self):
+        job = enqueue('tests.slow')
+        [claimed] = claim_jobs('worker-1', 1)
+        # The lease is shorter than the task: without the heartbeat another worker would take it over
+        Job.objects.filter(pk=job.pk).update(leased_until=timezone.now() + timedelta(seconds=0.6))
+
+        taken_over, results = [], []
+        worker = Thread(target=lambda: results.append(run_job(claimed)))
+        worker.start()
+        while worker.is_alive():
+            taken_over += claim_jobs('worker-2', 1)
+            time.sleep(0.1)
+        worker.join()
+
+        self.assertEqual(results, [True])
+        self.assertEqual(taken_over, [])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.attempts), (Job.DONE, 'worker-1', 1))
+
+
+class LangUrlTests(TestCase):
+
+    def setUp(self):
+        lang_urls.clear()
+
+    def test_same_urls_as_reverse(self):
+        from django.urls import reverse
+        from django.utils import translation
+
+        cases = [
+            ('core:home', ()), ('core:about', ()), ('topics:category_list', ()),
+            ('topics:category_detail', ('biljke',)), ('topics:topic_detail', ('biljke', 'bosiljak')),
+            ('resized_image', (800, 'webp', 'abc', 'uploads/2024/slika one.jpg')),
+        ]
+        for lang in ('sr-latn', 'sr-cyrl', 'en'):
+            with translation.override(lang):
+                for view_name, args in cases:
+                    expected = reverse(view_name, args=args)
+                    self.assertEqual(lang_urls.language_url(lang, view_name, args), expected)
+                    # Compiled on the first call, formatted on later ones
+                    self.assertEqual(lang_urls.language_url(lang, view_name, args), expected)
+        self.assertEqual(lang_urls.language_url('en', 'core:about'), '/en/about/')
+        self.assertEqual(lang_urls.language_url('sr-cyrl', 'core:about'), '/sr-cyrl/o-nama/')
+
+    def test_invalid_arguments(self):
+        self.assertEqual(lang_urls.language_url('en', 'topics:category_detail', ('ne valja',)), '#')
+        self.assertEqual(lang_urls.language_url('en', 'resized_image', ('x', 'webp', 'a', 'b.jpg')), '#')
+        self.assertEqual(lang_urls.language_url('en', 'topics:category_detail'), '#')
+        self.assertEqual(lang_urls.language_url('en', 'core:nepostoji'), '#')
+
+    def test_reverse_runs_once_per_route(self):
+        with mock.patch.object(lang_urls, 'reverse', wraps=lang_urls.reverse) as reverse:
+            for slug in ('biljke', 'zacini', 'biljke'):
+                lang_urls.language_url('en', 'topics:category_detail', (slug,))
+            self.assertEqual(reverse.call_count, 1)
+            lang_urls.clear()
+            lang_urls.language_url('en', 'topics:category_detail', ('biljke',))
+            self.assertEqual(reverse.call_count, 2)
+
+    def test_template_tag(self):
+        from django.template import Context, Template
+        from django.utils import translation
+
+        template = Template("{% load core_urls %}{% lang_url 'topics:topic_detail' category slug %}")
+        with translation.override('en'):
+            self.assertEqual(
+                template.render(Context({'category': 'plants', 'slug': 'basil'})), '/en/topics/plants/basil/',
+            )
+
+
+class TranslatedRouteTests(TestCase):
+
+    def test_routes_per_language(self):
+        self.assertEqual(self.client.get('/en/about/').status_code, 200)
+        self.assertEqual(self.client.get('/sr-latn/o-nama/').status_code, 200)
+        self.assertEqual(self.client.get('/sr-cyrl/kontakt/').status_code, 200)
+
+    def test_other_language_segments_redirect(self):
+        response = self.client.get('/en/o-nama/')
+        self.assertRedirects(response, '/en/about/', status_code=301)
+        self.assertIn('max-age=86400', response['Cache-Control'])
+        self.assertIn('public', response['Cache-Control'])
+        response = self.client.get('/sr-latn/topics/', {'q': 'x'})
+        self.assertRedirects(response, '/sr-latn/teme/?q=x', status_code=301, fetch_redirect_response=False)
+
+    def test_unknown_paths_stay_404(self):
+        self.assertEqual(self.client.get('/en/nepostoji/').status_code, 404)
+        self.assertEqual(self.client.post('/en/o-nama/').status_code, 404)
+
+    def test_translate_path(self):
+        from .translated_urls import translate_path
+
+        self.assertEqual(translate_path('/sr-latn/o-nama/', 'en'), '/en/about/')
+        self.assertEqual(translate_path('/en/topics/plants/basil/', 'sr-cyrl'), '/sr-cyrl/teme/plants/basil/')
+        self.assertEqual(translate_path('/en/about/', 'en'), '/en/about/')
+        self.assertIsNone(translate_path('/en/nepostoji/', 'sr-latn'))
+        self.assertIsNone(translate_path('/admin/', 'en'))
+
+
+@override_settings(JOBS_RUN_EAGERLY=False)
+class ImageReferenceTests(TestCase):
+
+    def setUp(self):
+        from topics.models import Topic
+
+        self.topic = Topic.objects.create(
+            title='Bosiljak', thumbnail='topics/thumbnails/b.jpg',
+            full_description='<p><img src="/media/uploads/a.jpg"><img src="https://cdn.example.com/media/uploads/b.jpg"></p>',
+            full_description_en='<img src="/media/uploads/a.jpg"><img src="/static/logo.png">',
+        )
+
+    def rows(self, topic=None):
+        from .models import ImageReference
+
+        topic = topic or self.topic
+        return {
+            (row.file_path, row.field_name, row.language): row.pk
+            for row in ImageReference.objects.filter(model_name='topics.Topic', object_id=topic.pk)
+        }
+
+    def test_rows_per_field_and_language(self):
+        self.assertEqual(set(self.rows()), {
+            ('topics/thumbnails/b.jpg', 'thumbnail', ''),
+            ('uploads/a.jpg', 'full_description', 'sr-latn'),
+            ('uploads/b.jpg', 'full_description', 'sr-latn'),
+            ('uploads/a.jpg', 'full_description_en', 'en'),
+        })
+
+    def test_saves_write_only_the_difference(self):
+        from .image_references import sync_image_references
+
+        before = self.rows()
+        self.topic.full_description = '<p><img src="/media/uploads/a.jpg"><img src="/media/uploads/c.jpg"></p>'
+        self.topic.save()
+        after = self.rows()
+        self.assertNotIn(('uploads/b.jpg', 'full_description', 'sr-latn'), after)
+        self.assertIn(('uploads/c.jpg', 'full_description', 'sr-latn'), after)
+        # Unchanged references keep their rows
+        for key in set(before) & set(after):
+            self.assertEqual(before[key], after[key])
+
+        # Only paths dropped from every field count as removed
+        self.topic.full_description = ''
+        self.assertEqual(sync_image_references(self.topic), {'uploads/c.jpg'})
+
+    def test_shared_images(self):
+        from topics.models import Topic
+        from .image_references import referenced_paths, unreferenced_paths
+
+        other = Topic.objects.create(title='Nana', full_description='<img src="/media/uploads/b.jpg">')
+        paths = {'uploads/a.jpg', 'uploads/b.jpg', '/uploads/x.jpg'}
+        self.assertEqual(referenced_paths(paths), {'uploads/a.jpg', 'uploads/b.jpg'})
+        self.topic.delete()
+        self.assertEqual(self.rows(self.topic), {})
+        self.assertEqual(unreferenced_paths(paths), {'uploads/a.jpg', 'uploads/x.jpg'})
+        self.assertEqual(set(self.rows(other)), {('uploads/b.jpg', 'full_description', 'sr-latn')})
+
+    def test_rebuild(self):
+        from topics.models import Category, Topic
+        from .image_references import rebuild_references
+        from .models import ImageReference
+
+        ImageReference.objects.all().delete()
+        self.assertEqual(rebuild_references([Topic, Category]), 4)
+        self.assertEqual(len(self.rows()), 4)
+
+    @override_settings(DEBUG=False, AWS_ACCESS_KEY_ID='key')
+    def test_removed_images_get_tombstones(self):
+        from .models import MediaTombstone
+
+        self.topic.full_description_en = ''
+        self.topic.save()
+        # a.jpg is still in the Latin description
+        self.assertFalse(MediaTombstone.objects.exists())
+        self.topic.full_description = ''
+        self.topic.save()
+        self.assertEqual(
+            set(MediaTombstone.objects.values_list('file_path', 'reason')),
+            {('uploads/a.jpg', MediaTombstone.REMOVED), ('uploads/b.jpg', MediaTombstone.REMOVED)},
+        )
+
+
+@skipUnless(mock_aws, 'moto is not installed')
+class S3StorageMixin:
+    """Media storage on a moto S3 bucket (the same client code paths as R2)"""
+
+    bucket_name = 'media-test'
+
+    def setUp(self):
+        super().setUp()
+        from . import storage as storage_module
+        from .storage import MediaStorage
+
+        env = mock.patch.dict(os.environ, {
+            'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing', 'AWS_DEFAULT_REGION': 'us-east-1',
+        })
+        env.start()
+        self.addCleanup(env.stop)
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        # Clients are shared per process: start with one created inside the mock
+        clients = mock.patch.dict(storage_module._clients, clear=True)
+        clients.start()
+        self.addCleanup(clients.stop)
+
+        self.storage = MediaStorage(
+            bucket_name=self.bucket_name, access_key='testing', secret_key='testing',
+            region_name='us-east-1', endpoint_url=None, location='media', file_overwrite=False,
+        )
+        self.s3 = self.storage.connection.meta.client
+        self.s3.create_bucket(Bucket=self.bucket_name)
+
+    def put(self, *names):
+        return [self.storage.save(name, ContentFile(b'data')) for name in names]
+
+    def keys(self):
+        response = self.s3.list_objects_v2(Bucket=self.bucket_name)
+        return sorted(item['Key'] for item in response.get('Contents', []))
+
+
+class BatchDeleteS3Tests(S3StorageMixin, TestCase):
+
+    def test_batched_deletion(self):
+        paths = self.put(*[f'uploads/{i}.jpg' for i in range(5)], 'uploads/keep.jpg')
+        self.assertTrue(self.storage.exists('uploads/0.jpg'))
+        with mock.patch('core.batch_delete.MAX_KEYS_PER_REQUEST', 2), \
+                mock.patch.object(self.s3, 'delete_objects', wraps=self.s3.delete_objects) as requests:
+            # Missing keys are deleted successfully as well
+            result = delete_files(paths[:5] + ['/uploads/missing.jpg'], storage=self.storage, max_workers=2)
+        self.assertEqual(requests.call_count, 3)
+        self.assertEqual(result['errors'], {})
+        self.assertEqual(result['deleted'], set(paths[:5]) | {'uploads/missing.jpg'})
+        self.assertEqual(self.keys(), ['media/uploads/keep.jpg'])
+        # The exists() cache doesn't keep answering for deleted objects
+        self.assertFalse(self.storage.exists('uploads/0.jpg'))
+
+    def test_errors_per_key(self):
+        paths = self.put('uploads/a.jpg', 'uploads/b.jpg')
+        response = {'Errors': [{'Key': 'media/uploads/b.jpg', 'Code': 'AccessDenied', 'Message': 'Denied'}]}
+        with mock.patch.object(self.s3, 'delete_objects', return_value=response):
+            result = delete_files(paths, storage=self.storage)
+        self.assertEqual(result['deleted'], {'uploads/a.jpg'})
+        self.assertEqual(result['errors'], {'uploads/b.jpg': 'AccessDenied: Denied'})
+
+    def test_failed_request(self):
+        paths = self.put('uploads/a.jpg')
+        with mock.patch.object(self.s3, 'delete_objects', side_effect=ConnectionError('reset')):
+            result = delete_files(paths, storage=self.storage)
+        self.assertEqual(result, {'deleted': set(), 'errors': {'uploads/a.jpg': 'reset'}})
+        self.assertEqual(self.keys(), ['media/uploads/a.jpg'])
+
+
+class MediaStorageTests(S3StorageMixin, TestCase):
+
+    def count_calls(self, func, *args):
+        from . import storage_stats
+
+        stats, tokens = storage_stats.start_request(None)
+        try:
+            result = func(*args)
+        finally:
+            storage_stats.end_request(tokens)
+        return result, {group: counters['calls'] for group, counters in stats.snapshot().items()}
+
+    def test_exists_answers_are_cached(self):
+        self.assertEqual(self.count_calls(self.storage.exists, 'uploads/a.jpg'), (False, {'HEAD': 1}))
+        self.assertEqual(self.count_calls(self.storage.exists, 'uploads/a.jpg'), (False, {}))
+        # Saves and deletes through the storage update the cache
+        self.put('uploads/a.jpg')
+        self.assertEqual(self.count_calls(self.storage.exists, 'uploads/a.jpg'), (True, {}))
+        self.storage.delete('uploads/a.jpg')
+        self.assertEqual(self.count_calls(self.storage.exists, 'uploads/a.jpg'), (False, {}))
+
+    def test_batch_deletes_drop_cached_answers(self):
+        self.put('uploads/a.jpg')
+        self.assertTrue(self.storage.exists('uploads/a.jpg'))
+        delete_files(['uploads/a.jpg'], storage=self.storage)
+        self.assertEqual(self.count_calls(self.storage.exists, 'uploads/a.jpg'), (False, {'HEAD': 1}))
+
+    def test_exists_cache_expiry_and_bound(self):
+        from .storage import ExistsCache
+
+        cache = ExistsCache(ttl=0.05, max_entries=2)
+        cache.set('a', True)
+        cache.set('b', False)
+        cache.set('c', True)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (None, False, True))
+        time.sleep(0.06)
+        self.assertIsNone(cache.get('c'))
+        disabled = ExistsCache(ttl=0)
+        disabled.set('a', True)
+        self.assertIsNone(disabled.get('a'))
+
+    def test_one_client_per_process(self):
+        from .storage import MediaStorage
+
+        other = MediaStorage(
+            bucket_name='other', access_key='testing', secret_key='testing',
+            region_name='us-east-1', endpoint_url=None,
+        )
+        self.assertIs(other.client, self.storage.client)
+        connections = []
+        thread = Thread(target=lambda: connections.append(self.storage.connection))
+        thread.start()
+        thread.join()
+        # Threads get their own resource, sending through the shared client
+        self.assertIsNot(connections[0], self.storage.connection)
+        self.assertIs(connections[0].meta.client, self.storage.client)
+        config = self.storage.client.meta.config
+        self.assertEqual((config.connect_timeout, config.read_timeout, config.max_pool_connections), (5, 15, 20))
+
+    def test_calls_are_counted_per_operation(self):
+        from . import storage_stats
+
+        def work():
+            self.put('uploads/a.jpg')
+            self.storage.size('uploads/a.jpg')
+            self.s3.list_objects_v2(Bucket=self.bucket_name)
+
+        before = storage_stats.process_stats.calls
+        _, calls = self.count_calls(work)
+        # HEAD: the free-name check of the save and size()
+        self.assertEqual(calls, {'PUT': 1, 'HEAD': 2, 'LIST': 1})
+        self.assertEqual(storage_stats.process_stats.calls, before + 4)
+
+
+class BatchDeleteTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.storage = FileSystemStorage(location=self.media_root)
+
+    def test_local_storage(self):
+        self.storage.save('uploads/a.jpg', ContentFile(b'data'))
+        result = delete_files(['uploads/a.jpg', 'uploads/missing.jpg'], storage=self.storage)
+        self.assertEqual(result['deleted'], {'uploads/a.jpg', 'uploads/missing.jpg'})
+        self.assertFalse(self.storage.exists('uploads/a.jpg'))
+
+
+class MediaReconcileTests(S3StorageMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for target in ('core.media_reconcile.default_storage', 'core.batch_delete.default_storage'):
+            patcher = mock.patch(target, self.storage)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.put('uploads/a.jpg', 'uploads/b.jpg', 'uploads/used.jpg', 'topics/thumbnails/t.jpg', 'other/x.jpg')
+        ImageReference.objects.create(
+            file_path='uploads/used.jpg', model_name='topics.Topic', object_id=1, field_name='full_description',
+        )
+        self.checkpoint = os.path.join(tempfile.mkdtemp(), 'reconcile.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.checkpoint), ignore_errors=True)
+
+    def reconcile(self, **kwargs):
+        from .media_reconcile import reconcile_media
+
+        kwargs.setdefault('min_age', timedelta(0))
+        kwargs.setdefault('checkpoint_path', self.checkpoint)
+        return reconcile_media(**kwargs)
+
+    def test_dry_run(self):
+        stats = self.reconcile()
+        self.assertEqual((stats['listed'], stats['referenced'], stats['deleted']), (4, 1, 3))
+        self.assertEqual(len(self.keys()), 5)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_deletes_unreferenced_media(self):
+        from .models import MediaTombstone
+
+        MediaTombstone.objects.create(file_path='uploads/a.jpg', reason=MediaTombstone.REMOVED)
+        MediaTombstone.objects.filter(file_path='uploads/a.jpg').update(created_at=timezone.now() - timedelta(days=2))
+        stats = self.reconcile(dry_run=False)
+        self.assertEqual((stats['deleted'], stats['failed']), (3, 0))
+        self.assertEqual(self.keys(), ['media/other/x.jpg', 'media/uploads/used.jpg'])
+        self.assertFalse(MediaTombstone.objects.exists())
+        # A complete run leaves no checkpoint behind
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_recent_objects_are_skipped(self):
+        stats = self.reconcile(dry_run=False, min_age=timedelta(hours=1))
+        self.assertEqual((stats['young'], stats['deleted']), (3, 0))
+        self.assertEqual(len(self.keys()), 5)
+
+    def test_references_are_checked_again_before_deleting(self):
+        from .media_reconcile import ReferenceSet
+
+        # Saved while the run was listing: not in the loaded set, but in the database
+        with mock.patch.object(ReferenceSet, 'from_database', return_value=ReferenceSet([])):
+            stats = self.reconcile(dry_run=False)
+        self.assertEqual((stats['protected'], stats['deleted']), (1, 3))
+        self.assertIn('media/uploads/used.jpg', self.keys())
+
+    def test_resumes_from_checkpoint(self):
+        from . import media_reconcile
+
+        delete_orphans = media_reconcile._delete_orphans
+
+        def interrupted(candidates, *args):
+            if any(path.startswith('topics/') for path in candidates):
+                raise KeyboardInterrupt
+            return delete_orphans(candidates, *args)
+
+        with mock.patch.object(media_reconcile, '_delete_orphans', interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                self.reconcile(dry_run=False)
+        self.assertEqual(media_reconcile.load_checkpoint(self.checkpoint), {'uploads/': None})
+        self.assertNotIn('media/uploads/a.jpg', self.keys())
+
+        # The finished prefix isn't listed again
+        stats = self.reconcile(dry_run=False)
+        self.assertEqual((stats['listed'], stats['deleted']), (1, 1))
+        self.assertNotIn('media/topics/thumbnails/t.jpg', self.keys())
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_resumes_after_the_last_key(self):
+        from .media_reconcile import save_checkpoint
+
+        save_checkpoint(self.checkpoint, {'uploads/': 'media/uploads/a.jpg'})
+        stats = self.reconcile(dry_run=False, prefixes=('uploads/',))
+        self.assertEqual((stats['listed'], stats['deleted']), (2, 1))
+        self.assertIn('media/uploads/a.jpg', self.keys())
+        self.assertNotIn('media/uploads/b.jpg', self.keys())
+
+    def test_command_needs_bucket_storage(self):
+        from django.core.management import CommandError, call_command
+
+        with self.assertRaises(CommandError):
+            call_command('reconcile_media')
+
+
+def image_bytes(image_format='PNG', size=(40, 30)):
+    from io import BytesIO
+    from PIL import Image
+
+    output = BytesIO()
+    Image.new('RGB', size, 'white').save(output, image_format)
+    return output.getvalue()
+
+
+@override_settings(JOBS_RUN_EAGERLY=False)
+class DirectUploadTests(S3StorageMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        from django.contrib.auth.models import User
+
+        patcher = mock.patch('ckeditor_uploader.utils.storage', self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.editor = User.objects.create_user('editor', 'editor@example.com', 'password', is_staff=True)
+        self.client.force_login(self.editor)
+
+    def presign(self, name='slika.png', content_type='image/png', size=100):
+        return self.client.post('/ckeditor/direct-upload/', {'name': name, 'type': content_type, 'size': size})
+
+    def upload(self, content, content_type='image/png'):
+        import requests  # Installed with moto, which answers the PUT
+
+        presigned = self.presign(content_type=content_type, name=f'slika{content_type.replace("image/", ".")}')
+        self.assertEqual(presigned.status_code, 200)
+        presigned = presigned.json()
+        response = requests.put(presigned['url'], data=content, headers=presigned['headers'])
+        self.assertEqual(response.status_code, 200)
+        return presigned['key']
+
+    def confirm(self, key):
+        return self.client.post('/ckeditor/direct-upload/confirm/', {'key': key})
+
+    def test_upload(self):
+        from .models import MediaTombstone
+
+        key = self.upload(image_bytes())
+        self.assertTrue(key.startswith('uploads/'))
+        self.assertTrue(key.endswith('.png'))
+        # Tracked from the start, so an upload never confirmed is collected too
+        self.assertTrue(MediaTombstone.objects.filter(file_path=key).exists())
+
+        response = self.confirm(key)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['uploaded'], 1)
+        self.assertEqual(response.json()['fileName'], os.path.basename(key))
+        job = Job.objects.get(name='core.optimize_upload')
+        self.assertEqual(job.payload, {'path': key})
+        head = self.s3.head_object(Bucket=self.bucket_name, Key=f'media/{key}')
+        self.assertEqual(head['ContentType'], 'image/png')
+
+        # A key is confirmed once
+        self.assertEqual(self.confirm(key).json()['error']['message'], 'Unknown upload.')
+
+    def test_presign_rejects_other_files(self):
+        self.assertEqual(self.presign(name='skripta.js', content_type='text/javascript').status_code, 400)
+        self.assertEqual(self.presign(name='slika.png', content_type='image/jpeg').status_code, 400)
+        self.assertEqual(self.presign(size=0).status_code, 400)
+        self.assertEqual(self.presign(size=26 * 1024 * 1024).status_code, 400)
+        self.assertEqual(self.presign(size='veliko').status_code, 400)
+
+    def test_staff_only(self):
+        from django.contrib.auth.models import User
+
+        reader = User.objects.create_user('reader', 'reader@example.com', 'password')
+        self.client.force_login(reader)
+        self.assertEqual(self.presign().status_code, 403)
+        self.assertEqual(self.confirm('uploads/slika.png').status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.presign().status_code, 403)
+
+    def test_unknown_key(self):
+        self.put('uploads/tudja.png')
+        response = self.confirm('uploads/tudja.png')
+        self.assertEqual(response.json()['error']['message'], 'Unknown upload.')
+        self.assertIn('media/uploads/tudja.png', self.keys())
+
+    def test_missing_object(self):
+        key = self.presign().json()['key']
+        self.assertEqual(self.confirm(key).json()['error']['message'], 'Upload not found.')
+
+    def test_not_an_image(self):
+        key = self.upload(b'<script>alert(1)</script>')
+        response = self.confirm(key)
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(f'media/{key}', self.keys())
+        self.assertFalse(Job.objects.filter(name='core.optimize_upload').exists())
+
+    def test_larger_than_allowed(self):
+        key = self.upload(image_bytes(size=(400, 400)))
+        # The PUT URL can't limit the size: the object is checked on confirmation
+        with override_settings(CKEDITOR_DIRECT_UPLOAD_MAX_SIZE=100):
+            response = self.confirm(key)
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(f'media/{key}', self.keys())
+
+    def test_unavailable_on_local_storage(self):
+        with mock.patch('ckeditor_uploader.utils.storage', FileSystemStorage(location=tempfile.gettempdir())):
+            response = self.presign()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error']['message'], 'Direct uploads are not available.')
+
+
+class ResizedImageTests(TestCase):
+
+    def setUp(self):
+        from . import image_resize
+
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        overrides = override_settings(
+            MEDIA_ROOT=self.media_root, RESIZED_IMAGE_CACHE_DIR=os.path.join(self.media_root, '.resized'),
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        patcher = mock.patch.object(image_resize, '_cache', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        from django.core.files.storage import default_storage
+        default_storage.save('uploads/slika.png', ContentFile(image_bytes(size=(1000, 500))))
+
+    def get(self, path='uploads/slika.png', width=320, fmt='webp', sig=None):
+        from .image_resize import signature
+
+        sig = sig or signature(path, width, fmt)
+        return self.client.get(f'/img/{width}/{fmt}/{sig}/{path}')
+
+    def test_resized_variant(self):
+        from io import BytesIO
+        from PIL import Image
+        from . import image_resize
+
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        image = Image.open(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual((image.format, image.size), ('WEBP', (320, 160)))
+
+        # Served from the disk cache afterwards
+        with mock.patch.object(image_resize, 'resize') as resize:
+            response = self.get()
+            b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        resize.assert_not_called()
+
+    def test_small_images_are_not_upscaled(self):
+        from io import BytesIO
+        from PIL import Image
+
+        response = self.get(width=1920, fmt='jpeg')
+        image = Image.open(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual((image.format, image.size), ('JPEG', (1000, 500)))
+
+    def test_only_signed_variants(self):
+        self.assertEqual(self.get(sig='0' * 16).status_code, 404)
+        self.assertEqual(self.get(width=321).status_code, 404)
+        self.assertEqual(self.get(fmt='gif').status_code, 404)
+        self.assertEqual(self.get(path='topics/thumbnails/a.png').status_code, 404)
+        self.assertEqual(self.get(path='uploads/../secret.png').status_code, 404)
+        self.assertEqual(self.get(path='uploads/nema.png').status_code, 404)
+
+    def test_body_srcset(self):
+        from .image_resize import resized_url, rewrite_body_images
+
+        html = rewrite_body_images(
+            '<p><img src="/media/uploads/slika.png" alt="a"><img src="https://example.com/x.png">'
+            '<img src="/media/uploads/b.png" srcset="b.png 1x"></p>'
+        )
+        self.assertIn(f'srcset="{resized_url("uploads/slika.png", 320)} 320w, ', html)
+        self.assertEqual(html.count('srcset='), 2)
+        self.assertIn('<img src="https://example.com/x.png">', html)
+
+    def test_disk_cache_evicts_least_recently_used(self):
+        from .image_resize import DiskCache
+
+        cache = DiskCache(os.path.join(self.media_root, 'lru'), max_bytes=250)
+        first = cache.get_or_create('aa1', lambda: b'1' * 100)
+        os.utime(first, (1, 1))
+        second = cache.get_or_create('bb2', lambda: b'2' * 100)
+        os.utime(second, (2, 2))
+        self.assertEqual(cache.get('aa1'), first)  # Used again: now the most recent
+        cache.get_or_create('cc3', lambda: b'3' * 100)
+        self.assertIsNone(cache.get('bb2'))
+        self.assertIsNotNone(cache.get('aa1'))
+        self.assertIsNotNone(cache.get('cc3'))
+
+    def test_concurrent_misses_resize_once(self):
+        from .image_resize import DiskCache
+
+        cache = DiskCache(os.path.join(self.media_root, 'flight'), max_bytes=1000)
+        calls = []
+
+        def create():
+            calls.append(1)
+            time.sleep(0.1)
+            return b'data'
+
+        results = []
+        threads = [Thread(target=lambda: results.append(cache.get_or_create('key', create))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(set(results)), 1)
+
+
+class StreamingUploadHandlerTests(TestCase):
+
+    def receive(self, content, chunk_size=64 * 1024):
+        from .upload_handlers import StreamingUploadHandler
+
+        handler = StreamingUploadHandler()
+        handler.new_file('upload', 'slika.png', 'image/png', len(content))
+        for start in range(0, len(content), chunk_size):
+            handler.receive_data_chunk(content[start:start + chunk_size], start)
+        return handler, handler.file_complete(len(content))
+
+    def test_hash_and_format(self):
+        import hashlib
+
+        content = image_bytes()
+        _, uploaded = self.receive(content, chunk_size=5)
+        self.assertEqual(uploaded.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual((uploaded.image_format, uploaded.size), ('PNG', len(content)))
+        self.assertEqual(uploaded.read(), content)
+        self.assertEqual(self.receive(b'GIF89a' + b'\0' * 10)[1].image_format, 'GIF')
+        self.assertEqual(self.receive(b'RIFF\0\0\0\0WEBPVP8 ')[1].image_format, 'WEBP')
+        self.assertIsNone(self.receive(b'<svg></svg>')[1].image_format)
+
+    @override_settings(FILE_UPLOAD_SPOOL_SIZE=1000)
+    def test_large_files_are_spooled_to_disk(self):
+        _, small = self.receive(b'x' * 1000)
+        self.assertFalse(small.file._rolled)
+        _, large = self.receive(b'x' * 5000, chunk_size=500)
+        self.assertTrue(large.file._rolled)
+        self.assertEqual(large.read(), b'x' * 5000)
+
+    @override_settings(UPLOAD_MAX_FILE_SIZE=1000)
+    def test_size_limit(self):
+        from django.core.files.uploadhandler import StopUpload
+        from .upload_handlers import StreamingUploadHandler
+
+        handler = StreamingUploadHandler()
+        handler.new_file('upload', 'slika.png', 'image/png', None)
+        handler.receive_data_chunk(b'x' * 600, 0)
+        with self.assertRaises(StopUpload):
+            handler.receive_data_chunk(b'x' * 600, 600)
+        self.assertTrue(handler.file.closed)
+
+
+@override_settings(JOBS_RUN_EAGERLY=False)
+class UploadTests(TestCase):
+    """CKEditor uploads through the server, on local storage"""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.storage = FileSystemStorage(location=self.media_root, base_url='/media/')
+        patcher = mock.patch('ckeditor_uploader.utils.storage', self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        editor = User.objects.create_user('editor', 'editor@example.com', 'password', is_staff=True)
+        self.client.force_login(editor)
+
+    def upload(self, content, name='slika.png'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        response = self.client.post('/ckeditor/upload/', {'upload': SimpleUploadedFile(name, content)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['uploaded'], 1)
+        return response.json()['url'].split('/media/', 1)[1]
+
+    def open_stored(self, path):
+        from PIL import Image
+
+        with self.storage.open(path, 'rb') as f:
+            image = Image.open(f)
+            image.load()
+        return image
+
+    def test_photo_is_optimized_in_the_request(self):
+        from io import BytesIO
+        from PIL import Image
+        from .models import UploadOptimization
+
+        photo = Image.new('RGB', (3000, 2000), 'white')
+        exif = photo.getexif()
+        exif[0x0112] = 6  # Rotated 90 degrees by the camera
+        exif[0x010F] = 'Camera'
+        output = BytesIO()
+        photo.save(output, 'JPEG', exif=exif, quality=95)
+
+        path = self.upload(output.getvalue(), name='foto.jpg')
+        self.assertTrue(path.endswith('.webp'))
+        image = self.open_stored(path)
+        self.assertEqual(image.size, (1333, 2000))
+        self.assertEqual(dict(image.getexif()), {})
+        row = UploadOptimization.objects.get(file_path=path)
+        self.assertEqual(row.original_size, len(output.getvalue()))
+        self.assertEqual(row.stored_size, self.storage.size(path))
+        self.assertGreater(row.saved_bytes, 0)
+        self.assertFalse(Job.objects.filter(name='core.optimize_upload').exists())
+
+    @override_settings(CKEDITOR_IMAGE_INLINE_MAX_PIXELS=1000, CKEDITOR_IMAGE_MAX_DIMENSION=50)
+    def test_large_image_is_optimized_by_the_worker(self):
+        from .models import UploadOptimization
+
+        original = image_bytes(size=(200, 100))
+        path = self.upload(original)
+        # Stored as uploaded; the editor gets the URL the job will rewrite in place
+        self.assertTrue(path.endswith('.png'))
+        with self.storage.open(path, 'rb') as f:
+            self.assertEqual(f.read(), original)
+        self.assertFalse(UploadOptimization.objects.exists())
+
+        job = Job.objects.get(name='core.optimize_upload')
+        self.assertEqual(job.payload, {'path': path})
+        [job] = claim_jobs('worker-1', 10)
+        run_job(job)
+        image = self.open_stored(path)
+        self.assertEqual((image.format, image.size), ('PNG', (50, 25)))
+        row = UploadOptimization.objects.get(file_path=path)
+        self.assertEqual((row.original_size, row.stored_size), (len(original), self.storage.size(path)))
+
+    @override_settings(UPLOAD_MAX_FILE_SIZE=1000)
+    def test_files_over_the_limit_are_refused(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        upload = SimpleUploadedFile('velika.png', image_bytes(size=(400, 400)) + b'\0' * 1000)
+        response = self.client.post('/ckeditor/upload/', {'upload': upload})
+        # The handler stops reading the body, so the view gets no file
+        self.assertEqual(response.json()['error']['message'], 'No file uploaded.')
+        self.assertEqual(os.listdir(self.media_root), [])
+
+    def test_renamed_non_images_are_refused(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        response = self.client.post('/ckeditor/upload/', {'upload': SimpleUploadedFile('slika.png', b'<svg></svg>')})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Only image files', response.json()['error']['message'])
+        self.assertEqual(os.listdir(self.media_root), [])
+
+    def test_other_images_are_stored_as_uploaded(self):
+        from io import BytesIO
+        from PIL import Image
+
+        output = BytesIO()
+        Image.new('P', (20, 20)).save(output, 'GIF')
+        path = self.upload(output.getvalue(), name='animacija.gif')
+        self.assertTrue(path.endswith('.gif'))
+        with self.storage.open(path, 'rb') as f:
+            self.assertEqual(f.read(), output.getvalue())
+
+
+@override_settings(JOBS_RUN_EAGERLY=False)
+class ContentAddressedUploadTests(S3StorageMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        from django.contrib.auth.models import User
+
+        patcher = mock.patch('ckeditor_uploader.utils.storage', self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        editor = User.objects.create_user('editor', 'editor@example.com', 'password', is_staff=True)
+        self.client.force_login(editor)
+
+    def upload(self, content, name='slika.gif'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        response = self.client.post('/ckeditor/upload/', {'upload': SimpleUploadedFile(name, content)})
+        self.assertEqual(response.json()['uploaded'], 1)
+        return response.json()['url'].split('/media/', 1)[1]
+
+    def cache_control(self, path):
+        return self.s3.head_object(Bucket=self.bucket_name, Key=f'media/{path}').get('CacheControl')
+
+    def gif(self, size=20):
+        from io import BytesIO
+        from PIL import Image
+
+        output = BytesIO()
+        Image.new('P', (size, size)).save(output, 'GIF')
+        return output.getvalue()
+
+    def test_key_is_the_content_hash(self):
+        import hashlib
+        from .storage import is_content_addressed
+
+        content = self.gif()
+        path = self.upload(content)
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(path, f'uploads/{digest[:2]}/{digest}.gif')
+        self.assertTrue(is_content_addressed(path))
+        self.assertEqual(self.cache_control(path), 'public, max-age=31536000, immutable')
+
+    def test_repeated_upload_is_stored_once(self):
+        content = self.gif()
+        path = self.upload(content)
+        with mock.patch.object(type(self.storage), '_save') as save:
+            self.assertEqual(self.upload(content, name='kopija.gif'), path)
+        save.assert_not_called()
+        self.assertEqual(self.keys(), [f'media/{path}'])
+        self.assertNotEqual(self.upload(self.gif(30)), path)
+
+    @override_settings(CKEDITOR_IMAGE_INLINE_MAX_PIXELS=100)
+    def test_uploads_optimized_later_get_a_regular_name(self):
+        from .storage import is_content_addressed
+
+        path = self.upload(image_bytes(size=(20, 20)), name='velika.png')
+        self.assertFalse(is_content_addressed(path))
+        self.assertNotEqual(self.cache_control(path), 'public, max-age=31536000, immutable')
+
+    @override_settings(CKEDITOR_CONTENT_ADDRESSED_UPLOADS=False)
+    def test_disabled(self):
+        from .storage import is_content_addressed
+
+        path = self.upload(self.gif())
+        self.assertFalse(is_content_addressed(path))
+        self.assertTrue(path.endswith('slika.gif'))
+
+
+@override_settings(JOBS_RUN_EAGERLY=False, MEDIA_GC_GRACE_SECONDS=3600)
+class MediaGarbageCollectionTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.storage = FileSystemStorage(location=media_root)
+        patcher = mock.patch('core.batch_delete.default_storage', self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tombstone(self, path, age, reason=None):
+        """Store a file with a tombstone written `age` ago"""
+        from .models import MediaTombstone
+
+        if not self.storage.exists(path):
+            self.storage.save(path, ContentFile(b'data'))
+        item = MediaTombstone.objects.create(file_path=path, reason=reason or MediaTombstone.UPLOAD)
+        MediaTombstone.objects.filter(pk=item.pk).update(created_at=timezone.now() - age)
+        return item
+
+    def remaining(self):
+        from .models import MediaTombstone
+        return sorted(MediaTombstone.objects.values_list('file_path', flat=True))
+
+    def test_grace_period(self):
+        from .media_gc import sweep
+
+        self.tombstone('uploads/old.jpg', timedelta(hours=2))
+        self.tombstone('uploads/new.jpg', timedelta(minutes=10))
+        stats = sweep()
+        self.assertEqual((stats['tombstones'], stats['deleted'], stats['live']), (1, 1, 0))
+        self.assertFalse(self.storage.exists('uploads/old.jpg'))
+        # Still within the grace period: the editor may save content using it
+        self.assertTrue(self.storage.exists('uploads/new.jpg'))
+        self.assertEqual(self.remaining(), ['uploads/new.jpg'])
+
+        stats = sweep(grace=timedelta(minutes=5))
+        self.assertEqual(stats['deleted'], 1)
+        self.assertEqual(self.remaining(), [])
+
+    def test_referenced_files_are_live(self):
+        from .media_gc import sweep
+        from .models import ImageReference, MediaTombstone
+
+        self.tombstone('uploads/used.jpg', timedelta(hours=2), MediaTombstone.REMOVED)
+        ImageReference.objects.create(
+            file_path='uploads/used.jpg', model_name='topics.Topic', object_id=1,
+            field_name='full_description', language='sr-latn',
+        )
+        stats = sweep()
+        self.assertEqual((stats['live'], stats['deleted']), (1, 0))
+        self.assertTrue(self.storage.exists('uploads/used.jpg'))
+        self.assertEqual(self.remaining(), [])
+
+    def test_tombstoned_again_within_grace_period(self):
+        from .media_gc import sweep
+
+        # The same content uploaded again (content-addressed key) in the meantime
+        self.tombstone('uploads/same.jpg', timedelta(hours=2))
+        self.tombstone('uploads/same.jpg', timedelta(minutes=10))
+        stats = sweep()
+        self.assertEqual((stats['live'], stats['deleted']), (1, 0))
+        self.assertTrue(self.storage.exists('uploads/same.jpg'))
+        self.assertEqual(self.remaining(), ['uploads/same.jpg'])
+
+    def test_failed_deletions_are_retried(self):
+        from .media_gc import sweep
+
+        self.tombstone('uploads/a.jpg', timedelta(hours=2))
+        self.tombstone('uploads/b.jpg', timedelta(hours=2))
+        result = {'deleted': {'uploads/a.jpg'}, 'errors': {'uploads/b.jpg': 'AccessDenied'}}
+        with mock.patch('core.batch_delete.delete_files', return_value=result):
+            stats = sweep()
+        self.assertEqual((stats['deleted'], stats['failed']), (1, 1))
+        self.assertEqual(self.remaining(), ['uploads/b.jpg'])
+
+    def test_batches(self):
+        from .media_gc import sweep
+
+        for i in range(5):
+            self.tombstone(f'uploads/{i}.jpg', timedelta(hours=2))
+        lines = []
+        with override_settings(MEDIA_GC_BATCH_SIZE=2):
+            stats = sweep(progress=lines.append)
+        self.assertEqual(stats['deleted'], 5)
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(self.remaining(), [])
+
+    def test_dry_run(self):
+        from .media_gc import sweep
+
+        self.tombstone('uploads/old.jpg', timedelta(hours=2))
+        stats = sweep(dry_run=True)
+        self.assertEqual(stats['deleted'], 1)
+        self.assertTrue(self.storage.exists('uploads/old.jpg'))
+        self.assertEqual(self.remaining(), ['uploads/old.jpg'])
+
+    def test_storage_down(self):
+        from .circuit_breaker import CircuitOpenError, storage_breaker
+        from .media_gc import sweep
+
+        self.tombstone('uploads/old.jpg', timedelta(hours=2))
+        with mock.patch.object(storage_breaker, 'retry_in', return_value=30):
+            with self.assertRaises(CircuitOpenError):
+                sweep()
+        self.assertTrue(self.storage.exists('uploads/old.jpg'))
+        self.assertEqual(self.remaining(), ['uploads/old.jpg'])
+
+    def test_tombstones_follow_the_transaction(self):
+        from .media_gc import tombstone
+        from .models import MediaTombstone
+
+        try:
+            with transaction.atomic():
+                tombstone(['/uploads/a.jpg', '', 'uploads/a.jpg'], MediaTombstone.DELETED)
+                self.assertEqual(self.remaining(), ['uploads/a.jpg'])
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(self.remaining(), [])
+
+    def test_one_scheduled_sweep(self):
+        from .media_gc import SWEEP_TASK, schedule_sweep
+
+        schedule_sweep()
+        schedule_sweep()
+        self.assertEqual(Job.objects.filter(name=SWEEP_TASK).count(), 1)
+
+
+class CircuitBreakerTests(TestCase):
+
+    def setUp(self):
+        from .circuit_breaker import CircuitBreaker
+
+        self.breaker = CircuitBreaker('test', failures=2, reset_seconds=0.05)
+
+    def fail(self):
+        with self.assertRaises(ConnectionError):
+            self.breaker.call(mock.Mock(side_effect=ConnectionError('timeout')))
+
+    def open(self):
+        self.fail()
+        self.fail()
+        self.assertEqual(self.breaker.state, self.breaker.OPEN)
+
+    def test_closed(self):
+        self.fail()
+        self.assertEqual(self.breaker.call(lambda: 'ok'), 'ok')
+        # A success resets the count: failures must be consecutive
+        self.fail()
+        self.assertEqual(self.breaker.state, self.breaker.CLOSED)
+        self.assertEqual(self.breaker.retry_in(), 0)
+
+    def test_open(self):
+        from .circuit_breaker import CircuitOpenError
+
+        self.open()
+        func = mock.Mock()
+        with self.assertRaises(CircuitOpenError) as context:
+            self.breaker.call(func)
+        func.assert_not_called()
+        self.assertGreater(context.exception.delay, 0)
+        self.assertGreater(self.breaker.retry_in(), 0)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.raise_if_open()
+
+    def test_probe_success_closes(self):
+        from .circuit_breaker import CircuitOpenError
+
+        self.open()
+        time.sleep(0.06)
+        self.breaker.check()
+        self.assertEqual(self.breaker.state, self.breaker.HALF_OPEN)
+        # Only one probe at a time
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.call(lambda: 'ok')
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, self.breaker.CLOSED)
+        self.assertEqual(self.breaker.call(lambda: 'ok'), 'ok')
+
+    def test_probe_failure_opens_again(self):
+        from .circuit_breaker import CircuitOpenError
+
+        self.open()
+        time.sleep(0.06)
+        self.fail()
+        self.assertEqual(self.breaker.state, self.breaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.raise_if_open()
+
+    def test_gate_leaves_the_probe_to_the_storage_call(self):
+        self.open()
+        time.sleep(0.06)
+        for _ in range(3):
+            self.breaker.raise_if_open()
+        self.assertEqual(self.breaker.call(lambda: 'ok'), 'ok')
+        self.assertEqual(self.breaker.state, self.breaker.CLOSED)
+
+    @override_settings(JOBS_RUN_EAGERLY=False)
+    def test_storage_jobs_postponed_while_open(self):
+        from .tasks import optimize_upload
+
+        self.open()
+        job = enqueue('core.optimize_upload', path='uploads/a.jpg')
+        with mock.patch('core.tasks.storage_breaker', self.breaker), \
+                mock.patch('core.image_optimizer.optimize_stored_image', return_value=(10, 5)) as optimize:
+            self.assertFalse(run_job(claim_jobs('worker-1', 1)[0]))
+            optimize.assert_not_called()
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.PENDING, 0))
+
+            # Once the probe is due the job runs, and its storage calls decide the state
+            time.sleep(0.06)
+            optimize_upload(path='uploads/a.jpg')
+            optimize.assert_called_once()
+        self.assertEqual(self.breaker.call(lambda: 'ok'), 'ok')
@@ -0,0 +1,175 @@
+"""
+Responsive thumbnail derivatives.
+
+When a thumbnail is uploaded, smaller copies are generated in a background
+job (see core.jobs): WebP at several widths, plus AVIF when Pillow can write
+it. They are stored next to the original under deterministic names:
+
+    topics/thumbnails/photo_1a2b.jpg
+    topics/thumbnails/photo_1a2b.320w.webp
+    topics/thumbnails/photo_1a2b.320w.avif
+
+The result is recorded on the model (thumbnail_derivatives) together with
+the URLs, so rendering a srcset needs no storage calls:
+
+    {"source": "topics/thumbnails/photo_1a2b.jpg", "width": 1600, "height": 900,
+     "variants": [{"name": ..., "url": ..., "format": "webp", "width": 320, "height": 180}, ...]}
+
+Generating is idempotent: a variant that already exists in storage is not
+written again, so a retried job only produces what is missing.
+
+The job saves the object when it is done, which purges its pages and (for a
+category) the navigation. It runs in the job worker, so those purges rely on
+the cache shared with the web service (see CACHES in settings).
+"""
+import io
+import logging
+import os
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Widths cover the 50px navigation thumbnails (at 2x/3x) up to full-width cards
+DEFAULT_WIDTHS = (160, 320, 640, 1024)
+
+# Pillow save options per output format
+FORMAT_OPTIONS = {
+    'avif': {'format': 'AVIF', 'quality': 55},
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+}
+
+CONTENT_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+}
+
+
+def thumbnail_widths():
+    return tuple(sorted(getattr(settings, 'THUMBNAIL_WIDTHS', DEFAULT_WIDTHS)))
+
+
+def output_formats():
+    """Formats this Pillow build can write, best compression first"""
+    Image.init()
+    formats = []
+    for fmt, options in FORMAT_OPTIONS.items():
+        if options['format'] in Image.SAVE:
+            formats.append(fmt)
+    return formats
+
+
+def derivative_name(source_name, width, fmt):
+    """Storage name of a derivative, e.g. topics/thumbnails/a.jpg -> topics/thumbnails/a.320w.webp"""
+    base, _ = os.path.splitext(source_name)
+    return f'{base}.{width}w.{fmt}'
+
+
+def _target_widths(source_width):
+    """Configured widths below the source width, plus the source width when it is smaller than the largest"""
+    widths = [width for width in thumbnail_widths() if width < source_width]
+    if source_width <= thumbnail_widths()[-1]:
+        widths.append(source_width)
+    return widths
+
+
+def _prepare(image):
+    """Apply the EXIF orientation and convert to a mode WebP/AVIF can store"""
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        return image.convert('RGBA')
+    return image.convert('RGB')
+
+
+def generate_derivatives(source_name, storage=None):
+    """
+    Generate the derivatives of an image in storage.
+
+    Args:
+        source_name: Storage name of the original image
+        storage: Storage holding the image (defaults to default_storage)
+
+    Returns:
+        Derivatives dict as stored on the model (see module docstring)
+    """
+    storage = storage or default_storage
+    with storage.open(source_name, 'rb') as f:
+        with Image.open(f) as original:
+            image = _prepare(original)
+
+    source_width, source_height = image.size
+    formats = output_formats()
+    variants = []
+    for width in _target_widths(source_width):
+        height = max(round(source_height * width / source_width), 1)
+        resized = image if width == source_width else image.resize((width, height), Image.LANCZOS)
+        for fmt in formats:
+            name = derivative_name(source_name, width, fmt)
+            if not storage.exists(name):
+                buffer = io.BytesIO()
+                resized.save(buffer, **FORMAT_OPTIONS[fmt])
+                saved_name = storage.save(name, ContentFile(buffer.getvalue()))
+                if saved_name != name:
+                    logger.warning(f"Derivative {name} was stored as {saved_name}")
+                    name = saved_name
+            variants.append({
+                'name': name,
+                'url': storage.url(name),
+                'format': fmt,
+                'width': width,
+                'height': height,
+            })
+
+    logger.info(f"Generated {len(variants)} derivatives of {source_name}")
+    return {
+        'source': source_name,
+        'width': source_width,
+        'height': source_height,
+        'variants': variants,
+    }
+
+
+def derivative_srcsets(derivatives):
+    """
+    srcset strings per format from a derivatives dict.
+
+    Returns:
+        List of (content type, srcset) in the order browsers should try them
+    """
+    by_format = {}
+    for variant in (derivatives or {}).get('variants', []):
+        by_format.setdefault(variant['format'], []).append(variant)
+
+    srcsets = []
+    for fmt in FORMAT_OPTIONS:
+        if fmt in by_format:
+            candidates = sorted(by_format[fmt], key=lambda variant: variant['width'])
+            srcset = ', '.join(f"{variant['url']} {variant['width']}w" for variant in candidates)
+            srcsets.append((CONTENT_TYPES[fmt], srcset))
+    return srcsets
+
+
+def derivative_url(derivatives, min_width, fallback=''):
+    """URL of the smallest WebP variant at least min_width wide (the fallback if there is none)"""
+    variants = [
+        variant for variant in (derivatives or {}).get('variants', [])
+        if variant['format'] == 'webp' and variant['width'] >= min_width
+    ]
+    if not variants:
+        return fallback
+    return min(variants, key=lambda variant: variant['width'])['url']
+
+
+def queue_derivatives(instance):
+    """Queue derivative generation for an instance's thumbnail (called from save)"""
+    from .jobs import enqueue
+
+    if instance.thumbnail:
+        enqueue(
+            'core.generate_thumbnail_derivatives',
+            model=instance._meta.label,
+            object_id=instance.pk,
+            source=instance.thumbnail.name,
+        )
@@ -0,0 +1,70 @@
+"""
+Translated URL routes.
+
+Serbian (Latin and Cyrillic) pages use Serbian path segments (teme, o-nama,
+korisnici/prijava, ...) and English pages use English ones (topics, about,
+users/login, ...). Instead of mounting every URLconf once per language, each
+route is declared once with a lazy route string that evaluates to the segment
+of the active language. Django compiles and caches the patterns per language,
+so resolving and reversing always produce the canonical path directly.
+
+translate_path() maps a path from any language onto the canonical path of
+another one; it backs the language switcher and CanonicalPathMiddleware.
+"""
+from django.conf import settings
+from django.urls import reverse, resolve, NoReverseMatch, Resolver404
+from django.utils import translation
+from django.utils.functional import lazy
+
+
+def _route_for_language(serbian, english):
+    return english if translation.get_language() == 'en' else serbian
+
+
+_lazy_route = lazy(_route_for_language, str)
+
+
+def translated_route(serbian, english):
+    """
+    Route string that follows the active language.
+
+    Args:
+        serbian: Route used for sr-latn and sr-cyrl (e.g. 'o-nama/')
+        english: Route used for en (e.g. 'about/')
+    """
+    return _lazy_route(serbian, english)
+
+
+def translate_path(path, target_lang):
+    """
+    Canonical path of a page in another language.
+
+    The path is resolved in its own language first and then in the other
+    languages, so a path that uses segments of the wrong language (e.g.
+    /en/o-nama/) is still understood.
+
+    Args:
+        path: Path with a language prefix (request.path_info)
+        target_lang: Language of the returned path
+
+    Returns:
+        The path in target_lang, or None if the path cannot be resolved
+    """
+    source_lang = translation.get_language_from_path(path)
+    if not source_lang:
+        return None
+    rest = path[len(source_lang) + 2:]
+
+    languages = [source_lang] + [code for code, _ in settings.LANGUAGES if code != source_lang]
+    for lang in languages:
+        with translation.override(lang):
+            try:
+                match = resolve(f'/{lang}/{rest}')
+            except Resolver404:
+                continue
+        with translation.override(target_lang):
+            try:
+                return reverse(match.view_name, args=match.args, kwargs=match.kwargs)
+            except NoReverseMatch:
+                return None
+    return None
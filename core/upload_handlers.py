@@ -0,0 +1,109 @@
+"""
+Streaming upload handler.
+
+Django's default handlers keep files up to FILE_UPLOAD_MAX_MEMORY_SIZE
+(10 MB here) entirely in memory. StreamingUploadHandler writes each chunk
+of the request body to a spooled temporary file instead: only the first
+FILE_UPLOAD_SPOOL_SIZE bytes stay in memory, the rest goes to disk, so the
+memory a request needs doesn't grow with the file size.
+
+While the chunks stream through, the handler also computes:
+- sha256: hex digest of the content (used for content-addressed uploads, see core.storage)
+- image_format: JPEG, PNG, GIF or WEBP sniffed from the first bytes, None otherwise
+
+Files larger than UPLOAD_MAX_FILE_SIZE stop the upload.
+
+Saving to R2 reads the file back in chunks as well: S3Boto3Storage sends
+files above the multipart threshold as a multipart upload.
+"""
+import hashlib
+import logging
+import tempfile
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+logger = logging.getLogger(__name__)
+
+# Leading bytes of the image formats uploads may have
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+)
+
+# Bytes needed to recognize every format above (WebP: RIFF....WEBP)
+SNIFF_BYTES = 12
+
+
+def sniff_image_format(header):
+    """Image format from the first bytes of a file, or None if it is not a known image"""
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'WEBP'
+    for signature, image_format in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return image_format
+    return None
+
+
+def spool_size():
+    return getattr(settings, 'FILE_UPLOAD_SPOOL_SIZE', 1024 * 1024)
+
+
+def max_file_size():
+    return getattr(settings, 'UPLOAD_MAX_FILE_SIZE', 25 * 1024 * 1024)
+
+
+class StreamedUploadedFile(UploadedFile):
+    """Uploaded file held in a spooled temporary file, with its hash and sniffed image format"""
+
+    def __init__(self, file, name, content_type, size, charset, content_type_extra, sha256, image_format):
+        super().__init__(file, name, content_type, size, charset, content_type_extra)
+        self.sha256 = sha256
+        self.image_format = image_format
+
+
+class StreamingUploadHandler(FileUploadHandler):
+    """Stream uploaded files to a spooled temporary file, hashing and sniffing them on the way"""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = tempfile.SpooledTemporaryFile(
+            max_size=spool_size(),
+            dir=settings.FILE_UPLOAD_TEMP_DIR,
+            suffix='.upload',
+        )
+        self.digest = hashlib.sha256()
+        self.header = b''
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > max_file_size():
+            logger.warning(f"Upload {self.file_name} exceeds {max_file_size()} bytes, stopping")
+            self.file.close()
+            raise StopUpload(connection_reset=True)
+        if len(self.header) < SNIFF_BYTES:
+            self.header += raw_data[:SNIFF_BYTES - len(self.header)]
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+        # Nothing is left for later handlers
+        return None
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        return StreamedUploadedFile(
+            file=self.file,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+            sha256=self.digest.hexdigest(),
+            image_format=sniff_image_format(self.header),
+        )
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.close()
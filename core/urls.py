@@ -1,6 +1,6 @@
 from django.urls import path
-from django.utils.translation import get_language
 from . import views
+from .translated_urls import translated_route
 
 app_name = 'core'
 
@@ -8,12 +8,6 @@ app_name = 'core'
 # Serbian (Latin and Cyrillic) use Serbian slugs, English uses English slugs
 urlpatterns = [
     path('', views.home, name='home'),
-    # Serbian slugs (for sr-latn and sr-cyrl)
-    path('o-nama/', views.about, name='about'),
-    path('kontakt/', views.contact, name='contact'),
-    # English slugs
-    path('about/', views.about, name='about_en'),
-    path('contact/', views.contact, name='contact_en'),
+    path(translated_route('o-nama/', 'about/'), views.about, name='about'),
+    path(translated_route('kontakt/', 'contact/'), views.contact, name='contact'),
 ]
-
-
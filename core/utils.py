@@ -7,9 +7,8 @@ import logging
 import uuid
 from urllib.parse import urlparse
 from django.conf import settings
-from django.core.files.storage import default_storage
 from django.utils import timezone
-from .upload_tracker import cleanup_unused_uploads, mark_upload_as_used, cleanup_old_tracking_records, delete_file_from_storage
+from .media_gc import tombstone
 
 logger = logging.getLogger(__name__)
 
@@ -114,6 +113,11 @@ def cleanup_orphaned_images(model_instance, old_instance=None):
     - Topic thumbnails
     - CKEditor uploaded images in descriptions
     
+    Images removed from the instance get a tombstone; the media garbage
+    collector deletes them after the grace period unless something uses them
+    by then (see core.media_gc). Uploads that never made it into saved
+    content already have their tombstone from the upload.
+    
     Args:
         model_instance: The current instance being saved
         old_instance: The instance before save (for detecting changes)
@@ -122,104 +126,16 @@ def cleanup_orphaned_images(model_instance, old_instance=None):
     if settings.DEBUG or not settings.AWS_ACCESS_KEY_ID:
         return
     
-    # Get all current image paths from the instance
-    current_image_paths = set()
-    
-    # Handle thumbnail (for Topic)
-    if hasattr(model_instance, 'thumbnail') and model_instance.thumbnail:
-        current_image_paths.add(model_instance.thumbnail.name)
-    
-    # Handle CKEditor images in descriptions
-    # Check short_description and full_description fields
-    for field_name in ['short_description', 'full_description']:
-        if hasattr(model_instance, field_name):
-            field_value = getattr(model_instance, field_name)
-            if field_value:
-                ckeditor_images = extract_images_from_html(field_value)
-                current_image_paths.update(ckeditor_images)
-    
-    # Get old image paths if old_instance exists
-    old_image_paths = set()
-    if old_instance:
-        if hasattr(old_instance, 'thumbnail') and old_instance.thumbnail:
-            old_image_paths.add(old_instance.thumbnail.name)
-        
-        # Handle CKEditor images in old descriptions
-        for field_name in ['short_description', 'full_description']:
-            if hasattr(old_instance, field_name):
-                field_value = getattr(old_instance, field_name)
-                if field_value:
-                    ckeditor_images = extract_images_from_html(field_value)
-                    old_image_paths.update(ckeditor_images)
-    
-    # Find orphaned images (in old but not in current)
-    orphaned_paths = old_image_paths - current_image_paths
-    
-    # Always cleanup unused uploads FIRST (for both new and edited instances)
-    # This handles cases where images were uploaded but removed before saving
-    # We need to do this BEFORE marking uploads as used, so we can find orphaned ones
-    model_name = model_instance.__class__.__name__
-    instance_id = model_instance.pk
-    is_new_instance = old_instance is None
-    
-    # For new instances, try to get session uploads if available
-    # This allows us to check only uploads from current editing session
-    session_uploads = None
-    if is_new_instance:
-        # Try to get request from model_instance (set by admin save_model)
-        request = getattr(model_instance, '_request', None)
-        if request and hasattr(request, 'session'):
-            session_uploads = request.session.get('ckeditor_uploads', [])
+    from .image_references import instance_image_paths
+    from .models import MediaTombstone
     
-    try:
-        cleanup_unused_uploads(current_image_paths, model_name, instance_id, is_new_instance=is_new_instance, session_uploads=session_uploads)
-    except Exception as e:
-        # Log error but don't fail the save
-        logger.warning(f"Failed to cleanup unused uploads: {str(e)}")
+    if old_instance is None:
+        return  # Nothing was removed from a new instance
     
-    # Mark used uploads as used (for tracking purposes) - AFTER cleanup
-    # This ensures orphaned uploads are deleted before we mark others as used
-    # We'll delete these records immediately after, but mark them first for consistency
-    for path in current_image_paths:
-        if path.startswith('uploads/'):
-            try:
-                mark_upload_as_used(path, model_name, instance_id)
-                # Delete immediately after marking (no need to keep it)
-                try:
-                    upload_record = CkeditorUpload.objects.get(file_path=path)
-                    upload_record.delete()
-                except CkeditorUpload.DoesNotExist:
-                    pass
-            except Exception as e:
-                # Log error but don't fail the save
-                logger.warning(f"Failed to mark upload as used: {path} - {str(e)}")
-    
-    # Clear session uploads after cleanup (for new instances)
-    if is_new_instance and session_uploads is not None:
-        request = getattr(model_instance, '_request', None)
-        if request and hasattr(request, 'session'):
-            request.session['ckeditor_uploads'] = []
-            request.session.modified = True
-    
-    # Delete orphaned images (from old content that was removed)
-    for path in orphaned_paths:
-        delete_file_from_storage(path)
-        
-        # Delete tracking record if it exists (image was removed from content)
-        if path.startswith('uploads/'):
-            from .models import CkeditorUpload
-            try:
-                upload = CkeditorUpload.objects.get(file_path=path)
-                upload.delete()  # Delete tracking record - image is already deleted from R2
-            except CkeditorUpload.DoesNotExist:
-                pass
-    
-    # Clean up old tracking records on every save
-    # This is fast (just deleting old database records) and keeps the database clean
-    try:
-        cleanup_old_tracking_records()
-    except Exception:
-        pass  # Don't fail if cleanup has issues
+    # Images in old but not in current content (thumbnail + descriptions in every language)
+    # Whether another object still uses them is checked when the tombstones are swept
+    removed_paths = instance_image_paths(old_instance) - instance_image_paths(model_instance)
+    tombstone(removed_paths, MediaTombstone.REMOVED)
 
 
 def cleanup_all_instance_images(instance):
@@ -228,76 +144,28 @@ def cleanup_all_instance_images(instance):
     This includes:
     - Thumbnail images
     - CKEditor uploaded images in descriptions
+    
+    The images get tombstones (see core.media_gc); images another object
+    still uses are kept when they are swept.
     """
     # Only run cleanup in production (when using R2)
     if settings.DEBUG or not settings.AWS_ACCESS_KEY_ID:
         return
     
-    image_paths = []
+    from .image_references import instance_image_paths
+    from .models import MediaTombstone
     
-    # Handle thumbnail (for Topic)
-    if hasattr(instance, 'thumbnail') and instance.thumbnail:
-        image_paths.append(instance.thumbnail.name)
-    
-    # Handle CKEditor images in descriptions
-    for field_name in ['short_description', 'full_description']:
-        if hasattr(instance, field_name):
-            field_value = getattr(instance, field_name)
-            if field_value:
-                ckeditor_images = extract_images_from_html(field_value)
-                image_paths.extend(ckeditor_images)
-    
-    # Delete all images
-    for path in image_paths:
-        delete_file_from_storage(path)
+    tombstone(instance_image_paths(instance), MediaTombstone.DELETED)
 
 
 def cleanup_all_orphaned_files():
     """
-    Scan entire R2 bucket and delete all files that are not referenced by any Topic.
-    This is a comprehensive cleanup that checks all files in the bucket.
+    Scan the entire R2 bucket and delete all media files that are not referenced
+    by any Topic or Category (see core.media_reconcile and the reconcile_media command).
     """
-    # Import here to avoid circular imports
-    from topics.models import Topic
-    
     # Only run cleanup in production (when using R2)
     if settings.DEBUG or not settings.AWS_ACCESS_KEY_ID:
-        return
-    
-    # Get all referenced image paths from database
-    referenced_paths = set()
-    
-    # Get all topic thumbnails
-    for topic in Topic.objects.all():
-        if topic.thumbnail:
-            referenced_paths.add(topic.thumbnail.name)
-    
-    # Get all CKEditor uploads (from full_description and short_description)
-    # These are stored in the uploads/ path
-    # Note: We can't easily track these without parsing HTML, so we'll skip them for now
-    # or you can manually clean them up
+        return None
     
-    # List all files in the media/ directory in R2
-    try:
-        # Get all files from the media directory
-        # This requires listing the bucket, which might be expensive
-        # We'll focus on known paths: topics/
-        
-        # For now, we'll use a simpler approach:
-        # Only check files in topics/ directories
-        # and compare with database references
-        
-        # This is a simplified version - full bucket scan would require
-        # listing all objects which can be slow and expensive
-        
-        # For comprehensive cleanup, you might want to run this as a management command
-        # or scheduled task rather than on every save
-        
-        pass  # Full bucket listing would go here if needed
-        
-    except Exception as e:
-        print(f"Error during full bucket cleanup: {e}")
-    
-    # The current per-instance cleanup is more efficient
-    # Full bucket scans should be run manually or on a schedule
-
+    from .media_reconcile import reconcile_media
+    return reconcile_media(dry_run=False)
@@ -1,17 +1,22 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.views.decorators.http import require_http_methods
+from django.http import FileResponse, Http404
+from django.views.decorators.http import require_GET, require_http_methods
 from django.views.decorators.csrf import csrf_protect
 from django.conf import settings
-from django.core.mail import EmailMessage
 from django.utils.translation import gettext_lazy as _
 from .models import UserEmail
+from .jobs import enqueue
+from .conditional import conditional_page, static_page_validators
+from .page_cache import cache_public_page
 import re
 import logging
 
 logger = logging.getLogger('core')
 
 
+@cache_public_page
+@conditional_page(static_page_validators)
 def home(request):
     try:
         logger.info('Home view called')
@@ -21,41 +26,16 @@ def home(request):
         raise
 
 
+@cache_public_page
 def about(request):
-    """About page view with language-aware slug handling"""
-    from django.utils import translation
-    from django.shortcuts import redirect
-    
-    lang = translation.get_language()
-    # Get the path without language prefix (i18n_patterns removes it)
-    current_path = request.path
-    
-    # If on English and accessing Serbian slug (o-nama), redirect to English slug
-    if lang == 'en' and request.resolver_match.url_name == 'about':
-        return redirect('core:about_en')
-    # If on Serbian (Latin/Cyrillic) and accessing English slug (about_en), redirect to Serbian slug
-    elif lang in ('sr-latn', 'sr-cyrl') and request.resolver_match.url_name == 'about_en':
-        return redirect('core:about')
-    
+    """About page view"""
     return render(request, 'core/about.html')
 
 
 @csrf_protect
 @require_http_methods(["GET", "POST"])
 def contact(request):
-    """Contact page view with language-aware slug handling"""
-    from django.utils import translation
-    from django.shortcuts import redirect
-    
-    lang = translation.get_language()
-    
-    # If on English and accessing Serbian slug (kontakt), redirect to English slug
-    if lang == 'en' and request.resolver_match.url_name == 'contact':
-        return redirect('core:contact_en')
-    # If on Serbian (Latin/Cyrillic) and accessing English slug (contact_en), redirect to Serbian slug
-    elif lang in ('sr-latn', 'sr-cyrl') and request.resolver_match.url_name == 'contact_en':
-        return redirect('core:contact')
-    
+    """Contact page view"""
     if request.method == 'POST':
         name = request.POST.get('name', '').strip()
         surname = request.POST.get('surname', '').strip()
@@ -105,19 +85,48 @@ Email: {email}
 Poruka:
 {message}
 """
-                # Use EmailMessage to set Reply-To header
-                # This allows admin to click Reply and have the user's email in the "To" field
-                email = EmailMessage(
+                # Sent by the job worker so the visitor doesn't wait on SendGrid
+                # Reply-To lets the admin click Reply and have the user's email in the "To" field
+                enqueue(
+                    'core.send_email',
                     subject=f'Nova poruka sa kontakt forme - {name} {surname}',
                     body=email_body,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
                     to=[settings.CONTACT_EMAIL],
                     reply_to=[email],  # Set Reply-To to user's email
                 )
-                email.send(fail_silently=False)
                 messages.success(request, _('Poruka je uspešno poslata. Kontaktiraćemo vas uskoro.'))
                 return redirect('core:contact')
             except Exception as e:
                 messages.error(request, _('Došlo je do greške pri slanju poruke. Molimo pokušajte ponovo.'))
 
     return render(request, 'core/contact.html')
+
+
+@require_GET
+def resized_image(request, width, fmt, signature, path):
+    """
+    Serve a body image resized to a signed width and format (see core.image_resize).
+    Variants are cached on local disk; the response may be cached for a year.
+    """
+    from .image_resize import FORMATS, is_valid, resized_file
+
+    if not is_valid(path, width, fmt, signature):
+        raise Http404
+    
+    # A cached file can be evicted between lookup and open - then it is resized again
+    for attempt in range(2):
+        try:
+            file = open(resized_file(path, width, fmt), 'rb')
+            break
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            # Missing or unreadable source image
+            logger.warning(f"Failed to resize {path} to {width}px {fmt}: {str(e)}")
+            raise Http404
+    else:
+        raise Http404
+    
+    response = FileResponse(file, content_type=FORMATS[fmt][1])
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
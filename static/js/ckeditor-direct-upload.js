@@ -0,0 +1,131 @@
+// Direct-to-R2 uploads for images pasted or dropped into CKEditor (see core/direct_upload.py)
+// 1. Ask the server for a presigned PUT URL (directUploadUrl)
+// 2. PUT the file straight to the bucket with the signed headers
+// 3. Confirm the upload (directUploadConfirmUrl) with the editor's own request,
+//    which answers like the regular upload view, so CKEditor handles the response as usual
+// If direct uploads are not available the file goes to the regular upload view (uploadUrl).
+(function() {
+    'use strict';
+
+    function getCookie(name) {
+        const match = document.cookie.match(new RegExp('(?:^|;\\s*)' + name + '=([^;]*)'));
+        return match ? decodeURIComponent(match[1]) : '';
+    }
+
+    function postForm(url, data) {
+        const body = new FormData();
+        Object.keys(data).forEach(function(key) {
+            body.append(key, data[key]);
+        });
+        return fetch(url, {
+            method: 'POST',
+            body: body,
+            credentials: 'same-origin',
+            headers: {'X-CSRFToken': getCookie('csrftoken')}
+        });
+    }
+
+    // The regular upload, as CKEditor would have sent it
+    function uploadToServer(fileLoader) {
+        const formData = new FormData();
+        formData.append('upload', fileLoader.file, fileLoader.fileName);
+        fileLoader.xhr.open('POST', fileLoader.uploadUrl, true);
+        fileLoader.xhr.send(formData);
+    }
+
+    // Upload to the bucket with progress reported to the editor's loader
+    function uploadToBucket(fileLoader, presigned) {
+        return new Promise(function(resolve, reject) {
+            const xhr = new XMLHttpRequest();
+            xhr.upload.onprogress = function(evt) {
+                if (evt.lengthComputable) {
+                    fileLoader.uploadTotal = evt.total;
+                    fileLoader.uploaded = evt.loaded;
+                    fileLoader.update();
+                }
+            };
+            xhr.onload = function() {
+                if (xhr.status >= 200 && xhr.status < 300) {
+                    resolve();
+                } else {
+                    reject(new Error('Bucket upload failed (' + xhr.status + ')'));
+                }
+            };
+            xhr.onerror = function() {
+                reject(new Error('Bucket upload failed'));
+            };
+            xhr.open('PUT', presigned.url, true);
+            // Content-Type and Cache-Control are part of the signature
+            Object.keys(presigned.headers).forEach(function(name) {
+                xhr.setRequestHeader(name, presigned.headers[name]);
+            });
+            xhr.send(fileLoader.file);
+        });
+    }
+
+    function confirmUpload(fileLoader, confirmUrl, key) {
+        const formData = new FormData();
+        formData.append('key', key);
+        fileLoader.xhr.open('POST', confirmUrl, true);
+        fileLoader.xhr.setRequestHeader('X-CSRFToken', getCookie('csrftoken'));
+        fileLoader.xhr.send(formData);
+    }
+
+    function attach(editor) {
+        // Priority 4 runs before the default request listener of the filetools plugin, which evt.stop() skips
+        editor.on('fileUploadRequest', function(evt) {
+            // The configuration is read here: it is not complete yet when the editor is created
+            const presignUrl = editor.config.directUploadUrl;
+            const confirmUrl = editor.config.directUploadConfirmUrl;
+            const fileLoader = evt.data.fileLoader;
+            // Only uploads to the regular upload view are redirected
+            if (!presignUrl || !confirmUrl || !window.fetch || fileLoader.uploadUrl !== editor.config.uploadUrl) {
+                return;
+            }
+            evt.stop();
+
+            postForm(presignUrl, {
+                name: fileLoader.fileName,
+                type: fileLoader.file.type,
+                size: fileLoader.file.size
+            }).then(function(response) {
+                if (!response.ok) {
+                    // Not available (e.g. local storage in development) - upload through the server
+                    uploadToServer(fileLoader);
+                    return;
+                }
+                return response.json().then(function(presigned) {
+                    return uploadToBucket(fileLoader, presigned).then(function() {
+                        confirmUpload(fileLoader, confirmUrl, presigned.key);
+                    });
+                });
+            }).catch(function(error) {
+                console.warn('Direct upload failed, uploading through the server:', error);
+                uploadToServer(fileLoader);
+            });
+        }, null, null, 4);
+    }
+
+    function init() {
+        // Only pages with an editor load CKEditor
+        if (!document.querySelector('textarea[data-type=ckeditortype]')) {
+            return;
+        }
+        if (!window.CKEDITOR) {
+            setTimeout(init, 100);
+            return;
+        }
+        CKEDITOR.on('instanceCreated', function(evt) {
+            attach(evt.editor);
+        });
+        Object.keys(CKEDITOR.instances).forEach(function(name) {
+            attach(CKEDITOR.instances[name]);
+        });
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', init);
+    } else {
+        init();
+    }
+})();
@@ -52,9 +52,76 @@
             if (searchInput) {
                 searchInput.value = '';
             }
+            clearResults();
         }
     }
     
+    // Live search (results come from the server-side full-text index)
+    const searchResults = document.getElementById('searchResults');
+    const searchUrl = searchInput ? searchInput.dataset.searchUrl : null;
+    let searchTimer = null;
+    let searchController = null;
+    
+    function clearResults() {
+        if (searchResults) {
+            searchResults.innerHTML = '';
+        }
+    }
+    
+    function renderResults(data) {
+        if (!searchResults) {
+            return;
+        }
+        if (!data.results.length) {
+            const empty = document.createElement('div');
+            empty.className = 'search-result-empty';
+            empty.textContent = searchInput.dataset.emptyText || '';
+            searchResults.replaceChildren(empty);
+            return;
+        }
+        // Title and snippet HTML are escaped on the server (only <mark> tags are added)
+        searchResults.innerHTML = data.results.map(function(result) {
+            return '<a class="search-result-item" href="' + encodeURI(result.url) + '">' +
+                (result.thumbnail ? '<img src="' + encodeURI(result.thumbnail) + '" alt="" loading="lazy">' : '') +
+                '<div class="search-result-text">' +
+                    '<span class="search-result-title">' + result.title + '</span>' +
+                    (result.snippet ? '<span class="search-result-snippet">' + result.snippet + '</span>' : '') +
+                '</div>' +
+            '</a>';
+        }).join('');
+    }
+    
+    function runSearch() {
+        const query = searchInput.value.trim();
+        if (query.length < 2) {
+            clearResults();
+            return;
+        }
+        if (searchController) {
+            searchController.abort();
+        }
+        searchController = new AbortController();
+        fetch(searchUrl + '?q=' + encodeURIComponent(query), {
+            signal: searchController.signal,
+            headers: { 'Accept': 'application/json' }
+        })
+            .then(function(response) { return response.json(); })
+            .then(function(data) {
+                // Ignore stale responses for an older query
+                if (data.query === searchInput.value.trim()) {
+                    renderResults(data);
+                }
+            })
+            .catch(function() {});
+    }
+    
+    if (searchInput && searchUrl) {
+        searchInput.addEventListener('input', function() {
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(runSearch, 200);
+        });
+    }
+    
     if (searchBtn) {
         searchBtn.addEventListener('click', openSearch);
     }
@@ -194,90 +261,28 @@
             });
         }
         
-        // Handle language switching - convert URL paths correctly
-        function convertPathForLanguage(path, targetLang) {
-            let converted = path;
-            
-            // First, remove the language prefix (Django will add it back, but we need correct structure)
-            // Remove current language prefixes to get base path - handle with or without leading slash
-            converted = converted.replace(/^\/(en|sr-latn|sr-cyrl)\//, '/');
-            // Also handle if path starts directly with language code (shouldn't happen but safety)
-            if (converted.match(/^\/?(en|sr-latn|sr-cyrl)\//)) {
-                converted = converted.replace(/^\/(en|sr-latn|sr-cyrl)\//, '/');
-            }
-            
-            // Handle accounts URLs
-            if (converted.includes('/korisnici/') || converted.includes('/users/')) {
-                if (targetLang === 'en') {
-                    // Convert to English structure
-                    converted = converted.replace(/\/korisnici\//g, '/users/');
-                    converted = converted.replace(/\/registracija\//g, '/register/');
-                    converted = converted.replace(/\/prijava\//g, '/login/');
-                    converted = converted.replace(/\/odjava\//g, '/logout/');
-                    converted = converted.replace(/\/nalog\//g, '/account/');
-                } else {
-                    // Convert to Serbian structure
-                    converted = converted.replace(/\/users\//g, '/korisnici/');
-                    converted = converted.replace(/\/register\//g, '/registracija/');
-                    converted = converted.replace(/\/login\//g, '/prijava/');
-                    converted = converted.replace(/\/logout\//g, '/odjava/');
-                    converted = converted.replace(/\/account\//g, '/nalog/');
-                }
-            }
-            
-            // Handle topics URLs
-            if (converted.includes('/teme/') || converted.includes('/topics/')) {
-                if (targetLang === 'en') {
-                    converted = converted.replace(/\/teme\//g, '/topics/');
-                } else {
-                    converted = converted.replace(/\/topics\//g, '/teme/');
-                }
-            }
-            
-            // Handle core URLs (about, contact)
-            if (converted.includes('/o-nama/') || converted.includes('/about/')) {
-                if (targetLang === 'en') {
-                    converted = converted.replace(/\/o-nama\//g, '/about/');
-                } else {
-                    converted = converted.replace(/\/about\//g, '/o-nama/');
-                }
-            }
-            
-            if (converted.includes('/kontakt/') || converted.includes('/contact/')) {
-                if (targetLang === 'en') {
-                    converted = converted.replace(/\/kontakt\//g, '/contact/');
-                } else {
-                    converted = converted.replace(/\/contact\//g, '/kontakt/');
-                }
-            }
-            
-            return converted;
-        }
-        
         // Set up language switcher buttons to update next URL
         const languageNextDesktop = document.getElementById('languageNextDesktop');
         const languageNextMobile = document.getElementById('languageNextMobile');
         
-        // Update language switcher forms to convert paths before submit
+        // Each language button carries the canonical URL of this page in its language
         // Use mousedown to ensure we capture the language code before form submits
         if (desktopLangMenu) {
             const desktopButtons = desktopLangMenu.querySelectorAll('button[type="submit"][data-lang-code]');
             desktopButtons.forEach(function(button) {
                 button.addEventListener('mousedown', function(e) {
-                    const targetLang = this.getAttribute('data-lang-code');
-                    if (targetLang && languageNextDesktop) {
-                        const currentPath = languageNextDesktop.value || window.location.pathname;
-                        languageNextDesktop.value = convertPathForLanguage(currentPath, targetLang);
+                    const nextUrl = this.getAttribute('data-next-url');
+                    if (nextUrl && languageNextDesktop) {
+                        languageNextDesktop.value = nextUrl;
                     }
                 });
             });
             // Also handle submit event as fallback
             desktopLangMenu.addEventListener('submit', function(e) {
                 if (e.submitter) {
-                    const targetLang = e.submitter.getAttribute('data-lang-code');
-                    if (targetLang && languageNextDesktop) {
-                        const currentPath = languageNextDesktop.value || window.location.pathname;
-                        languageNextDesktop.value = convertPathForLanguage(currentPath, targetLang);
+                    const nextUrl = e.submitter.getAttribute('data-next-url');
+                    if (nextUrl && languageNextDesktop) {
+                        languageNextDesktop.value = nextUrl;
                     }
                 }
             });
@@ -287,20 +292,18 @@
             const mobileButtons = mobileLangMenu.querySelectorAll('button[type="submit"][data-lang-code]');
             mobileButtons.forEach(function(button) {
                 button.addEventListener('mousedown', function(e) {
-                    const targetLang = this.getAttribute('data-lang-code');
-                    if (targetLang && languageNextMobile) {
-                        const currentPath = languageNextMobile.value || window.location.pathname;
-                        languageNextMobile.value = convertPathForLanguage(currentPath, targetLang);
+                    const nextUrl = this.getAttribute('data-next-url');
+                    if (nextUrl && languageNextMobile) {
+                        languageNextMobile.value = nextUrl;
                     }
                 });
             });
             // Also handle submit event as fallback
             mobileLangMenu.addEventListener('submit', function(e) {
                 if (e.submitter) {
-                    const targetLang = e.submitter.getAttribute('data-lang-code');
-                    if (targetLang && languageNextMobile) {
-                        const currentPath = languageNextMobile.value || window.location.pathname;
-                        languageNextMobile.value = convertPathForLanguage(currentPath, targetLang);
+                    const nextUrl = e.submitter.getAttribute('data-next-url');
+                    if (nextUrl && languageNextMobile) {
+                        languageNextMobile.value = nextUrl;
                     }
                 }
             });
@@ -367,4 +370,61 @@
             }, { passive: false });
         });
     });
-})();
\ No newline at end of file
+})();
+// Incremental loading of topic cards on category pages
+(function() {
+    'use strict';
+    
+    const grid = document.getElementById('topicGrid');
+    const loadMore = document.getElementById('loadMore');
+    if (!grid || !loadMore) {
+        return;
+    }
+    
+    let loading = false;
+    
+    function loadNextPage() {
+        const nextUrl = loadMore.dataset.nextUrl;
+        if (loading || !nextUrl) {
+            return;
+        }
+        loading = true;
+        loadMore.classList.add('loading');
+        
+        fetch(nextUrl + '&partial=1', { headers: { 'Accept': 'application/json' } })
+            .then(function(response) { return response.json(); })
+            .then(function(data) {
+                grid.insertAdjacentHTML('beforeend', data.html);
+                if (data.next_url) {
+                    loadMore.dataset.nextUrl = data.next_url;
+                    loadMore.setAttribute('href', data.next_url);
+                } else {
+                    loadMore.parentNode.remove();
+                    if (observer) {
+                        observer.disconnect();
+                    }
+                }
+            })
+            .catch(function() {})
+            .finally(function() {
+                loading = false;
+                loadMore.classList.remove('loading');
+            });
+    }
+    
+    loadMore.addEventListener('click', function(e) {
+        e.preventDefault();
+        loadNextPage();
+    });
+    
+    // Load automatically when the button scrolls into view
+    let observer = null;
+    if ('IntersectionObserver' in window) {
+        observer = new IntersectionObserver(function(entries) {
+            if (entries[0].isIntersecting) {
+                loadNextPage();
+            }
+        }, { rootMargin: '400px' });
+        observer.observe(loadMore);
+    }
+})();
@@ -1,7 +1,8 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 from ckeditor_uploader.widgets import CKEditorUploadingWidget
-from .models import Topic, Category
+from .models import Topic, Category, SlugRoute
+from .search import search_object_ids
 
 
 @admin.register(Category)
@@ -71,14 +72,27 @@ class TopicAdmin(admin.ModelAdmin):
             kwargs['widget'] = CKEditorUploadingWidget(config_name='default')
         return super().formfield_for_dbfield(db_field, request, **kwargs)
     
-    def save_model(self, request, obj, form, change):
+    def get_search_results(self, request, queryset, search_term):
         """
-        Override save_model to pass request to cleanup function.
-        This allows us to access session uploads for cleanup.
+        Use the full-text index (all languages, including descriptions) instead of
+        icontains scans over the description columns.
+        Falls back to the default search when the index has no matches.
         """
-        # Store request in obj temporarily so cleanup can access it
-        obj._request = request
-        super().save_model(request, obj, form, change)
-        # Clean up after save
-        if hasattr(obj, '_request'):
-            delattr(obj, '_request')
+        if search_term:
+            ids = search_object_ids(search_term, kind='topic')
+            if ids:
+                return queryset.filter(pk__in=ids), False
+        return super().get_search_results(request, queryset, search_term)
+
+
+@admin.register(SlugRoute)
+class SlugRouteAdmin(admin.ModelAdmin):
+    """Routing index is maintained automatically; the admin is for reviewing/removing old redirects"""
+    list_display = ('language', 'category_slug', 'topic_slug', 'category', 'topic', 'is_redirect', 'updated_at')
+    list_filter = ('language', 'is_redirect')
+    search_fields = ('category_slug', 'topic_slug')
+    readonly_fields = ('language', 'category_slug', 'topic_slug', 'category', 'topic', 'is_redirect', 'updated_at')
+    list_select_related = ('category', 'topic')
+    
+    def has_add_permission(self, request):
+        return False
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class TopicsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'topics'
+    
+    def ready(self):
+        # Import signal handlers
+        import topics.signals  # noqa
+        # Register background tasks
+        import topics.tasks  # noqa
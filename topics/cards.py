@@ -0,0 +1,109 @@
+"""
+Precomputed topic cards for listings.
+
+A TopicCard row holds everything a listing card shows for one topic in one
+language: title, slug, plain-text excerpt, thumbnail URL and derivatives,
+date and category slug. Rows are rebuilt in Topic.save, so category pages, the recent-topics
+block and the search overlay never load the HTML description columns or run
+striptags/truncatewords per request.
+"""
+from django.utils.text import Truncator
+from .languages import LANGUAGE_CODES, localized_value
+from .search import html_to_text
+
+EXCERPT_WORDS = 30
+
+
+def build_topic_cards(topic, card_model=None):
+    """
+    Build (unsaved) cards for a topic, one per language.
+
+    Args:
+        topic: Topic instance
+        card_model: TopicCard model class (defaults to the current model)
+    """
+    if card_model is None:
+        from .models import TopicCard as card_model
+
+    category = topic.category if topic.category_id else None
+    thumbnail_url = topic.thumbnail.url if topic.thumbnail else ''
+    cards = []
+    for lang in LANGUAGE_CODES:
+        excerpt = html_to_text(localized_value(topic, 'short_description', lang))
+        cards.append(card_model(
+            topic_id=topic.pk,
+            language=lang,
+            category_id=topic.category_id,
+            category_slug=localized_value(category, 'slug', lang) if category else '',
+            title=localized_value(topic, 'title', lang),
+            slug=localized_value(topic, 'slug', lang),
+            excerpt=Truncator(excerpt).words(EXCERPT_WORDS),
+            thumbnail_url=thumbnail_url,
+            thumbnail_derivatives=topic.thumbnail_derivatives or {},
+            created_at=topic.created_at,
+        ))
+    return cards
+
+
+def sync_topic_cards(topic, card_model=None):
+    """Rebuild the cards of a topic (called from Topic.save)"""
+    if card_model is None:
+        from .models import TopicCard as card_model
+
+    fields = ['category_id', 'category_slug', 'title', 'slug', 'excerpt', 'thumbnail_url', 'thumbnail_derivatives', 'created_at']
+    for card in build_topic_cards(topic, card_model):
+        # update_or_create keeps row ids stable for readers paging through a listing
+        card_model.objects.update_or_create(
+            topic_id=card.topic_id,
+            language=card.language,
+            defaults={field: getattr(card, field) for field in fields},
+        )
+
+
+def touch_categories(*category_ids, category_model=None):
+    """
+    Bump updated_at of the categories whose listings changed. Category and
+    topic pages use it as their version (see topics.views validators), so
+    they never aggregate over the category's topics per request.
+    """
+    if category_model is None:
+        from .models import Category as category_model
+    from django.utils import timezone
+
+    category_ids = {pk for pk in category_ids if pk}
+    if category_ids:
+        category_model.objects.filter(pk__in=category_ids).update(updated_at=timezone.now())
+
+
+def update_category_slugs(category, card_model=None):
+    """Update the category slug on all cards of a category (called from Category.save)"""
+    if card_model is None:
+        from .models import TopicCard as card_model
+
+    for lang in LANGUAGE_CODES:
+        slug = localized_value(category, 'slug', lang)
+        card_model.objects.filter(category_id=category.pk, language=lang).exclude(
+            category_slug=slug
+        ).update(category_slug=slug)
+
+
+def rebuild_cards(topic_model=None, card_model=None):
+    """Rebuild the cards of every topic. Returns the number of cards written."""
+    if topic_model is None:
+        from .models import Topic as topic_model
+    if card_model is None:
+        from .models import TopicCard as card_model
+
+    card_model.objects.all().delete()
+    count = 0
+    batch = []
+    for topic in topic_model.objects.select_related('category').iterator(chunk_size=200):
+        batch.extend(build_topic_cards(topic, card_model))
+        if len(batch) >= 600:
+            card_model.objects.bulk_create(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        card_model.objects.bulk_create(batch)
+        count += len(batch)
+    return count
@@ -1,8 +1,14 @@
-from .models import Category
+from django.utils import translation
+from django.utils.functional import SimpleLazyObject
+from .navigation import get_navigation
 
 
 def categories(request):
-    """Add categories to template context for navigation menus"""
+    """
+    Add the cached category navigation to template context.
+    Lazy, so pages that don't render the navigation (admin) don't touch the cache.
+    """
+    lang = translation.get_language()
     return {
-        'categories': Category.objects.all().order_by('order', 'name')
+        'nav_categories': SimpleLazyObject(lambda: get_navigation(lang))
     }
@@ -0,0 +1,60 @@
+"""
+Helpers for the per-language columns on Topic and Category.
+
+Every translated field is stored three times: the Serbian Latin value in the
+base column (e.g. ``title``) and the Cyrillic/English values in columns with a
+suffix (``title_sr_cyrl``, ``title_en``). These helpers resolve a field for a
+given language using the same fallback rules as the ``get_*`` model methods,
+without touching the active translation. They work with plain model instances
+as well as historical models inside migrations.
+"""
+
+# Language code -> column suffix
+LANGUAGE_SUFFIXES = {
+    'sr-latn': '',
+    'sr-cyrl': '_sr_cyrl',
+    'en': '_en',
+}
+
+LANGUAGE_CODES = tuple(LANGUAGE_SUFFIXES)
+
+DEFAULT_LANGUAGE = 'sr-latn'
+
+# Translated Topic fields (each has three columns, one per language)
+TOPIC_TRANSLATED_FIELDS = (
+    'title', 'slug', 'meta_title', 'meta_description', 'short_description', 'full_description',
+)
+
+
+def translated_columns(field_names):
+    """All language columns of the given base fields (e.g. title, title_sr_cyrl, title_en)"""
+    return [f'{name}{suffix}' for name in field_names for suffix in LANGUAGE_SUFFIXES.values()]
+
+
+def normalize_language(lang):
+    """Map any active language code to one of LANGUAGE_CODES"""
+    if lang in LANGUAGE_SUFFIXES:
+        return lang
+    if lang and lang.startswith('en'):
+        return 'en'
+    if lang and ('cyrl' in lang.lower() or 'cyrillic' in lang.lower()):
+        return 'sr-cyrl'
+    return DEFAULT_LANGUAGE
+
+
+def localized_value(instance, field_name, lang):
+    """
+    Get the value of a translated field for a language.
+    Falls back to the Serbian Latin column when the translated column is empty.
+
+    Args:
+        instance: Topic or Category instance (or historical model instance)
+        field_name: Base field name (e.g. 'title', 'slug', 'name')
+        lang: Language code ('sr-latn', 'sr-cyrl', 'en')
+    """
+    suffix = LANGUAGE_SUFFIXES.get(normalize_language(lang), '')
+    if suffix:
+        value = getattr(instance, f'{field_name}{suffix}', '')
+        if value:
+            return value
+    return getattr(instance, field_name, '') or ''
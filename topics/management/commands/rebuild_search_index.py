@@ -0,0 +1,25 @@
+"""
+Management command to rebuild the full-text search index.
+The index is kept up to date on every save, so this is only needed after
+bulk imports or direct database changes.
+
+Usage:
+    python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from topics.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for topics and categories'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding search index...')
+        
+        with transaction.atomic():
+            count = rebuild_index()
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully indexed {count} entries')
+        )
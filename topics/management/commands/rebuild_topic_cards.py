@@ -0,0 +1,25 @@
+"""
+Management command to rebuild the precomputed topic listing cards.
+Cards are rebuilt on every save, so this is only needed after bulk imports,
+direct database changes or a change of the media URL settings.
+
+Usage:
+    python manage.py rebuild_topic_cards
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from topics.cards import rebuild_cards
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed topic listing cards'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding topic cards...')
+        
+        with transaction.atomic():
+            count = rebuild_cards()
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully built {count} cards')
+        )
@@ -0,0 +1,185 @@
+# Generated by Django 4.2.27 on 2026-10-18 06:01
+
+import html
+import re
+from django.db import DatabaseError, migrations, models, transaction
+from django.utils.html import strip_tags
+
+
+# Frozen copies of the topics.search / topics.languages helpers as of this
+# migration, so later changes to those modules don't change what it does
+
+LANGUAGE_SUFFIXES = {'sr-latn': '', 'sr-cyrl': '_sr_cyrl', 'en': '_en'}
+
+FTS_TABLE = 'topics_searchentry_fts'
+
+SQLITE_FTS_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, body,
+        content='topics_searchentry', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS topics_searchentry_ai AFTER INSERT ON topics_searchentry BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS topics_searchentry_ad AFTER DELETE ON topics_searchentry BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS topics_searchentry_au AFTER UPDATE OF title, body ON topics_searchentry BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_FTS_DROP_SQL = [
+    'DROP TRIGGER IF EXISTS topics_searchentry_ai',
+    'DROP TRIGGER IF EXISTS topics_searchentry_ad',
+    'DROP TRIGGER IF EXISTS topics_searchentry_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+POSTGRES_FTS_SQL = [
+    """
+    ALTER TABLE topics_searchentry ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+    ) STORED
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS topics_searchentry_vector_gin
+    ON topics_searchentry USING GIN (search_vector)
+    """,
+]
+
+POSTGRES_FTS_DROP_SQL = [
+    'DROP INDEX IF EXISTS topics_searchentry_vector_gin',
+    'ALTER TABLE topics_searchentry DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def localized_value(instance, field_name, lang):
+    suffix = LANGUAGE_SUFFIXES[lang]
+    if suffix:
+        value = getattr(instance, f'{field_name}{suffix}', '')
+        if value:
+            return value
+    return getattr(instance, field_name, '') or ''
+
+
+def html_to_text(value):
+    if not value:
+        return ''
+    return re.sub(r'\s+', ' ', html.unescape(strip_tags(value))).strip()
+
+
+def populate_search_entries(apps, schema_editor):
+    Category = apps.get_model('topics', 'Category')
+    Topic = apps.get_model('topics', 'Topic')
+    SearchEntry = apps.get_model('topics', 'SearchEntry')
+
+    for category in Category.objects.all():
+        SearchEntry.objects.bulk_create(
+            SearchEntry(
+                kind='category',
+                object_id=category.pk,
+                language=lang,
+                title=localized_value(category, 'name', lang),
+                body='',
+                slug=localized_value(category, 'slug', lang),
+                category_id=category.pk,
+                category_slug=localized_value(category, 'slug', lang),
+            )
+            for lang in LANGUAGE_SUFFIXES
+        )
+    for topic in Topic.objects.select_related('category'):
+        category = topic.category if topic.category_id else None
+        SearchEntry.objects.bulk_create(
+            SearchEntry(
+                kind='topic',
+                object_id=topic.pk,
+                language=lang,
+                title=localized_value(topic, 'title', lang),
+                body=' '.join(filter(None, [
+                    html_to_text(localized_value(topic, 'short_description', lang)),
+                    html_to_text(localized_value(topic, 'full_description', lang)),
+                ])),
+                slug=localized_value(topic, 'slug', lang),
+                category_id=topic.category_id,
+                category_slug=localized_value(category, 'slug', lang) if category else '',
+            )
+            for lang in LANGUAGE_SUFFIXES
+        )
+
+
+def create_search_backend(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = POSTGRES_FTS_SQL
+    elif vendor == 'sqlite':
+        statements = SQLITE_FTS_SQL
+    else:
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            for sql in statements:
+                schema_editor.execute(sql)
+    except DatabaseError:
+        # SQLite builds without FTS5 - search falls back to icontains
+        pass
+
+
+def drop_search_backend(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = POSTGRES_FTS_DROP_SQL
+    elif vendor == 'sqlite':
+        statements = SQLITE_FTS_DROP_SQL
+    else:
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('topics', '0004_category_name_en_category_name_sr_cyrl_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('topic', 'Topic'), ('category', 'Category')], max_length=20, verbose_name='Tip')),
+                ('object_id', models.BigIntegerField(verbose_name='ID objekta')),
+                ('language', models.CharField(max_length=10, verbose_name='Jezik')),
+                ('title', models.CharField(max_length=200, verbose_name='Naslov')),
+                ('body', models.TextField(blank=True, default='', verbose_name='Tekst')),
+                ('slug', models.SlugField(blank=True, max_length=200, verbose_name='Slug')),
+                ('category_id', models.BigIntegerField(blank=True, null=True, verbose_name='ID kategorije')),
+                ('category_slug', models.SlugField(blank=True, max_length=200, verbose_name='Slug kategorije')),
+            ],
+            options={
+                'verbose_name': 'Search entry',
+                'verbose_name_plural': 'Search entries',
+                'indexes': [models.Index(fields=['kind', 'category_id', 'language'], name='topics_sear_kind_da034e_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchentry',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id', 'language'), name='topics_searchentry_unique'),
+        ),
+        migrations.RunPython(populate_search_entries, migrations.RunPython.noop),
+        migrations.RunPython(create_search_backend, drop_search_backend),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 4.2.27 on 2026-10-18 06:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Frozen copy of the topics.routing rules as of this migration, so later
+# changes to that module don't change what it does
+
+# Slug column suffixes accepted for each URL language, in order of preference
+ACCEPTED_SUFFIXES = {
+    'sr-latn': ('', '_sr_cyrl', '_en'),
+    'sr-cyrl': ('_sr_cyrl', ''),
+    'en': ('_en', ''),
+}
+
+
+def accepted_slugs(instance, lang):
+    slugs = []
+    for suffix in ACCEPTED_SUFFIXES[lang]:
+        slug = getattr(instance, f'slug{suffix}', '')
+        if slug and slug not in slugs:
+            slugs.append(slug)
+    return slugs
+
+
+def populate_slug_routes(apps, schema_editor):
+    Category = apps.get_model('topics', 'Category')
+    Topic = apps.get_model('topics', 'Topic')
+    SlugRoute = apps.get_model('topics', 'SlugRoute')
+
+    # (language, category slug, topic slug) -> (category id, topic id); the last object saved wins
+    routes = {}
+    for category in Category.objects.all():
+        for lang in ACCEPTED_SUFFIXES:
+            for slug in accepted_slugs(category, lang):
+                routes[(lang, slug, '')] = (category.pk, None)
+    for topic in Topic.objects.filter(category__isnull=False).select_related('category'):
+        for lang in ACCEPTED_SUFFIXES:
+            for category_slug in accepted_slugs(topic.category, lang):
+                for topic_slug in accepted_slugs(topic, lang):
+                    routes[(lang, category_slug, topic_slug)] = (topic.category_id, topic.pk)
+
+    SlugRoute.objects.bulk_create(
+        [
+            SlugRoute(
+                language=lang, category_slug=category_slug, topic_slug=topic_slug,
+                category_id=category_id, topic_id=topic_id,
+            )
+            for (lang, category_slug, topic_slug), (category_id, topic_id) in routes.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('topics', '0005_searchentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlugRoute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(max_length=10, verbose_name='Jezik')),
+                ('category_slug', models.SlugField(max_length=200, verbose_name='Slug kategorije')),
+                ('topic_slug', models.SlugField(blank=True, default='', max_length=200, verbose_name='Slug teme')),
+                ('is_redirect', models.BooleanField(default=False, verbose_name='Preusmerenje')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Ažurirano')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slug_routes', to='topics.category', verbose_name='Kategorija')),
+                ('topic', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='slug_routes', to='topics.topic', verbose_name='Tema')),
+            ],
+            options={
+                'verbose_name': 'Slug route',
+                'verbose_name_plural': 'Slug routes',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='slugroute',
+            constraint=models.UniqueConstraint(fields=('language', 'category_slug', 'topic_slug'), name='topics_slugroute_unique'),
+        ),
+        migrations.RunPython(populate_slug_routes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-18 06:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('topics', '0006_slugroute'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='topics_topic_cat_created_idx'),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 4.2.27 on 2026-10-18 06:06
+
+import html
+import re
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+
+# Frozen copies of the topics.cards / topics.languages helpers as of this
+# migration, so later changes to those modules don't change what it does
+
+LANGUAGE_SUFFIXES = {'sr-latn': '', 'sr-cyrl': '_sr_cyrl', 'en': '_en'}
+
+EXCERPT_WORDS = 30
+
+
+def localized_value(instance, field_name, lang):
+    suffix = LANGUAGE_SUFFIXES[lang]
+    if suffix:
+        value = getattr(instance, f'{field_name}{suffix}', '')
+        if value:
+            return value
+    return getattr(instance, field_name, '') or ''
+
+
+def html_to_text(value):
+    if not value:
+        return ''
+    return re.sub(r'\s+', ' ', html.unescape(strip_tags(value))).strip()
+
+
+def populate_topic_cards(apps, schema_editor):
+    Topic = apps.get_model('topics', 'Topic')
+    TopicCard = apps.get_model('topics', 'TopicCard')
+
+    batch = []
+    for topic in Topic.objects.select_related('category').iterator(chunk_size=200):
+        category = topic.category if topic.category_id else None
+        thumbnail_url = topic.thumbnail.url if topic.thumbnail else ''
+        for lang in LANGUAGE_SUFFIXES:
+            excerpt = html_to_text(localized_value(topic, 'short_description', lang))
+            batch.append(TopicCard(
+                topic_id=topic.pk,
+                language=lang,
+                category_id=topic.category_id,
+                category_slug=localized_value(category, 'slug', lang) if category else '',
+                title=localized_value(topic, 'title', lang),
+                slug=localized_value(topic, 'slug', lang),
+                excerpt=Truncator(excerpt).words(EXCERPT_WORDS),
+                thumbnail_url=thumbnail_url,
+                created_at=topic.created_at,
+            ))
+        if len(batch) >= 600:
+            TopicCard.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        TopicCard.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('topics', '0007_topic_category_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicCard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(max_length=10, verbose_name='Jezik')),
+                ('category_slug', models.SlugField(blank=True, max_length=200, verbose_name='Slug kategorije')),
+                ('title', models.CharField(max_length=200, verbose_name='Naslov')),
+                ('slug', models.SlugField(blank=True, max_length=200, verbose_name='Slug')),
+                ('excerpt', models.TextField(blank=True, default='', verbose_name='Izvod')),
+                ('thumbnail_url', models.CharField(blank=True, max_length=500, verbose_name='URL thumbnail-a')),
+                ('created_at', models.DateTimeField(verbose_name='Kreirano')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='topic_cards', to='topics.category', verbose_name='Kategorija')),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cards', to='topics.topic', verbose_name='Tema')),
+            ],
+            options={
+                'verbose_name': 'Topic card',
+                'verbose_name_plural': 'Topic cards',
+                'indexes': [models.Index(fields=['language', 'category', '-created_at', '-topic'], name='topics_card_listing_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='topiccard',
+            constraint=models.UniqueConstraint(fields=('topic', 'language'), name='topics_topiccard_unique'),
+        ),
+        migrations.RunPython(populate_topic_cards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 4.2.27 on 2026-10-18 06:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Frozen copies of the topics.translations / topics.languages helpers as of
+# this migration, so later changes to those modules don't change what it does
+
+LANGUAGE_SUFFIXES = {'sr-latn': '', 'sr-cyrl': '_sr_cyrl', 'en': '_en'}
+
+
+def localized_value(instance, field_name, lang):
+    suffix = LANGUAGE_SUFFIXES[lang]
+    if suffix:
+        value = getattr(instance, f'{field_name}{suffix}', '')
+        if value:
+            return value
+    return getattr(instance, field_name, '') or ''
+
+
+def populate_topic_translations(apps, schema_editor):
+    Topic = apps.get_model('topics', 'Topic')
+    TopicTranslation = apps.get_model('topics', 'TopicTranslation')
+
+    batch = []
+    for topic in Topic.objects.iterator(chunk_size=100):
+        for lang in LANGUAGE_SUFFIXES:
+            title = localized_value(topic, 'title', lang)
+            batch.append(TopicTranslation(
+                topic_id=topic.pk,
+                language=lang,
+                title=title,
+                slug=localized_value(topic, 'slug', lang),
+                meta_title=localized_value(topic, 'meta_title', lang) or title,
+                meta_description=localized_value(topic, 'meta_description', lang),
+                short_description=localized_value(topic, 'short_description', lang),
+                full_description=localized_value(topic, 'full_description', lang),
+            ))
+        if len(batch) >= 300:
+            TopicTranslation.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        TopicTranslation.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('topics', '0008_topiccard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicTranslation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(max_length=10, verbose_name='Jezik')),
+                ('title', models.CharField(max_length=200, verbose_name='Naslov')),
+                ('slug', models.SlugField(blank=True, max_length=200, verbose_name='Slug')),
+                ('meta_title', models.CharField(blank=True, max_length=200, verbose_name='Meta naslov')),
+                ('meta_description', models.TextField(blank=True, default='', verbose_name='Meta opis')),
+                ('short_description', models.TextField(blank=True, default='', verbose_name='Kratak opis')),
+                ('full_description', models.TextField(blank=True, default='', verbose_name='Pun opis')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Ažurirano')),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='translations', to='topics.topic', verbose_name='Tema')),
+            ],
+            options={
+                'verbose_name': 'Topic translation',
+                'verbose_name_plural': 'Topic translations',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='topictranslation',
+            constraint=models.UniqueConstraint(fields=('topic', 'language'), name='topics_topictranslation_unique'),
+        ),
+        migrations.RunPython(populate_topic_translations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.27 on 2026-10-18 06:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('topics', '0009_topictranslation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='thumbnail_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Izvedene slike'),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='thumbnail_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Izvedene slike'),
+        ),
+        migrations.AddField(
+            model_name='topiccard',
+            name='thumbnail_derivatives',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Izvedene slike'),
+        ),
+    ]
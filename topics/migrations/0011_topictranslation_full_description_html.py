@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-18 06:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('topics', '0010_thumbnail_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topictranslation',
+            name='full_description_html',
+            field=models.TextField(blank=True, default='', verbose_name='Pun opis (HTML za prikaz)'),
+        ),
+    ]
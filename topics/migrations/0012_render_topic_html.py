@@ -0,0 +1,39 @@
+# Generated by Django 4.2.27 on 2026-10-18 09:00
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def queue_rendering(apps, schema_editor):
+    """
+    Rows written before 0011 have no full_description_html. Rendering reads
+    image dimensions from storage, so it is left to the run_jobs worker
+    (topics.render_topic_html) instead of running here.
+    """
+    Job = apps.get_model('core', 'Job')
+    TopicTranslation = apps.get_model('topics', 'TopicTranslation')
+
+    topic_ids = (
+        TopicTranslation.objects.filter(full_description_html='')
+        .exclude(full_description='')
+        .values_list('topic_id', flat=True)
+        .distinct()
+    )
+    now = timezone.now()
+    Job.objects.bulk_create(
+        (Job(name='topics.render_topic_html', payload={'topic_id': topic_id}, run_at=now)
+         for topic_id in topic_ids.iterator()),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_job'),
+        ('topics', '0011_topictranslation_full_description_html'),
+    ]
+
+    operations = [
+        migrations.RunPython(queue_rendering, migrations.RunPython.noop),
+    ]
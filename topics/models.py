@@ -1,3 +1,4 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.db.models.signals import post_delete
 from django.dispatch import receiver
@@ -9,9 +10,25 @@ from core.utils import (
     unique_topic_thumbnail,
     unique_category_thumbnail
 )
+from core.thumbnails import queue_derivatives
+from core.models import DirtyFieldsMixin
+from core.image_references import IMAGE_COLUMNS, sync_image_references, remove_image_references
+from .languages import TOPIC_TRANSLATED_FIELDS, translated_columns
+from .search import index_topic, index_category, remove_from_index
+from .routing import RESERVED_CATEGORY_SLUGS, sync_topic_routes, sync_category_routes
+from .page_cache import purge_topic, purge_all
+from .cards import sync_topic_cards, touch_categories, update_category_slugs
+from .translations import sync_topic_translations
 
+# Columns each derived structure is built from: a save that changes none of
+# them leaves the structure as it is
+CATEGORY_NAME_COLUMNS = frozenset(translated_columns(('name', 'slug')))
+TOPIC_TEXT_COLUMNS = frozenset(translated_columns(TOPIC_TRANSLATED_FIELDS))
+TOPIC_ROUTE_COLUMNS = frozenset(translated_columns(('slug',))) | {'category'}
+TOPIC_CARD_COLUMNS = TOPIC_TEXT_COLUMNS | {'category', 'thumbnail', 'thumbnail_derivatives'}
 
-class Category(models.Model):
+
+class Category(DirtyFieldsMixin, models.Model):
     # Serbian Latin (default)
     name = models.CharField(_('Naziv'), max_length=200)
     slug = models.SlugField(_('Slug'), max_length=200, unique=True, blank=True)
@@ -25,6 +42,8 @@ class Category(models.Model):
     slug_en = models.SlugField(_('Slug (English)'), max_length=200, blank=True)
     
     thumbnail = models.ImageField(_('Thumbnail'), upload_to=unique_category_thumbnail)
+    # Resized WebP/AVIF copies of the thumbnail (see core.thumbnails)
+    thumbnail_derivatives = models.JSONField(_('Izvedene slike'), default=dict, blank=True, editable=False)
     order = models.IntegerField(_('Redosled'), default=0, help_text=_('Koristi se za sortiranje kategorija u padajućem meniju'))
     created_at = models.DateTimeField(_('Kreirano'), auto_now_add=True)
     updated_at = models.DateTimeField(_('Ažurirano'), auto_now=True)
@@ -57,35 +76,78 @@ class Category(models.Model):
             return self.slug_en
         return self.slug
 
+    def clean(self):
+        super().clean()
+        # Slugs left blank are generated from the names in save()
+        errors = {}
+        for slug_field, name_field in (('slug', 'name'), ('slug_sr_cyrl', 'name_sr_cyrl'), ('slug_en', 'name_en')):
+            slug = getattr(self, slug_field) or slugify(getattr(self, name_field))
+            if slug in RESERVED_CATEGORY_SLUGS:
+                errors[slug_field] = _('Slug "%(slug)s" je rezervisan, izaberite drugi.') % {'slug': slug}
+        if errors:
+            raise ValidationError(errors)
+    
+    def _free_slug(self, slug_field, slug):
+        """First '<slug>-N' (N >= 2) that no other category uses in the same field"""
+        others = Category.objects.exclude(pk=self.pk) if self.pk else Category.objects.all()
+        n = 2
+        while others.filter(**{slug_field: f'{slug}-{n}'}).exists():
+            n += 1
+        return f'{slug}-{n}'
+    
     def save(self, *args, **kwargs):
-        # Store old instance for cleanup
-        old_instance = None
-        if self.pk:
-            try:
-                old_instance = Category.objects.get(pk=self.pk)
-            except Category.DoesNotExist:
-                pass
-        
         if not self.slug:
             self.slug = slugify(self.name)
         if not self.slug_sr_cyrl and self.name_sr_cyrl:
             self.slug_sr_cyrl = slugify(self.name_sr_cyrl)
         if not self.slug_en and self.name_en:
             self.slug_en = slugify(self.name_en)
+        # Reserved paths would shadow the category (clean() reports them in the admin)
+        for slug_field in ('slug', 'slug_sr_cyrl', 'slug_en'):
+            if getattr(self, slug_field) in RESERVED_CATEGORY_SLUGS:
+                setattr(self, slug_field, self._free_slug(slug_field, getattr(self, slug_field)))
+        
+        # Old values for cleanup come from the snapshot taken when the category was loaded
+        old_instance = self.get_previous_instance()
+        dirty = self.get_dirty_fields()
+        
+        # A new thumbnail gets new derivatives; the old ones are cleaned up with the old thumbnail
+        if 'thumbnail' in dirty:
+            self.thumbnail_derivatives = {}
         
         super().save(*args, **kwargs)
         
-        # Cleanup orphaned images after save (when thumbnail is replaced)
-        cleanup_orphaned_images(self, old_instance)
+        if not dirty:
+            return
+        
+        # Keep the slug routes, search index and listing cards in sync with the saved names/slugs
+        if not dirty.isdisjoint(CATEGORY_NAME_COLUMNS):
+            sync_category_routes(self)
+            index_category(self)
+            update_category_slugs(self)
+        
+        # Category names/order/thumbnails are in the navigation of every page
+        purge_all()
+        
+        # Image references and orphan cleanup only when the thumbnail was replaced
+        if not dirty.isdisjoint(IMAGE_COLUMNS):
+            sync_image_references(self)
+            cleanup_orphaned_images(self, old_instance)
+        
+        # Resized copies are generated by a background job once the save is committed
+        if 'thumbnail' in dirty:
+            queue_derivatives(self)
 
 
 @receiver(post_delete, sender=Category)
 def category_delete_handler(sender, instance, **kwargs):
     """Clean up images when category is deleted"""
+    remove_from_index('category', instance.pk)
+    remove_image_references(instance)
     cleanup_all_instance_images(instance)
 
 
-class Topic(models.Model):
+class Topic(DirtyFieldsMixin, models.Model):
     # Serbian Latin (default)
     title = models.CharField(_('Naslov'), max_length=200)
     slug = models.SlugField(_('Slug'), max_length=200, unique=True, blank=True)
@@ -112,6 +174,8 @@ class Topic(models.Model):
     
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='topics', verbose_name=_('Kategorija'))
     thumbnail = models.ImageField(_('Thumbnail'), upload_to=unique_topic_thumbnail)
+    # Resized WebP/AVIF copies of the thumbnail (see core.thumbnails)
+    thumbnail_derivatives = models.JSONField(_('Izvedene slike'), default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(_('Kreirano'), auto_now_add=True)
     updated_at = models.DateTimeField(_('Ažurirano'), auto_now=True)
 
@@ -119,6 +183,10 @@ class Topic(models.Model):
         verbose_name = _('Topic')
         verbose_name_plural = _('Topics')
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of category listings (see topics.pagination)
+            models.Index(fields=['category', '-created_at', '-id'], name='topics_topic_cat_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -184,14 +252,6 @@ class Topic(models.Model):
         return self.full_description
 
     def save(self, *args, **kwargs):
-        # Store old instance for cleanup
-        old_instance = None
-        if self.pk:
-            try:
-                old_instance = Topic.objects.get(pk=self.pk)
-            except Topic.DoesNotExist:
-                pass
-        
         if not self.slug:
             self.slug = slugify(self.title)
         if not self.slug_sr_cyrl and self.title_sr_cyrl:
@@ -205,14 +265,167 @@ class Topic(models.Model):
         if not self.meta_title_en and self.title_en:
             self.meta_title_en = self.title_en
         
+        # Old values for cleanup come from the snapshot taken when the topic was loaded
+        old_instance = self.get_previous_instance()
+        dirty = self.get_dirty_fields()
+        
+        # A new thumbnail gets new derivatives; the old ones are cleaned up with the old thumbnail
+        if 'thumbnail' in dirty:
+            self.thumbnail_derivatives = {}
+        
         super().save(*args, **kwargs)
         
-        # Cleanup orphaned images after save
+        if not dirty:
+            return
+        
+        # Keep translation rows, slug routes, search index and listing cards in sync with the saved content
+        if not dirty.isdisjoint(TOPIC_TEXT_COLUMNS):
+            sync_topic_translations(self)
+        if not dirty.isdisjoint(TOPIC_ROUTE_COLUMNS):
+            sync_topic_routes(self)
+        if not dirty.isdisjoint(TOPIC_TEXT_COLUMNS | {'category'}):
+            index_topic(self)
+        if not dirty.isdisjoint(TOPIC_CARD_COLUMNS):
+            sync_topic_cards(self)
+            touch_categories(self.category_id, old_instance.category_id if old_instance else None)
+        
+        # Purge cached pages that show this topic
+        purge_topic(self.pk, category_changed=old_instance is not None and 'category' in dirty)
+        
+        # Image references and orphan cleanup only when the thumbnail or a description changed
         # For new instances (old_instance is None), cleanup will check for orphaned uploads
-        cleanup_orphaned_images(self, old_instance)
+        if not dirty.isdisjoint(IMAGE_COLUMNS):
+            sync_image_references(self)
+            cleanup_orphaned_images(self, old_instance)
+        
+        # Resized copies are generated by a background job once the save is committed
+        if 'thumbnail' in dirty:
+            queue_derivatives(self)
 
 
 @receiver(post_delete, sender=Topic)
 def topic_delete_handler(sender, instance, **kwargs):
     """Clean up images when topic is deleted"""
+    remove_from_index('topic', instance.pk)
+    remove_image_references(instance)
     cleanup_all_instance_images(instance)
+
+
+class SearchEntry(models.Model):
+    """
+    Plain-text search document for a Topic or Category in one language.
+    Rows are rewritten on save (see topics.search) and indexed by the database:
+    a tsvector GIN index on PostgreSQL, an FTS5 table on SQLite.
+    """
+    KIND_CHOICES = [
+        ('topic', _('Topic')),
+        ('category', _('Category')),
+    ]
+    
+    kind = models.CharField(_('Tip'), max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField(_('ID objekta'))
+    language = models.CharField(_('Jezik'), max_length=10)
+    title = models.CharField(_('Naslov'), max_length=200)
+    body = models.TextField(_('Tekst'), blank=True, default='')
+    slug = models.SlugField(_('Slug'), max_length=200, blank=True)
+    category_id = models.BigIntegerField(_('ID kategorije'), null=True, blank=True)
+    category_slug = models.SlugField(_('Slug kategorije'), max_length=200, blank=True)
+
+    class Meta:
+        verbose_name = _('Search entry')
+        verbose_name_plural = _('Search entries')
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id', 'language'], name='topics_searchentry_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'category_id', 'language']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id} ({self.language})"
+
+
+class SlugRoute(models.Model):
+    """
+    URL routing index: (language, category slug, topic slug) -> category/topic.
+    Category routes have an empty topic_slug. Rows are maintained on save
+    (see topics.routing); rows for slugs that are no longer used are kept
+    with is_redirect=True so old URLs redirect to the current ones.
+    """
+    language = models.CharField(_('Jezik'), max_length=10)
+    category_slug = models.SlugField(_('Slug kategorije'), max_length=200)
+    topic_slug = models.SlugField(_('Slug teme'), max_length=200, blank=True, default='')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='slug_routes', verbose_name=_('Kategorija'))
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE, null=True, blank=True, related_name='slug_routes', verbose_name=_('Tema'))
+    is_redirect = models.BooleanField(_('Preusmerenje'), default=False)
+    updated_at = models.DateTimeField(_('Ažurirano'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Slug route')
+        verbose_name_plural = _('Slug routes')
+        constraints = [
+            models.UniqueConstraint(fields=['language', 'category_slug', 'topic_slug'], name='topics_slugroute_unique'),
+        ]
+
+    def __str__(self):
+        path = f"{self.category_slug}/{self.topic_slug}" if self.topic_slug else self.category_slug
+        return f"{self.language}: {path}{' (redirect)' if self.is_redirect else ''}"
+
+
+class TopicCard(models.Model):
+    """
+    Listing projection of a Topic in one language (see topics.cards).
+    Rebuilt on save so listings don't load the description columns.
+    """
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name='cards', verbose_name=_('Tema'))
+    language = models.CharField(_('Jezik'), max_length=10)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='topic_cards', verbose_name=_('Kategorija'))
+    category_slug = models.SlugField(_('Slug kategorije'), max_length=200, blank=True)
+    title = models.CharField(_('Naslov'), max_length=200)
+    slug = models.SlugField(_('Slug'), max_length=200, blank=True)
+    excerpt = models.TextField(_('Izvod'), blank=True, default='')
+    thumbnail_url = models.CharField(_('URL thumbnail-a'), max_length=500, blank=True)
+    thumbnail_derivatives = models.JSONField(_('Izvedene slike'), default=dict, blank=True)
+    created_at = models.DateTimeField(_('Kreirano'))
+
+    class Meta:
+        verbose_name = _('Topic card')
+        verbose_name_plural = _('Topic cards')
+        constraints = [
+            models.UniqueConstraint(fields=['topic', 'language'], name='topics_topiccard_unique'),
+        ]
+        indexes = [
+            # Keyset pagination of category listings (see topics.pagination)
+            models.Index(fields=['language', 'category', '-created_at', '-topic'], name='topics_card_listing_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.language})"
+
+
+class TopicTranslation(models.Model):
+    """
+    Topic content in one language with fallbacks resolved (see topics.translations).
+    Rebuilt from the Topic columns on save; the topic page reads only this row.
+    """
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name='translations', verbose_name=_('Tema'))
+    language = models.CharField(_('Jezik'), max_length=10)
+    title = models.CharField(_('Naslov'), max_length=200)
+    slug = models.SlugField(_('Slug'), max_length=200, blank=True)
+    meta_title = models.CharField(_('Meta naslov'), max_length=200, blank=True)
+    meta_description = models.TextField(_('Meta opis'), blank=True, default='')
+    short_description = models.TextField(_('Kratak opis'), blank=True, default='')
+    full_description = models.TextField(_('Pun opis'), blank=True, default='')
+    # Render-ready full description (see core.body_html)
+    full_description_html = models.TextField(_('Pun opis (HTML za prikaz)'), blank=True, default='')
+    updated_at = models.DateTimeField(_('Ažurirano'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Topic translation')
+        verbose_name_plural = _('Topic translations')
+        constraints = [
+            models.UniqueConstraint(fields=['topic', 'language'], name='topics_topictranslation_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.language})"
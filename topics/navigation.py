@@ -0,0 +1,104 @@
+"""
+Cached navigation model for the category dropdowns in base.html.
+
+The navigation is a small per-language list of plain dicts (name, slug, url,
+thumbnail URL and derivatives) built from the Category table. Built lists are kept in the
+shared cache and in a per-process dict, both keyed by a version token stored
+in the shared cache. Saving, deleting or reordering a category replaces the
+token, so every process rebuilds on its next render. Rendering the navigation
+therefore costs one cache read and no database queries.
+"""
+import threading
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone, translation
+from .languages import localized_value, normalize_language
+
+VERSION_KEY = 'topics:navigation:version'
+MODIFIED_KEY = 'topics:navigation:modified'
+# The template version is part of the key: the shared cache outlives deploys
+DATA_KEY = 'topics:navigation:{version}:{template_version}:{lang}'
+# Old versions are never read again, so built lists only need to outlive a busy day
+DATA_TIMEOUT = 60 * 60 * 24
+
+# lang -> (version, items)
+_local_cache = {}
+_local_lock = threading.Lock()
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # First render after a restart (or eviction) - add() so concurrent
+        # processes agree on a single token
+        if cache.add(VERSION_KEY, uuid.uuid4().hex, None):
+            cache.set(MODIFIED_KEY, timezone.now(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def navigation_version():
+    """Token that changes whenever the navigation changes (used in ETags)"""
+    return _current_version()
+
+
+def navigation_modified():
+    """When the navigation last changed (or None if unknown)"""
+    _current_version()
+    return cache.get(MODIFIED_KEY)
+
+
+def build_navigation(lang):
+    """Build the navigation list for a language from the database"""
+    from core.templatetags.core_urls import lang_url
+    from .models import Category
+
+    items = []
+    categories = Category.objects.order_by('order', 'name').only(
+        'name', 'name_sr_cyrl', 'name_en', 'slug', 'slug_sr_cyrl', 'slug_en', 'thumbnail', 'thumbnail_derivatives'
+    )
+    with translation.override(lang):
+        for category in categories:
+            slug = localized_value(category, 'slug', lang)
+            items.append({
+                'name': localized_value(category, 'name', lang),
+                'slug': slug,
+                'url': lang_url({}, 'topics:category_detail', slug),
+                'thumbnail_url': category.thumbnail.url if category.thumbnail else '',
+                'thumbnail_derivatives': category.thumbnail_derivatives,
+            })
+    return items
+
+
+def get_navigation(lang):
+    """
+    Get the navigation list for a language.
+    Served from process memory while the shared version token is unchanged.
+    """
+    lang = normalize_language(lang)
+    version = _current_version()
+
+    local = _local_cache.get(lang)
+    if local is not None and local[0] == version:
+        return local[1]
+
+    key = DATA_KEY.format(
+        version=version, template_version=getattr(settings, 'PAGE_TEMPLATE_VERSION', ''), lang=lang,
+    )
+    items = cache.get(key)
+    if items is None:
+        items = build_navigation(lang)
+        cache.set(key, items, DATA_TIMEOUT)
+
+    with _local_lock:
+        _local_cache[lang] = (version, items)
+    return items
+
+
+def invalidate_navigation():
+    """Force all processes to rebuild the navigation on their next render"""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+    cache.set(MODIFIED_KEY, timezone.now(), None)
+    with _local_lock:
+        _local_cache.clear()
@@ -0,0 +1,93 @@
+"""
+Page cache invalidation for topic and category content.
+
+URLs of a topic are taken from the slug routing index, so every language and
+every alias/old slug that may have been cached is purged. Topic pages also
+show the newest topics of their category, so sibling pages are purged when
+the saved topic is (or was) among them.
+"""
+from django.db import transaction
+from django.utils import translation
+from core import page_cache
+from .languages import LANGUAGE_CODES
+
+# topic_detail shows 5 recent topics excluding the current one
+RECENT_TOPICS_WINDOW = 6
+
+
+def route_path(route):
+    """Request path of a SlugRoute row in the row's language"""
+    from core.templatetags.core_urls import lang_url
+
+    with translation.override(route.language):
+        if route.topic_slug:
+            return lang_url({}, 'topics:topic_detail', route.category_slug, route.topic_slug)
+        return lang_url({}, 'topics:category_detail', route.category_slug)
+
+
+def listing_paths():
+    """Category list and home page in every language"""
+    from core.templatetags.core_urls import lang_url
+
+    paths = set()
+    for lang in LANGUAGE_CODES:
+        with translation.override(lang):
+            paths.add(lang_url({}, 'topics:category_list'))
+            paths.add(lang_url({}, 'core:home'))
+    return paths
+
+
+def topic_page_paths(topic_id):
+    """
+    All cached paths affected by a change to one topic:
+    its own URLs, its categories' pages, listings, and sibling topic pages
+    when the topic shows up in their recent-topics block.
+    """
+    from .models import SlugRoute, Topic
+
+    routes = list(SlugRoute.objects.filter(topic_id=topic_id))
+    paths = {route_path(route) for route in routes}
+    paths |= listing_paths()
+
+    for category_id in {route.category_id for route in routes}:
+        recent_ids = set(
+            Topic.objects.filter(category_id=category_id)
+            .values_list('id', flat=True)[:RECENT_TOPICS_WINDOW]
+        )
+        category_routes = SlugRoute.objects.filter(category_id=category_id)
+        if topic_id not in recent_ids:
+            # Siblings don't show this topic - only the category pages change
+            category_routes = category_routes.filter(topic__isnull=True)
+        paths |= {route_path(route) for route in category_routes}
+    return paths
+
+
+def purge_topic(topic_id, category_changed=False):
+    """
+    Purge the pages of a saved topic after the transaction commits.
+    When the topic moved between categories, all pages of both categories are purged.
+    """
+    def purge():
+        from .models import SlugRoute
+
+        paths = topic_page_paths(topic_id)
+        if category_changed:
+            category_ids = SlugRoute.objects.filter(topic_id=topic_id).values('category_id')
+            paths |= {route_path(route) for route in SlugRoute.objects.filter(category_id__in=category_ids)}
+        page_cache.invalidate_paths(paths)
+
+    transaction.on_commit(purge)
+
+
+def purge_deleted_topic(topic_id):
+    """
+    Collect the pages of a topic that is about to be deleted (its routes are
+    removed with it) and purge them after commit.
+    """
+    paths = topic_page_paths(topic_id)
+    transaction.on_commit(lambda: page_cache.invalidate_paths(paths))
+
+
+def purge_all():
+    """Category changes show up in the navigation of every page"""
+    transaction.on_commit(page_cache.clear)
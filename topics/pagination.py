@@ -0,0 +1,75 @@
+"""
+Keyset (cursor) pagination for topic listings.
+
+Topics are listed newest first, ordered by (created_at, id). A page is
+fetched with a range condition on those columns instead of OFFSET, so every
+page costs the same index scan no matter how deep the reader scrolls. The
+cursor is the (created_at, id) of the last topic on the previous page,
+encoded as an opaque URL-safe string.
+"""
+import base64
+from datetime import datetime
+from django.conf import settings
+from django.db.models import Q
+
+
+def page_size():
+    return getattr(settings, 'TOPICS_PAGE_SIZE', 24)
+
+
+def encode_cursor(created_at, pk):
+    """Encode the position after which the next page starts"""
+    raw = f'{created_at.isoformat()}|{pk}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor from the query string.
+
+    Returns:
+        (created_at, pk) tuple, or None if the cursor is missing or invalid
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded).decode('utf-8').split('|', 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_page(queryset, cursor=None, size=None, created_field='created_at', id_field='id'):
+    """
+    Fetch one page of a queryset ordered newest first.
+
+    Args:
+        queryset: Unordered queryset to paginate
+        cursor: Cursor string from the previous page (None for the first page)
+        size: Page size (defaults to TOPICS_PAGE_SIZE)
+        created_field: Timestamp field of the ordering key
+        id_field: Tie-breaker field of the ordering key
+
+    Returns:
+        (items, next_cursor) - next_cursor is None on the last page
+    """
+    size = size or page_size()
+    queryset = queryset.order_by(f'-{created_field}', f'-{id_field}')
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        created_at, pk = position
+        queryset = queryset.filter(
+            Q(**{f'{created_field}__lt': created_at})
+            | Q(**{created_field: created_at, f'{id_field}__lt': pk})
+        )
+
+    # One extra row tells us whether there is a next page
+    items = list(queryset[:size + 1])
+    next_cursor = None
+    if len(items) > size:
+        items = items[:size]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, created_field), getattr(last, id_field))
+    return items, next_cursor
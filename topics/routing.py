@@ -0,0 +1,189 @@
+"""
+Slug routing index for category and topic URLs.
+
+Each row of SlugRoute maps (language, category slug, topic slug) to a
+category or topic, so a URL is resolved with a single indexed lookup instead
+of OR-ing the three slug columns. Rows are rebuilt when a Topic or Category
+is saved. Slugs that are no longer used are kept as redirect rows, so old
+URLs keep working after an editor renames something.
+
+Accepted slugs per language match the previous view lookups:
+- sr-latn: Latin, Cyrillic and English slugs
+- sr-cyrl: Cyrillic and Latin slugs
+- en: English and Latin slugs
+"""
+import logging
+from .languages import LANGUAGE_CODES, LANGUAGE_SUFFIXES, localized_value, normalize_language, translated_columns
+
+logger = logging.getLogger(__name__)
+
+# Paths of other views next to the category slug pattern (topics/urls.py):
+# a category with one of these slugs could never be reached
+RESERVED_CATEGORY_SLUGS = frozenset({'pretraga'})
+
+# Slug columns accepted for each URL language, in order of preference
+ACCEPTED_SUFFIXES = {
+    'sr-latn': ('', '_sr_cyrl', '_en'),
+    'sr-cyrl': ('_sr_cyrl', ''),
+    'en': ('_en', ''),
+}
+
+
+def accepted_slugs(instance, lang):
+    """Return the non-empty slugs of an instance that resolve in a language"""
+    slugs = []
+    for suffix in ACCEPTED_SUFFIXES[lang]:
+        slug = getattr(instance, f'slug{suffix}', '')
+        if slug and slug not in slugs:
+            slugs.append(slug)
+    return slugs
+
+
+def _sync_routes(route_model, existing, desired, defaults):
+    """
+    Bring the rows of one object in line with the desired keys.
+    Rows that are no longer desired become redirects, desired rows are
+    (re)claimed for the object (the last saved object wins on conflicts).
+
+    Returns True if the set of live (non-redirect) keys changed.
+    """
+    existing_by_key = {
+        (route.language, route.category_slug, route.topic_slug): route for route in existing
+    }
+
+    stale_ids = [
+        route.pk for key, route in existing_by_key.items()
+        if key not in desired and not route.is_redirect
+    ]
+    if stale_ids:
+        route_model.objects.filter(pk__in=stale_ids).update(is_redirect=True)
+
+    changed = bool(stale_ids)
+    for key in desired:
+        route = existing_by_key.get(key)
+        if (route is not None and not route.is_redirect
+                and route.category_id == defaults['category'].pk):
+            continue
+        language, category_slug, topic_slug = key
+        route_model.objects.update_or_create(
+            language=language,
+            category_slug=category_slug,
+            topic_slug=topic_slug,
+            defaults={**defaults, 'is_redirect': False},
+        )
+        changed = True
+    return changed
+
+
+def sync_topic_routes(topic, route_model=None):
+    """
+    Rebuild the routes of a topic (called from Topic.save).
+
+    Args:
+        topic: Topic instance (or historical model instance in migrations)
+        route_model: SlugRoute model class (defaults to the current model)
+    """
+    if route_model is None:
+        from .models import SlugRoute as route_model
+
+    existing = list(route_model.objects.filter(topic_id=topic.pk))
+
+    if not topic.category_id:
+        # Topics without a category have no public URL
+        if existing:
+            route_model.objects.filter(topic_id=topic.pk).delete()
+        return
+
+    category = topic.category
+    desired = set()
+    for lang in LANGUAGE_CODES:
+        for category_slug in accepted_slugs(category, lang):
+            for topic_slug in accepted_slugs(topic, lang):
+                desired.add((lang, category_slug, topic_slug))
+
+    _sync_routes(route_model, existing, desired, {'topic': topic, 'category': category})
+
+
+def sync_category_routes(category, route_model=None, topic_model=None):
+    """
+    Rebuild the routes of a category (called from Category.save).
+    When the category's live slugs change, the routes of all its topics are
+    rebuilt too, so old topic URLs become redirects.
+    """
+    if route_model is None:
+        from .models import SlugRoute as route_model
+    if topic_model is None:
+        from .models import Topic as topic_model
+
+    existing = list(route_model.objects.filter(category_id=category.pk, topic__isnull=True))
+    desired = {
+        (lang, slug, '')
+        for lang in LANGUAGE_CODES
+        for slug in accepted_slugs(category, lang)
+    }
+
+    if _sync_routes(route_model, existing, desired, {'topic': None, 'category': category}):
+        topics = topic_model.objects.filter(category_id=category.pk).select_related('category')
+        for topic in topics.only('id', 'category', *[f'slug{suffix}' for suffix in LANGUAGE_SUFFIXES.values()]):
+            sync_topic_routes(topic, route_model)
+
+
+def rebuild_routes(category_model=None, topic_model=None, route_model=None):
+    """Rebuild live routes for every category and topic (redirect rows are kept)"""
+    if category_model is None:
+        from .models import Category as category_model
+    if topic_model is None:
+        from .models import Topic as topic_model
+    if route_model is None:
+        from .models import SlugRoute as route_model
+
+    for category in category_model.objects.all():
+        sync_category_routes(category, route_model, topic_model)
+    for topic in topic_model.objects.select_related('category'):
+        sync_topic_routes(topic, route_model)
+
+
+def resolve_category(lang, slug):
+    """
+    Resolve a category URL.
+
+    Returns:
+        SlugRoute with the category loaded, or None if the URL doesn't exist
+    """
+    from .models import SlugRoute
+
+    return SlugRoute.objects.select_related('category').filter(
+        language=normalize_language(lang),
+        category_slug=slug,
+        topic_slug='',
+    ).first()
+
+
+def resolve_topic(lang, category_slug, slug):
+    """
+    Resolve a topic URL.
+
+    Returns:
+        SlugRoute with the topic and its current category loaded, or None.
+        The description columns of the topic are deferred - page content
+        comes from the TopicTranslation row of the active language.
+    """
+    from .models import SlugRoute
+    from .translations import DEFERRED_TOPIC_FIELDS
+
+    deferred = [f'topic__{column}' for column in translated_columns(DEFERRED_TOPIC_FIELDS)]
+    return SlugRoute.objects.select_related('topic__category').defer(*deferred).filter(
+        language=normalize_language(lang),
+        category_slug=category_slug,
+        topic_slug=slug,
+        topic__isnull=False,
+    ).first()
+
+
+def canonical_slugs(route, lang):
+    """Return the current (category slug, topic slug) for a resolved route"""
+    lang = normalize_language(lang)
+    if route.topic_id:
+        topic = route.topic
+        return localized_value(topic.category, 'slug', lang), localized_value(topic, 'slug', lang)
+    return localized_value(route.category, 'slug', lang), ''
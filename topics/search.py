@@ -0,0 +1,331 @@
+"""
+Full-text search over topics and categories.
+
+Every Topic and Category has one SearchEntry row per language holding the
+plain-text title and body with language fallbacks already applied. The rows
+are rewritten when content is saved, so a search never touches the HTML
+columns on Topic.
+
+The entries are indexed by the database (set up by migration 0005):
+- PostgreSQL: a generated tsvector column with a GIN index
+- SQLite: an FTS5 virtual table kept in sync by triggers
+Any other backend (or SQLite without FTS5) falls back to icontains filtering
+over the entries table, which is still much smaller than the Topic table.
+"""
+import html
+import logging
+import re
+from django.db import connection
+from django.utils.html import escape, strip_tags
+from .languages import LANGUAGE_CODES, localized_value, normalize_language
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'topics_searchentry_fts'
+
+# Private-use characters used as highlight markers inside the database.
+# They can't appear in editor content, so the text can be escaped safely
+# before the markers are turned into <mark> tags.
+MARK_START = '\ue000'
+MARK_END = '\ue001'
+
+SNIPPET_WORDS = 24
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Cached result of the FTS5 table check (per process)
+_sqlite_fts_available = None
+
+
+def html_to_text(value):
+    """Convert CKEditor HTML to plain text with collapsed whitespace"""
+    if not value:
+        return ''
+    text = html.unescape(strip_tags(value))
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+def query_terms(query, max_terms=8):
+    """Split a user query into word tokens (punctuation and operators are dropped)"""
+    return _WORD_RE.findall(query or '')[:max_terms]
+
+
+# ---------------------------------------------------------------------------
+# Index maintenance
+# ---------------------------------------------------------------------------
+
+def build_topic_entries(topic, entry_model=None):
+    """
+    Build (unsaved) search entries for a topic, one per language.
+
+    Args:
+        topic: Topic instance (or historical model instance in migrations)
+        entry_model: SearchEntry model class (defaults to the current model)
+    """
+    if entry_model is None:
+        from .models import SearchEntry as entry_model
+
+    category = topic.category if topic.category_id else None
+    entries = []
+    for lang in LANGUAGE_CODES:
+        body = ' '.join(filter(None, [
+            html_to_text(localized_value(topic, 'short_description', lang)),
+            html_to_text(localized_value(topic, 'full_description', lang)),
+        ]))
+        entries.append(entry_model(
+            kind='topic',
+            object_id=topic.pk,
+            language=lang,
+            title=localized_value(topic, 'title', lang),
+            body=body,
+            slug=localized_value(topic, 'slug', lang),
+            category_id=topic.category_id,
+            category_slug=localized_value(category, 'slug', lang) if category else '',
+        ))
+    return entries
+
+
+def build_category_entries(category, entry_model=None):
+    """Build (unsaved) search entries for a category, one per language"""
+    if entry_model is None:
+        from .models import SearchEntry as entry_model
+
+    return [
+        entry_model(
+            kind='category',
+            object_id=category.pk,
+            language=lang,
+            title=localized_value(category, 'name', lang),
+            body='',
+            slug=localized_value(category, 'slug', lang),
+            category_id=category.pk,
+            category_slug=localized_value(category, 'slug', lang),
+        )
+        for lang in LANGUAGE_CODES
+    ]
+
+
+def index_topic(topic):
+    """Rewrite the search entries of a topic (called from Topic.save)"""
+    from .models import SearchEntry
+
+    SearchEntry.objects.filter(kind='topic', object_id=topic.pk).delete()
+    SearchEntry.objects.bulk_create(build_topic_entries(topic))
+
+
+def index_category(category):
+    """
+    Rewrite the search entries of a category (called from Category.save).
+    Topic entries in the category store the category slug for building URLs,
+    so they are updated too.
+    """
+    from .models import SearchEntry
+
+    SearchEntry.objects.filter(kind='category', object_id=category.pk).delete()
+    entries = build_category_entries(category)
+    SearchEntry.objects.bulk_create(entries)
+
+    for entry in entries:
+        SearchEntry.objects.filter(
+            kind='topic', category_id=category.pk, language=entry.language
+        ).exclude(category_slug=entry.category_slug).update(category_slug=entry.category_slug)
+
+
+def remove_from_index(kind, object_id):
+    """Remove all entries of a deleted topic or category"""
+    from .models import SearchEntry
+
+    SearchEntry.objects.filter(kind=kind, object_id=object_id).delete()
+    if kind == 'category':
+        # Topics are kept (SET_NULL) but no longer have a category URL
+        SearchEntry.objects.filter(kind='topic', category_id=object_id).update(
+            category_id=None, category_slug=''
+        )
+
+
+def rebuild_index():
+    """Rebuild the whole index from scratch. Returns the number of entries written."""
+    from .models import SearchEntry, Topic, Category
+
+    SearchEntry.objects.all().delete()
+    count = 0
+    for category in Category.objects.all():
+        entries = build_category_entries(category)
+        SearchEntry.objects.bulk_create(entries)
+        count += len(entries)
+
+    batch = []
+    for topic in Topic.objects.select_related('category').iterator(chunk_size=200):
+        batch.extend(build_topic_entries(topic))
+        if len(batch) >= 600:
+            SearchEntry.objects.bulk_create(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        SearchEntry.objects.bulk_create(batch)
+        count += len(batch)
+    return count
+
+
+# ---------------------------------------------------------------------------
+# Querying
+# ---------------------------------------------------------------------------
+
+def _sqlite_has_fts():
+    global _sqlite_fts_available
+    if _sqlite_fts_available is None:
+        _sqlite_fts_available = FTS_TABLE in connection.introspection.table_names()
+    return _sqlite_fts_available
+
+
+def _render_marked(text):
+    """Escape text from the database and turn highlight markers into <mark> tags"""
+    return str(escape(text)).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def _highlight_python(text, terms, max_words=None):
+    """
+    Highlight terms in text without database support.
+    Used by the fallback backend. Optionally cuts a snippet around the first match.
+    """
+    if not text:
+        return ''
+    if max_words:
+        words = text.split(' ')
+        lowered = [w.lower() for w in words]
+        start = 0
+        for i, word in enumerate(lowered):
+            if any(term.lower() in word for term in terms):
+                start = max(0, i - max_words // 3)
+                break
+        snippet = ' '.join(words[start:start + max_words])
+        if start > 0:
+            snippet = '… ' + snippet
+        if start + max_words < len(words):
+            snippet += ' …'
+        text = snippet
+    if terms:
+        pattern = re.compile('|'.join(re.escape(t) for t in terms), re.IGNORECASE)
+        text = pattern.sub(lambda m: f'{MARK_START}{m.group(0)}{MARK_END}', text)
+    return text
+
+
+def _search_postgresql(terms, lang, kinds, limit):
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    headline_title = f'StartSel={MARK_START}, StopSel={MARK_END}, HighlightAll=true'
+    headline_body = f'StartSel={MARK_START}, StopSel={MARK_END}, MaxWords={SNIPPET_WORDS}, MinWords=10'
+    sql = """
+        SELECT e.id, ts_rank_cd(e.search_vector, q) AS rank,
+               ts_headline('simple', e.title, q, %s),
+               ts_headline('simple', e.body, q, %s)
+        FROM topics_searchentry e, to_tsquery('simple', %s) q
+        WHERE e.language = %s AND e.kind IN %s AND e.search_vector @@ q
+        ORDER BY rank DESC, e.id DESC
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [headline_title, headline_body, tsquery, lang, tuple(kinds), limit])
+        return [(row[0], row[2], row[3]) for row in cursor.fetchall()]
+
+
+def _search_sqlite(terms, lang, kinds, limit):
+    # Each term is quoted and used as a prefix query: "geopol"* "balk"*
+    match = ' '.join('"{}"*'.format(term.replace('"', '')) for term in terms)
+    placeholders = ', '.join(['%s'] * len(kinds))
+    sql = f"""
+        SELECT e.id,
+               highlight({FTS_TABLE}, 0, %s, %s),
+               snippet({FTS_TABLE}, 1, %s, %s, '…', %s)
+        FROM {FTS_TABLE}
+        JOIN topics_searchentry e ON e.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH %s AND e.language = %s AND e.kind IN ({placeholders})
+        ORDER BY bm25({FTS_TABLE}, 10.0, 1.0), e.id DESC
+        LIMIT %s
+    """
+    params = [MARK_START, MARK_END, MARK_START, MARK_END, SNIPPET_WORDS, match, lang, *kinds, limit]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(row[0], row[1], row[2]) for row in cursor.fetchall()]
+
+
+def _search_fallback(terms, lang, kinds, limit):
+    from django.db.models import Case, IntegerField, Q, When
+    from .models import SearchEntry
+
+    queryset = SearchEntry.objects.filter(language=lang, kind__in=kinds)
+    title_match = Q()
+    for term in terms:
+        queryset = queryset.filter(Q(title__icontains=term) | Q(body__icontains=term))
+        title_match &= Q(title__icontains=term)
+    queryset = queryset.annotate(
+        title_rank=Case(When(title_match, then=0), default=1, output_field=IntegerField())
+    ).order_by('title_rank', '-id')[:limit]
+    return [
+        (entry.id, _highlight_python(entry.title, terms), _highlight_python(entry.body, terms, SNIPPET_WORDS))
+        for entry in queryset
+    ]
+
+
+def search(query, lang, kinds=('topic', 'category'), limit=10):
+    """
+    Search the index for the given language.
+
+    Args:
+        query: Raw user input
+        lang: Language code of the results
+        kinds: Entry kinds to include ('topic', 'category')
+        limit: Maximum number of results
+
+    Returns:
+        List of dicts ordered by relevance with 'kind', 'object_id', 'title',
+        'slug', 'category_slug', and HTML-safe 'title_html' / 'snippet_html'
+        where matches are wrapped in <mark> tags.
+    """
+    from .models import SearchEntry
+
+    terms = query_terms(query)
+    if not terms:
+        return []
+    lang = normalize_language(lang)
+
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        rows = _search_postgresql(terms, lang, kinds, limit)
+    elif vendor == 'sqlite' and _sqlite_has_fts():
+        rows = _search_sqlite(terms, lang, kinds, limit)
+    else:
+        rows = _search_fallback(terms, lang, kinds, limit)
+
+    if not rows:
+        return []
+
+    entries = SearchEntry.objects.only(
+        'kind', 'object_id', 'title', 'slug', 'category_slug'
+    ).in_bulk([row[0] for row in rows])
+
+    results = []
+    for entry_id, title_marked, snippet_marked in rows:
+        entry = entries.get(entry_id)
+        if entry is None:
+            continue
+        results.append({
+            'kind': entry.kind,
+            'object_id': entry.object_id,
+            'title': entry.title,
+            'slug': entry.slug,
+            'category_slug': entry.category_slug,
+            'title_html': _render_marked(title_marked or entry.title),
+            'snippet_html': _render_marked(snippet_marked or ''),
+        })
+    return results
+
+
+def search_object_ids(query, kind='topic', languages=LANGUAGE_CODES, limit=500):
+    """Return ids of matching objects in any of the given languages (used by the admin)"""
+    ids = []
+    for lang in languages:
+        for result in search(query, lang, kinds=(kind,), limit=limit):
+            if result['object_id'] not in ids:
+                ids.append(result['object_id'])
+    return ids
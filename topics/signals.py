@@ -0,0 +1,38 @@
+"""
+Signal handlers for topics app.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .cards import touch_categories
+from .models import Category, Topic
+from .navigation import invalidate_navigation
+from .page_cache import purge_all, purge_deleted_topic
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_navigation_on_category_change(sender, instance, **kwargs):
+    """
+    Rebuild the cached navigation when a category is saved, deleted or reordered.
+    Runs after commit so no process can cache the old rows in between.
+    """
+    transaction.on_commit(invalidate_navigation)
+
+
+@receiver(post_delete, sender=Category)
+def purge_pages_on_category_delete(sender, instance, **kwargs):
+    """A removed category disappears from the navigation of every page"""
+    purge_all()
+
+
+@receiver(pre_delete, sender=Topic)
+def purge_pages_on_topic_delete(sender, instance, **kwargs):
+    """Collect the topic's URLs before its routes are deleted with it"""
+    purge_deleted_topic(instance.pk)
+
+
+@receiver(post_delete, sender=Topic)
+def touch_category_on_topic_delete(sender, instance, **kwargs):
+    """The topic disappears from its category's listing"""
+    touch_categories(instance.category_id)
@@ -0,0 +1,17 @@
+"""
+Background tasks of the topics app (see core.jobs).
+"""
+from core.circuit_breaker import storage_breaker
+from core.jobs import task
+
+
+@task('topics.render_topic_html', concurrency=2)
+def render_topic_html(topic_id):
+    """Render a topic's description HTML with image dimensions read from storage (see core.body_html)"""
+    from .translations import render_description_html
+
+    # Not check(): the probe after an outage is the first storage read in the rendering
+    storage_breaker.raise_if_open()  # Postponed while the storage is down
+    render_description_html(topic_id)
+    # Images skipped because the storage went down meanwhile are rendered on the next run
+    storage_breaker.raise_if_open()
@@ -1,3 +1,845 @@
-from django.test import TestCase
+import re
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
+from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from . import navigation, search as search_module
+from .cards import EXCERPT_WORDS, rebuild_cards
+from .models import Category, SlugRoute, Topic, TopicCard, TopicTranslation
+from .pagination import decode_cursor, encode_cursor, keyset_page
+from .search import search
+from .translations import get_topic_translation, rebuild_translations
 
-# Create your tests here.
+
+@override_settings(JOBS_RUN_EAGERLY=False)
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Biljke', name_en='Plants')
+        cls.body_match = Topic.objects.create(
+            title='Zalivanje', category=cls.category,
+            full_description='<p>Bosiljak voli vodu.</p>',
+        )
+        cls.title_match = Topic.objects.create(
+            title='Bosiljak', title_en='Basil', category=cls.category,
+            full_description='<p>Aromatična biljka.</p>',
+        )
+        cls.uncategorized = Topic.objects.create(title='Bosiljak u saksiji')
+
+    def assertRanking(self):
+        results = [r for r in search('bosiljak', 'sr-latn') if r['kind'] == 'topic']
+        ids = [r['object_id'] for r in results]
+        self.assertEqual(set(ids), {self.title_match.pk, self.body_match.pk, self.uncategorized.pk})
+        # Matches in the title come before matches in the body only
+        self.assertEqual(ids[-1], self.body_match.pk)
+        self.assertIn('<mark>Bosiljak</mark>', results[-1]['snippet_html'])
+        self.assertIn('<mark>Bosiljak</mark>', results[0]['title_html'])
+
+    def test_title_matches_rank_first(self):
+        # The test database is set up by the migrations, FTS5 table included
+        self.assertTrue(search_module._sqlite_has_fts())
+        self.assertRanking()
+
+    def test_fallback_without_full_text_index(self):
+        with mock.patch.object(search_module, '_sqlite_has_fts', return_value=False):
+            self.assertRanking()
+
+    def test_language_fallback(self):
+        # English entries fall back to the Latin text where there is no translation
+        ids = [r['object_id'] for r in search('zalivanje', 'en', kinds=('topic',))]
+        self.assertEqual(ids, [self.body_match.pk])
+        titles = [r['title'] for r in search('basil', 'en', kinds=('topic',))]
+        self.assertEqual(titles, ['Basil'])
+
+    def test_updated_entries(self):
+        self.title_match.title = 'Origano'
+        self.title_match.save()
+        ids = [r['object_id'] for r in search('origano', 'sr-latn')]
+        self.assertEqual(ids, [self.title_match.pk])
+
+    def test_highlight_escapes_content(self):
+        topic = Topic.objects.create(
+            title='Paradajz', category=self.category,
+            full_description='<p>Paradajz &lt;script&gt; u bašti</p>',
+        )
+        result = search('paradajz', 'sr-latn', kinds=('topic',))[0]
+        self.assertEqual(result['object_id'], topic.pk)
+        self.assertNotIn('<script>', result['snippet_html'])
+
+    def test_short_queries(self):
+        response = self.client.get('/sr-latn/teme/pretraga/', {'q': 'b'})
+        self.assertEqual(response.json()['results'], [])
+
+    def test_endpoint(self):
+        response = self.client.get('/sr-latn/teme/pretraga/', {'q': 'bosiljak'})
+        results = response.json()['results']
+        urls = [r['url'] for r in results if r['type'] == 'topic']
+        self.assertEqual(urls[0], '/sr-latn/teme/biljke/bosiljak/')
+        # Topics without a category have no public URL
+        self.assertEqual(len(urls), 2)
+
+
+class ReservedSlugTests(TestCase):
+
+    def test_clean_rejects_reserved_slug(self):
+        category = Category(name='Pretraga', thumbnail='categories/x.jpg')
+        with self.assertRaises(ValidationError) as context:
+            category.full_clean()
+        self.assertIn('slug', context.exception.error_dict)
+
+    def test_save_renames_reserved_slug(self):
+        category = Category.objects.create(name='Pretraga', slug_en='pretraga')
+        self.assertEqual(category.slug, 'pretraga-2')
+        self.assertEqual(category.slug_en, 'pretraga-2')
+        response = self.client.get('/sr-latn/teme/pretraga/', {'q': 'pretraga'})
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_renamed_slug_skips_taken_suffixes(self):
+        Category.objects.create(name='Pretraga 2')
+        Category.objects.create(name='Pretraga 3', slug_en='pretraga-2')
+        category = Category.objects.create(name='Pretraga', slug_en='pretraga')
+        self.assertEqual(category.slug, 'pretraga-4')
+        self.assertEqual(category.slug_en, 'pretraga-3')
+        # Saving again keeps the category's own slug
+        category.slug = 'pretraga'
+        category.save()
+        self.assertEqual(category.slug, 'pretraga-4')
+
+
+@override_settings(JOBS_RUN_EAGERLY=False)
+class SlugRouteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Biljke', name_sr_cyrl='Биљке', name_en='Plants')
+        cls.topic = Topic.objects.create(
+            title='Bosiljak', title_sr_cyrl='Босиљак', title_en='Basil', category=cls.category,
+        )
+
+    def test_routes_per_language(self):
+        routes = SlugRoute.objects.filter(topic=self.topic, is_redirect=False)
+        keys = {(r.language, r.category_slug, r.topic_slug) for r in routes}
+        self.assertIn(('en', 'plants', 'basil'), keys)
+        self.assertIn(('en', 'biljke', 'bosiljak'), keys)
+        self.assertIn(('sr-latn', 'plants', 'basil'), keys)
+        self.assertNotIn(('sr-cyrl', 'plants', 'basil'), keys)
+
+    def test_live_routes(self):
+        self.assertEqual(self.client.get('/sr-latn/teme/biljke/bosiljak/').status_code, 200)
+        self.assertEqual(self.client.get('/en/topics/plants/basil/').status_code, 200)
+        self.assertEqual(self.client.get('/sr-latn/teme/biljke/nepostoji/').status_code, 404)
+
+    def test_renamed_topic_redirects(self):
+        self.topic.slug = 'bosiljak-zeleni'
+        self.topic.save()
+        response = self.client.get('/sr-latn/teme/biljke/bosiljak/')
+        self.assertRedirects(response, '/sr-latn/teme/biljke/bosiljak-zeleni/', status_code=301)
+        # Other languages keep their own canonical slugs
+        response = self.client.get('/en/topics/plants/bosiljak/')
+        self.assertRedirects(response, '/en/topics/plants/basil/', status_code=301)
+
+    def test_renamed_category_redirects_topics(self):
+        self.category.slug = 'bilje'
+        self.category.save()
+        response = self.client.get('/sr-latn/teme/biljke/')
+        self.assertRedirects(response, '/sr-latn/teme/bilje/', status_code=301)
+        response = self.client.get('/sr-latn/teme/biljke/bosiljak/')
+        self.assertRedirects(response, '/sr-latn/teme/bilje/bosiljak/', status_code=301)
+
+    def test_moved_topic_redirects(self):
+        other = Category.objects.create(name='Začini')
+        self.topic.category = other
+        self.topic.save()
+        response = self.client.get('/sr-latn/teme/biljke/bosiljak/')
+        self.assertRedirects(response, '/sr-latn/teme/zacini/bosiljak/', status_code=301)
+
+    def test_reused_slug_is_live_again(self):
+        self.topic.slug = 'bosiljak-zeleni'
+        self.topic.save()
+        other = Topic.objects.create(title='Bosiljak', slug='bosiljak', category=self.category)
+        route = SlugRoute.objects.get(language='sr-latn', category_slug='biljke', topic_slug='bosiljak')
+        self.assertFalse(route.is_redirect)
+        self.assertEqual(route.topic_id, other.pk)
+
+    def test_uncategorized_topic_has_no_routes(self):
+        self.topic.category = None
+        self.topic.save()
+        self.assertFalse(SlugRoute.objects.filter(topic=self.topic).exists())
+
+
+@override_settings(JOBS_RUN_EAGERLY=False)
+class NavigationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Biljke', name_en='Plants', order=2)
+
+    def setUp(self):
+        cache.clear()
+        navigation._local_cache.clear()
+
+    def test_items_per_language(self):
+        [item] = navigation.get_navigation('sr-latn')
+        self.assertEqual((item['name'], item['url']), ('Biljke', '/sr-latn/teme/biljke/'))
+        [item] = navigation.get_navigation('en')
+        self.assertEqual((item['name'], item['url']), ('Plants', '/en/topics/plants/'))
+
+    def test_built_once(self):
+        navigation.get_navigation('sr-latn')
+        with self.assertNumQueries(0):
+            navigation.get_navigation('sr-latn')
+        # Another process finds the list in the shared cache
+        navigation._local_cache.clear()
+        with self.assertNumQueries(0):
+            navigation.get_navigation('sr-latn')
+
+    def test_category_changes_rebuild_after_commit(self):
+        navigation.get_navigation('sr-latn')
+        version = navigation.navigation_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Začini', order=1)
+        self.assertNotEqual(navigation.navigation_version(), version)
+        self.assertEqual([item['slug'] for item in navigation.get_navigation('sr-latn')], ['zacini', 'biljke'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.order = 0
+            self.category.save()
+        self.assertEqual([item['slug'] for item in navigation.get_navigation('sr-latn')], ['biljke', 'zacini'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.delete()
+        self.assertEqual([item['slug'] for item in navigation.get_navigation('sr-latn')], ['zacini'])
+
+    def test_version_changed_by_another_process(self):
+        navigation.get_navigation('sr-latn')
+        Category.objects.filter(pk=self.category.pk).update(name='Bilje')
+        cache.set(navigation.VERSION_KEY, 'other')  # Local copies are kept until the token changes
+        self.assertEqual(navigation.get_navigation('sr-latn')[0]['name'], 'Bilje')
+
+
+@override_settings(JOBS_RUN_EAGERLY=False, PAGE_CACHE_ENABLED=True)
+class PageCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Biljke')
+        cls.other_category = Category.objects.create(name='Začini')
+        cls.sibling = Topic.objects.create(title='Nana', category=cls.category)
+        cls.topic = Topic.objects.create(title='Bosiljak', category=cls.category)
+        cls.other = Topic.objects.create(title='Biber', category=cls.other_category)
+
+    def setUp(self):
+        cache.clear()
+
+    def cache_state(self, *urls):
+        return [self.client.get(url)['X-Page-Cache'] for url in urls]
+
+    def test_anonymous_pages_are_served_from_cache(self):
+        urls = ['/sr-latn/', '/sr-latn/teme/', '/sr-latn/teme/biljke/', '/en/topics/biljke/bosiljak/', '/sr-latn/o-nama/']
+        for url in urls:
+            self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+        for url in urls:
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+            self.assertEqual(response['X-Page-Cache'], 'HIT')
+
+    def test_csrf_token_of_the_reader(self):
+        self.client.get('/sr-latn/teme/biljke/')
+        for _ in range(2):
+            reader = self.client_class(enforce_csrf_checks=True)
+            response = reader.get('/sr-latn/teme/biljke/')
+            self.assertEqual(response['X-Page-Cache'], 'HIT')
+            self.assertNotContains(response, '__CSRF_TOKEN__')
+            token = re.search(r'<meta name="csrf-token" content="(\w+)"', response.content.decode()).group(1)
+            # The served token is valid for the cookie this reader got
+            post = reader.post('/sr-latn/teme/biljke/', HTTP_X_CSRFTOKEN=token)
+            self.assertNotEqual(post.status_code, 403)
+
+    def test_only_anonymous_gets_are_cached(self):
+        self.client.get('/sr-latn/teme/biljke/')
+        self.assertNotIn('X-Page-Cache', self.client.get('/sr-latn/teme/biljke/', {'cursor': 'x'}))
+        self.client.cookies['messages'] = 'x'
+        self.assertNotIn('X-Page-Cache', self.client.get('/sr-latn/teme/biljke/'))
+
+    def test_topic_save_purges_its_pages(self):
+        topic_urls = ['/sr-latn/teme/biljke/bosiljak/', '/en/topics/biljke/bosiljak/', '/sr-latn/teme/biljke/nana/']
+        listing_urls = ['/sr-latn/', '/en/topics/', '/sr-latn/teme/biljke/']
+        other_urls = ['/sr-latn/teme/zacini/', '/sr-latn/teme/zacini/biber/']
+        self.cache_state(*topic_urls, *listing_urls, *other_urls)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.topic.title = 'Bosiljak zeleni'
+            self.topic.save()
+        # Its own pages, the sibling showing it as recent and the listings are purged
+        self.assertEqual(self.cache_state(*topic_urls, *listing_urls), ['MISS'] * 6)
+        self.assertEqual(self.cache_state(*other_urls), ['HIT', 'HIT'])
+
+    def test_siblings_outside_the_recent_block_are_kept(self):
+        for n in range(6):
+            Topic.objects.create(title=f'Tema {n}', category=self.category)
+        self.cache_state('/sr-latn/teme/biljke/tema-5/', '/sr-latn/teme/biljke/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sibling.title = 'Nana zelena'
+            self.sibling.save()
+        self.assertEqual(self.cache_state('/sr-latn/teme/biljke/tema-5/', '/sr-latn/teme/biljke/'), ['HIT', 'MISS'])
+
+    def test_moved_topic_purges_both_categories(self):
+        self.cache_state('/sr-latn/teme/zacini/', '/sr-latn/teme/zacini/biber/', '/sr-latn/teme/biljke/nana/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.topic.category = self.other_category
+            self.topic.save()
+        self.assertEqual(
+            self.cache_state('/sr-latn/teme/zacini/', '/sr-latn/teme/zacini/biber/', '/sr-latn/teme/biljke/nana/'),
+            ['MISS'] * 3,
+        )
+
+    def test_deleted_topic_is_purged(self):
+        self.cache_state('/sr-latn/teme/biljke/bosiljak/', '/sr-latn/teme/zacini/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.topic.delete()
+        self.assertEqual(self.client.get('/sr-latn/teme/biljke/bosiljak/').status_code, 404)
+        self.assertEqual(self.cache_state('/sr-latn/teme/zacini/'), ['HIT'])
+
+    def test_category_save_clears_every_page(self):
+        from core import page_cache
+
+        self.cache_state('/sr-latn/teme/zacini/biber/', '/en/')
+        key = page_cache.page_key('/en/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name_en = 'Plants'
+            self.category.save()
+        # A new generation token: no old key is read again
+        self.assertNotEqual(page_cache.page_key('/en/'), key)
+        self.assertEqual(self.cache_state('/sr-latn/teme/zacini/biber/', '/en/'), ['MISS', 'MISS'])
+
+
+@override_settings(JOBS_RUN_EAGERLY=False, PAGE_CACHE_ENABLED=True)
+class ConditionalPageTests(TestCase):
+    category_url = '/sr-latn/teme/biljke/'
+    topic_url = '/sr-latn/teme/biljke/bosiljak/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Biljke')
+        cls.topic = Topic.objects.create(title='Bosiljak', category=cls.category)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_page_answers_304_without_queries(self):
+        for url in (self.category_url, self.topic_url):
+            response = self.client.get(url)
+            self.assertEqual(response['X-Page-Cache'], 'MISS')
+            etag = response['ETag']
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            # Hits and misses carry the same validators
+            self.assertEqual(self.client.get(url)['ETag'], etag)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(self.topic_url)['Last-Modified']
+        response = self.client.get(self.topic_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changed_topic_gets_new_etag(self):
+        etags = [self.client.get(url)['ETag'] for url in (self.category_url, self.topic_url)]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.topic.title = 'Bosiljak zeleni'
+            self.topic.save()
+        for url, etag in zip((self.category_url, self.topic_url), etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            self.assertContains(response, 'Bosiljak zeleni')
+
+    def test_unchanged_content_after_purge(self):
+        etag = self.client.get(self.topic_url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.topic.save()  # Nothing changed - nothing purged
+        self.assertEqual(self.client.get(self.topic_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        cache.clear()
+        # The page is rendered again but its content is the same
+        response = self.client.get(self.topic_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_readers_with_session_use_view_validators(self):
+        session = self.client.session
+        session['seen'] = True
+        session.save()
+        response = self.client.get(self.category_url)
+        self.assertNotIn('X-Page-Cache', response)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.category_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # A new topic in the category changes the listing
+        Topic.objects.create(title='Nana', category=self.category)
+        self.assertEqual(self.client.get(self.category_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_topic_changes_touch_categories(self):
+        other = Category.objects.create(name='Začini')
+        before = {c.pk: c.updated_at for c in Category.objects.all()}
+        self.topic.category = other
+        self.topic.save()
+        after = {c.pk: c.updated_at for c in Category.objects.all()}
+        self.assertGreater(after[self.category.pk], before[self.category.pk])
+        self.assertGreater(after[other.pk], before[other.pk])
+        self.topic.delete()
+        self.assertGreater(Category.objects.get(pk=other.pk).updated_at, after[other.pk])
+
+
+@override_settings(JOBS_RUN_EAGERLY=False)
+class TopicCardTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Biljke', name_en='Plants')
+        cls.topic = Topic.objects.create(
+            title='Bosiljak', title_en='Basil', category=cls.category, thumbnail='topics/thumbnails/b.jpg',
+            short_description='<p>Aromatična <strong>biljka</strong> ' + 'reč ' * 40 + '</p>',
+        )
+
+    def card(self, lang):
+        return TopicCard.objects.get(topic=self.topic, language=lang)
+
+    def test_card_per_language(self):
+        self.assertEqual(TopicCard.objects.filter(topic=self.topic).count(), 3)
+        card = self.card('en')
+        self.assertEqual((card.title, card.slug, card.category_slug), ('Basil', 'basil', 'plants'))
+        self.assertEqual(card.created_at, self.topic.created_at)
+        self.assertTrue(card.thumbnail_url.endswith('topics/thumbnails/b.jpg'))
+        # No English description: falls back to the Latin one, as plain text
+        self.assertTrue(card.excerpt.startswith('Aromatična biljka reč'))
+        self.assertEqual(len(card.excerpt.split()), EXCERPT_WORDS)
+        self.assertEqual((self.card('sr-latn').title, self.card('sr-latn').category_slug), ('Bosiljak', 'biljke'))
+
+    def test_saves_update_cards_in_place(self):
+        card_id = self.card('en').pk
+        self.topic.title_en = 'Sweet basil'
+        self.topic.save()
+        self.assertEqual(self.card('en').pk, card_id)
+        self.assertEqual(self.card('en').title, 'Sweet basil')
+
+        self.topic.category = None
+        self.topic.save()
+        self.assertEqual(self.card('en').category_slug, '')
+
+    def test_category_slug_changes(self):
+        self.category.slug_en = 'herbs'
+        self.category.save()
+        self.assertEqual(self.card('en').category_slug, 'herbs')
+        self.assertEqual(self.card('sr-latn').category_slug, 'biljke')
+
+    def test_deleted_topic_loses_its_cards(self):
+        self.topic.delete()
+        self.assertFalse(TopicCard.objects.exists())
+
+    def test_rebuild(self):
+        TopicCard.objects.all().delete()
+        self.assertEqual(rebuild_cards(), 3)
+        self.assertEqual(self.card('en').title, 'Basil')
+
+    def test_listing_shows_cards(self):
+        TopicCard.objects.filter(topic=self.topic, language='en').update(title='Iz kartice')
+        response = self.client.get('/en/topics/plants/')
+        self.assertContains(response, 'Iz kartice')
+        self.assertContains(response, '/en/topics/plants/basil/')
+
+
+@override_settings(JOBS_RUN_EAGERLY=False)
+class TopicTranslationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Biljke')
+        cls.topic = Topic.objects.create(
+            title='Bosiljak', title_sr_cyrl='Босиљак', category=cls.category,
+            meta_description='Opis', full_description='<p>Latinica</p>',
+            full_description_en='<p>English text</p>',
+        )
+
+    def row(self, lang):
+        return TopicTranslation.objects.get(topic=self.topic, language=lang)
+
+    def test_rows_with_resolved_fallbacks(self):
+        self.assertEqual(TopicTranslation.objects.filter(topic=self.topic).count(), 3)
+        cyrl, en = self.row('sr-cyrl'), self.row('en')
+        self.assertEqual((cyrl.title, cyrl.slug, cyrl.meta_title), ('Босиљак', 'bosiljak', 'Босиљак'))
+        self.assertEqual((en.title, en.meta_title, en.meta_description), ('Bosiljak', 'Bosiljak', 'Opis'))
+        self.assertEqual(en.full_description, '<p>English text</p>')
+        self.assertEqual(cyrl.full_description, '<p>Latinica</p>')
+        self.assertEqual(en.full_description_html, '<p>English text</p>')
+
+    def test_saves_update_rows(self):
+        self.topic.title_en = 'Basil'
+        self.topic.full_description = '<p>Nova</p>'
+        self.topic.save()
+        self.assertEqual((self.row('en').title, self.row('en').meta_title), ('Basil', 'Basil'))
+        self.assertEqual(self.row('sr-cyrl').full_description, '<p>Nova</p>')
+        self.assertEqual(self.row('en').full_description, '<p>English text</p>')
+
+    def test_missing_rows_are_rebuilt(self):
+        TopicTranslation.objects.filter(topic=self.topic).delete()
+        self.assertEqual(get_topic_translation(self.topic.pk, 'sr-Latn').title, 'Bosiljak')
+        self.assertEqual(TopicTranslation.objects.filter(topic=self.topic).count(), 3)
+
+    def test_rebuild(self):
+        TopicTranslation.objects.all().delete()
+        self.assertEqual(rebuild_translations(), 3)
+
+    def test_topic_page_reads_the_row(self):
+        TopicTranslation.objects.filter(topic=self.topic, language='en').update(
+            full_description_html='<p>Iz prevoda</p>',
+        )
+        response = self.client.get('/en/topics/biljke/bosiljak/')
+        self.assertContains(response, 'Iz prevoda')
+        self.assertNotContains(response, 'English text')
+
+    def test_deleted_topic_loses_its_rows(self):
+        self.topic.delete()
+        self.assertFalse(TopicTranslation.objects.exists())
+
+
+@override_settings(JOBS_RUN_EAGERLY=False, TOPICS_PAGE_SIZE=2)
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Biljke')
+        now = timezone.now()
+        cls.topics = []
+        for i in range(5):
+            topic = Topic.objects.create(title=f'Tema {i}', category=cls.category)
+            cls.topics.append(topic)
+        # Two topics share a timestamp: the id breaks the tie
+        created = [now - timedelta(hours=3), now - timedelta(hours=2), now - timedelta(hours=2),
+                   now - timedelta(hours=1), now]
+        for topic, created_at in zip(cls.topics, created):
+            Topic.objects.filter(pk=topic.pk).update(created_at=created_at)
+            TopicCard.objects.filter(topic=topic).update(created_at=created_at)
+
+    def collect(self, queryset, **kwargs):
+        seen, cursor = [], None
+        while True:
+            items, cursor = keyset_page(queryset, cursor, **kwargs)
+            seen.append([item.pk for item in items])
+            if cursor is None:
+                return seen
+
+    def test_pages_cover_every_row_once(self):
+        pages = self.collect(Topic.objects.all())
+        expected = [t.pk for t in reversed(self.topics)]
+        self.assertEqual([pk for page in pages for pk in page], expected)
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+
+    def test_rows_added_between_pages(self):
+        items, cursor = keyset_page(Topic.objects.all())
+        Topic.objects.create(title='Nova', category=self.category)
+        items, _ = keyset_page(Topic.objects.all(), cursor)
+        self.assertEqual([t.pk for t in items], [self.topics[2].pk, self.topics[1].pk])
+
+    def test_cursor_round_trip(self):
+        topic = Topic.objects.get(pk=self.topics[1].pk)
+        cursor = encode_cursor(topic.created_at, topic.pk)
+        self.assertEqual(decode_cursor(cursor), (topic.created_at, topic.pk))
+        for invalid in ('', None, 'nije-kursor', 'w6k'):
+            self.assertIsNone(decode_cursor(invalid))
+
+    def test_invalid_cursor_starts_over(self):
+        items, _ = keyset_page(Topic.objects.all(), 'nije-kursor')
+        self.assertEqual(items[0].pk, self.topics[-1].pk)
+
+    def test_category_listing(self):
+        data = self.client.get('/sr-latn/teme/biljke/', {'partial': 1}).json()
+        links = re.findall(r'/sr-latn/teme/biljke/([\w-]+)/', data['html'])
+        while data['next_url']:
+            data = self.client.get(data['next_url'] + '&partial=1').json()
+            links += re.findall(r'/sr-latn/teme/biljke/([\w-]+)/', data['html'])
+        self.assertEqual(links, [t.slug for t in reversed(self.topics)])
+
+
+@override_settings(JOBS_RUN_EAGERLY=False)
+class DirtyFieldsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Biljke')
+        cls.topic = Topic.objects.create(
+            title='Bosiljak', category=cls.category, thumbnail='topics/bosiljak.jpg',
+            full_description='<p>Aromatična biljka.</p>',
+        )
+
+    def test_new_objects_are_dirty(self):
+        topic = Topic(title='Nova')
+        self.assertIn('title', topic.get_dirty_fields())
+        self.assertIsNone(topic.get_previous_instance())
+
+    def test_loaded_objects_are_clean(self):
+        topic = Topic.objects.get(pk=self.topic.pk)
+        self.assertEqual(topic.get_dirty_fields(), set())
+        topic.title = 'Origano'
+        topic.category = None
+        self.assertEqual(topic.get_dirty_fields(), {'title', 'category'})
+        self.assertTrue(topic.has_changed('category'))
+        self.assertFalse(topic.has_changed('thumbnail'))
+
+    def test_same_value_is_not_a_change(self):
+        topic = Topic.objects.get(pk=self.topic.pk)
+        topic.title = 'Bosiljak'
+        topic.thumbnail = 'topics/bosiljak.jpg'
+        self.assertEqual(topic.get_dirty_fields(), set())
+
+    def test_json_changed_in_place(self):
+        topic = Topic.objects.get(pk=self.topic.pk)
+        topic.thumbnail_derivatives['webp'] = {'400': 'topics/bosiljak-400.webp'}
+        self.assertEqual(topic.get_dirty_fields(), {'thumbnail_derivatives'})
+
+    def test_snapshot_after_save(self):
+        topic = Topic.objects.get(pk=self.topic.pk)
+        topic.title = 'Origano'
+        topic.save()
+        self.assertEqual(topic.get_dirty_fields(), set())
+        topic.title = 'Majoran'
+        topic.meta_title = 'Majoran'
+        topic.save(update_fields=['title'])
+        # Fields left out of update_fields are still unsaved
+        self.assertEqual(topic.get_dirty_fields(), {'meta_title'})
+
+    def test_deferred_fields(self):
+        topic = Topic.objects.defer('full_description').get(pk=self.topic.pk)
+        self.assertEqual(topic.get_dirty_fields(), set())
+        topic.full_description = '<p>Novi opis.</p>'
+        self.assertEqual(topic.get_dirty_fields(), {'full_description'})
+        previous = topic.get_previous_instance()
+        self.assertEqual(previous.full_description, '<p>Aromatična biljka.</p>')
+        self.assertEqual(previous.title, 'Bosiljak')
+
+    def test_refresh_from_db(self):
+        topic = Topic.objects.get(pk=self.topic.pk)
+        Topic.objects.filter(pk=topic.pk).update(title='Origano')
+        topic.refresh_from_db()
+        self.assertEqual(topic.get_dirty_fields(), set())
+
+    def test_unchanged_save_skips_derived_work(self):
+        topic = Topic.objects.get(pk=self.topic.pk)
+        with mock.patch('topics.models.sync_topic_translations') as translations, \
+                mock.patch('topics.models.sync_topic_routes') as routes, \
+                mock.patch('topics.models.sync_image_references') as references:
+            topic.save()
+            topic.category = None
+            topic.save()
+        translations.assert_not_called()
+        references.assert_not_called()
+        routes.assert_called_once_with(topic)
+
+    def test_category_rename_syncs_routes_once(self):
+        category = Category.objects.get(pk=self.category.pk)
+        with mock.patch('topics.models.sync_category_routes') as routes:
+            category.order = 3
+            category.save()
+            routes.assert_not_called()
+            category.name_en = 'Plants'
+            category.save()
+            routes.assert_called_once_with(category)
+
+
+def image_bytes(size=(40, 30)):
+    from io import BytesIO
+    from PIL import Image
+
+    output = BytesIO()
+    Image.new('RGB', size, 'white').save(output, 'PNG')
+    return output.getvalue()
+
+
+class TempMediaMixin:
+    """Local media storage in a temporary directory, and an empty cache"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+
+@override_settings(JOBS_RUN_EAGERLY=False, PAGE_CACHE_ENABLED=True)
+class RenderDescriptionTests(TempMediaMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        default_storage.save('uploads/slika.png', ContentFile(image_bytes()))
+        self.category = Category.objects.create(name='Biljke')
+
+    def create_topic(self):
+        return Topic.objects.create(
+            title='Bosiljak', category=self.category,
+            full_description='<p><img src="/media/uploads/slika.png"><img src="/media/uploads/slika.png"></p>',
+        )
+
+    def rendered(self, topic):
+        from .models import TopicTranslation
+        return TopicTranslation.objects.get(topic=topic, language='sr-latn').full_description_html
+
+    def test_save_doesnt_read_storage(self):
+        from core.models import Job
+
+        topic = self.create_topic()
+        html = self.rendered(topic)
+        # Dimensions aren't cached yet: rendered without them, and a job reads them
+        self.assertNotIn('width=', html)
+        self.assertIn('decoding="async"', html)
+        self.assertIn('srcset="', html)
+        job = Job.objects.get(name='topics.render_topic_html')
+        self.assertEqual(job.payload, {'topic_id': topic.pk})
+
+    def test_job_renders_dimensions_and_purges_pages(self):
+        from core.jobs import claim_jobs, run_job
+
+        topic = self.create_topic()
+        url = '/sr-latn/teme/biljke/bosiljak/'
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'HIT')
+        updated_at = topic.updated_at
+
+        [job] = claim_jobs('worker-1', 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(run_job(job))
+        html = self.rendered(topic)
+        self.assertIn('width="40" height="30"', html)
+        # Only the images after the first are lazy
+        self.assertEqual(html.count('loading="lazy"'), 1)
+        topic.refresh_from_db()
+        self.assertGreater(topic.updated_at, updated_at)
+
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'width="40" height="30"')
+
+        # Later saves use the cached dimensions and queue nothing
+        topic.title = 'Bosiljak zeleni'
+        topic.save()
+        self.assertIn('width="40" height="30"', self.rendered(topic))
+        self.assertEqual(claim_jobs('worker-1', 10), [])
+
+    def test_editor_attributes_are_kept(self):
+        from core.body_html import render_body_html
+
+        html = render_body_html('<img src="/media/uploads/slika.png" width="10" height="5" loading="eager">')
+        self.assertIn('width="10" height="5"', html)
+        self.assertNotIn('width="40"', html)
+        self.assertNotIn('loading="lazy"', html)
+        self.assertEqual(render_body_html('<p>Bez slika</p>'), '<p>Bez slika</p>')
+
+    def test_job_waits_for_the_storage(self):
+        from core.circuit_breaker import CircuitBreaker
+        from core.jobs import claim_jobs, run_job
+        from core.models import Job
+
+        topic = self.create_topic()
+        breaker = CircuitBreaker('test', failures=1, reset_seconds=0.05)
+        with self.assertRaises(ConnectionError):
+            breaker.call(mock.Mock(side_effect=ConnectionError))
+
+        with mock.patch('topics.tasks.storage_breaker', breaker), \
+                mock.patch('core.circuit_breaker.storage_breaker', breaker):
+            [job] = claim_jobs('worker-1', 10)
+            self.assertFalse(run_job(job))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.PENDING, 0))
+            self.assertNotIn('width=', self.rendered(topic))
+
+            # After the reset time the rendering's first read is the probe, and closes the breaker
+            time.sleep(0.06)
+            Job.objects.filter(pk=job.pk).update(run_at=job.created_at)
+            [job] = claim_jobs('worker-1', 10)
+            self.assertTrue(run_job(job))
+        self.assertEqual(breaker.state, breaker.CLOSED)
+        self.assertIn('width="40" height="30"', self.rendered(topic))
+
+
+@override_settings(JOBS_RUN_EAGERLY=False, PAGE_CACHE_ENABLED=True, THUMBNAIL_WIDTHS=(160, 320, 1024))
+class ThumbnailDerivativeTests(TempMediaMixin, TestCase):
+
+    def create_category(self):
+        category = Category(name='Biljke')
+        category.thumbnail.save('biljke.png', ContentFile(image_bytes((800, 600))), save=False)
+        category.save()
+        return category
+
+    def run_jobs(self):
+        from core.jobs import claim_jobs, run_job
+
+        with self.captureOnCommitCallbacks(execute=True):
+            return [run_job(job) for job in claim_jobs('worker-1', 10)]
+
+    def test_generate_derivatives(self):
+        from core.thumbnails import derivative_srcsets, derivative_url, generate_derivatives, output_formats
+
+        default_storage.save('topics/thumbnails/a.png', ContentFile(image_bytes((800, 600))))
+        derivatives = generate_derivatives('topics/thumbnails/a.png')
+        self.assertEqual((derivatives['width'], derivatives['height']), (800, 600))
+        # Widths under the source, plus the source width (it is below the largest width)
+        widths = sorted({variant['width'] for variant in derivatives['variants']})
+        self.assertEqual(widths, [160, 320, 800])
+        self.assertEqual(len(derivatives['variants']), 3 * len(output_formats()))
+        small = next(v for v in derivatives['variants'] if v['width'] == 160 and v['format'] == 'webp')
+        self.assertEqual(small['name'], 'topics/thumbnails/a.160w.webp')
+        self.assertEqual(small['height'], 120)
+        self.assertTrue(default_storage.exists(small['name']))
+
+        self.assertEqual(derivative_url(derivatives, 200), '/media/topics/thumbnails/a.320w.webp')
+        self.assertEqual(derivative_url(derivatives, 2000, 'fallback'), 'fallback')
+        content_type, srcset = derivative_srcsets(derivatives)[-1]
+        self.assertEqual(content_type, 'image/webp')
+        self.assertTrue(srcset.startswith('/media/topics/thumbnails/a.160w.webp 160w, '))
+
+        # A retried job only writes what is missing
+        with mock.patch.object(default_storage, 'save') as save:
+            self.assertEqual(generate_derivatives('topics/thumbnails/a.png'), derivatives)
+        save.assert_not_called()
+
+    def test_job_updates_navigation_and_pages(self):
+        from core import page_cache
+        from .navigation import get_navigation, navigation_version
+
+        category = self.create_category()
+        self.assertEqual(category.thumbnail_derivatives, {})
+        self.assertEqual(get_navigation('sr-latn')[0]['thumbnail_derivatives'], {})
+        version, generation = navigation_version(), page_cache._generation()
+        updated_at = category.updated_at
+
+        self.assertEqual(self.run_jobs(), [True])
+        category.refresh_from_db()
+        self.assertEqual(category.thumbnail_derivatives['source'], category.thumbnail.name)
+        self.assertGreater(category.updated_at, updated_at)
+        # Both live in the cache the web service reads (see CACHES in settings)
+        self.assertNotEqual(navigation_version(), version)
+        self.assertNotEqual(page_cache._generation(), generation)
+        self.assertEqual(get_navigation('sr-latn')[0]['thumbnail_derivatives'], category.thumbnail_derivatives)
+
+    def test_replaced_thumbnail(self):
+        from core.jobs import claim_jobs, run_job
+
+        category = self.create_category()
+        [stale] = claim_jobs('worker-1', 10)
+        category.thumbnail.save('nova.png', ContentFile(image_bytes((300, 200))), save=False)
+        category.save()
+
+        # The job of the old thumbnail records nothing, the new one has its own job
+        self.assertTrue(run_job(stale))
+        category.refresh_from_db()
+        self.assertEqual(category.thumbnail_derivatives, {})
+        self.assertEqual(self.run_jobs(), [True])
+        category.refresh_from_db()
+        self.assertEqual(category.thumbnail_derivatives['width'], 300)
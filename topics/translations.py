@@ -0,0 +1,146 @@
+"""
+Per-language translation rows for topics.
+
+Topic keeps every language side by side in its own columns, which is what the
+admin edits. Reading a topic page only ever needs one language, so each
+Topic also has one TopicTranslation row per language with the fallbacks
+already resolved (an empty English title falls back to the Latin one, an
+empty meta title to the title, ...). Rows are rebuilt in Topic.save and the
+topic page loads the row for the active language while the description
+columns of the Topic row stay deferred.
+
+The full description is also stored render-ready (full_description_html, see
+core.body_html): lazy images with intrinsic dimensions and srcset, prepared
+here once instead of on every request. Topic.save only uses image dimensions
+that are already cached; when some are missing, the topics.render_topic_html
+job reads them from storage and renders the description again.
+"""
+from django.utils import timezone
+from core.body_html import render_body_html
+from .languages import LANGUAGE_CODES, TOPIC_TRANSLATED_FIELDS, localized_value, normalize_language
+
+# Topic columns that readers only need through the translation row
+DEFERRED_TOPIC_FIELDS = (
+    'meta_title', 'meta_description', 'short_description', 'full_description',
+)
+
+
+def build_topic_translations(topic, translation_model=None, fetch=True, missing=None):
+    """
+    Build (unsaved) translation rows for a topic, one per language.
+
+    Args:
+        topic: Topic instance
+        translation_model: TopicTranslation model class (defaults to the current model)
+        fetch: Read image dimensions that aren't cached from storage (see render_body_html)
+        missing: Optional list receiving image paths rendered without dimensions
+    """
+    if translation_model is None:
+        from .models import TopicTranslation as translation_model
+
+    translations = []
+    for lang in LANGUAGE_CODES:
+        title = localized_value(topic, 'title', lang)
+        full_description = localized_value(topic, 'full_description', lang)
+        translations.append(translation_model(
+            topic_id=topic.pk,
+            language=lang,
+            title=title,
+            slug=localized_value(topic, 'slug', lang),
+            meta_title=localized_value(topic, 'meta_title', lang) or title,
+            meta_description=localized_value(topic, 'meta_description', lang),
+            short_description=localized_value(topic, 'short_description', lang),
+            full_description=full_description,
+            full_description_html=render_body_html(full_description, fetch=fetch, missing=missing),
+        ))
+    return translations
+
+
+def sync_topic_translations(topic, translation_model=None):
+    """
+    Rebuild the translation rows of a topic (called from Topic.save).
+    Storage isn't read here: images without cached dimensions are left to the
+    topics.render_topic_html job.
+    """
+    from core.jobs import enqueue
+
+    if translation_model is None:
+        from .models import TopicTranslation as translation_model
+
+    missing = []
+    for row in build_topic_translations(topic, translation_model, fetch=False, missing=missing):
+        translation_model.objects.update_or_create(
+            topic_id=row.topic_id,
+            language=row.language,
+            defaults={field: getattr(row, field) for field in TOPIC_TRANSLATED_FIELDS + ('full_description_html',)},
+        )
+    if missing:
+        enqueue('topics.render_topic_html', topic_id=topic.pk)
+
+
+def render_description_html(topic_id):
+    """
+    Render the description HTML of a topic's translation rows again, reading
+    image dimensions from storage (the topics.render_topic_html job).
+
+    Returns:
+        True if any row changed (the topic's updated_at is bumped and its pages
+        purged - in the cache shared with the web service, see CACHES in settings)
+    """
+    from .models import Topic, TopicTranslation
+    from .page_cache import purge_topic
+
+    topic = Topic.objects.filter(pk=topic_id).first()
+    if topic is None:
+        return False
+
+    changed = False
+    for lang in LANGUAGE_CODES:
+        html = render_body_html(localized_value(topic, 'full_description', lang))
+        changed |= bool(
+            TopicTranslation.objects.filter(topic_id=topic_id, language=lang)
+            .exclude(full_description_html=html)
+            .update(full_description_html=html, updated_at=timezone.now())
+        )
+    if changed:
+        # New validators for conditional GETs (see topics.views)
+        Topic.objects.filter(pk=topic_id).update(updated_at=timezone.now())
+        purge_topic(topic_id)
+    return changed
+
+
+def get_topic_translation(topic_id, lang):
+    """
+    Load the translation row of a topic for a language.
+    Rebuilds the rows if they are missing (e.g. content written outside Topic.save).
+    """
+    from .models import Topic, TopicTranslation
+
+    lang = normalize_language(lang)
+    row = TopicTranslation.objects.filter(topic_id=topic_id, language=lang).first()
+    if row is None:
+        sync_topic_translations(Topic.objects.get(pk=topic_id))
+        row = TopicTranslation.objects.get(topic_id=topic_id, language=lang)
+    return row
+
+
+def rebuild_translations(topic_model=None, translation_model=None):
+    """Rebuild the translation rows of every topic. Returns the number of rows written."""
+    if topic_model is None:
+        from .models import Topic as topic_model
+    if translation_model is None:
+        from .models import TopicTranslation as translation_model
+
+    translation_model.objects.all().delete()
+    count = 0
+    batch = []
+    for topic in topic_model.objects.iterator(chunk_size=100):
+        batch.extend(build_topic_translations(topic, translation_model))
+        if len(batch) >= 300:
+            translation_model.objects.bulk_create(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        translation_model.objects.bulk_create(batch)
+        count += len(batch)
+    return count
@@ -5,6 +5,8 @@ app_name = 'topics'
 
 urlpatterns = [
     path('', views.category_list, name='category_list'),
+    # Must come before the category slug pattern
+    path('pretraga/', views.search, name='search'),
     path('<slug:slug>/', views.category_detail, name='category_detail'),
     path('<slug:category_slug>/<slug:slug>/', views.topic_detail, name='topic_detail'),
 ]
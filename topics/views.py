@@ -1,30 +1,65 @@
-from django.shortcuts import render, get_object_or_404
-from django.db.models import Q
+from urllib.parse import urlencode
+from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
+from django.http import Http404, JsonResponse
 from django.utils import translation
-from .models import Topic, Category
+from django.views.decorators.http import require_GET
+from core.conditional import conditional_page, static_page_validators
+from core.page_cache import cache_public_page
+from core.thumbnails import derivative_url
+from .languages import normalize_language
+from .models import Category, TopicCard
+from .pagination import keyset_page
+from .routing import resolve_category, resolve_topic, canonical_slugs
+from .search import search as search_index
+from .translations import get_topic_translation
 
 
+def _category_route(request, slug):
+    """Resolve a category URL once per request (shared by validators and view)"""
+    if not hasattr(request, '_slug_route'):
+        request._slug_route = resolve_category(translation.get_language(), slug)
+    return request._slug_route
+
+
+def _topic_route(request, category_slug, slug):
+    """Resolve a topic URL once per request (shared by validators and view)"""
+    if not hasattr(request, '_slug_route'):
+        request._slug_route = resolve_topic(translation.get_language(), category_slug, slug)
+    return request._slug_route
+
+
+def category_detail_validators(request, slug):
+    """
+    Category page depends on the category and the topics listed in it.
+    Topic changes that show up in the listing bump category.updated_at
+    (see touch_categories), so the category row alone versions the page.
+    """
+    route = _category_route(request, slug)
+    if route is None or route.is_redirect:
+        return None
+    category = route.category
+    return (category.pk, category.updated_at), category.updated_at
+
+
+def topic_detail_validators(request, category_slug, slug):
+    """
+    Topic page depends on the topic, its category and the recent topics block.
+    The recent topics are covered by category.updated_at (see touch_categories).
+    """
+    route = _topic_route(request, category_slug, slug)
+    if route is None or route.is_redirect:
+        return None
+    topic = route.topic
+    category = topic.category
+    parts = (topic.pk, topic.updated_at, category.pk, category.updated_at)
+    return parts, max(topic.updated_at, category.updated_at)
+
+
+@cache_public_page
+@conditional_page(static_page_validators)
 def category_list(request):
-    """Category list view with language-aware base path handling"""
-    from django.utils import translation
-    from django.shortcuts import redirect
-    from django.urls import reverse
-    
-    lang = translation.get_language()
-    # Check if wrong base path was accessed
-    current_path = request.path
-    
-    # If on English and accessing /teme/ base, redirect to /topics/
-    if lang == 'en' and '/teme/' in current_path:
-        # Construct URL with correct base path
-        correct_url = current_path.replace('/teme/', '/topics/', 1)
-        return redirect(correct_url)
-    # If on Serbian (Latin/Cyrillic) and accessing /topics/ base, redirect to /teme/
-    elif lang in ('sr-latn', 'sr-cyrl') and '/topics/' in current_path:
-        # Construct URL with correct base path
-        correct_url = current_path.replace('/topics/', '/teme/', 1)
-        return redirect(correct_url)
-    
+    """Category list view"""
     categories = Category.objects.all().order_by('order', 'name')
     context = {
         'categories': categories,
@@ -32,69 +67,130 @@ def category_list(request):
     return render(request, 'topics/category_list.html', context)
 
 
+@cache_public_page
+@conditional_page(category_detail_validators)
 def category_detail(request, slug):
-    # Look up category by any of the three slugs
+    # Resolve the category through the slug routing index (one indexed lookup)
     from django.utils import translation
     lang = translation.get_language()
     
-    if lang == 'sr-cyrl':
-        category = get_object_or_404(
-            Category.objects.filter(Q(slug_sr_cyrl=slug) | Q(slug=slug))
-        )
-    elif lang == 'en':
-        category = get_object_or_404(
-            Category.objects.filter(Q(slug_en=slug) | Q(slug=slug))
-        )
-    else:
-        category = get_object_or_404(
-            Category.objects.filter(Q(slug=slug) | Q(slug_sr_cyrl=slug) | Q(slug_en=slug))
-        )
+    route = _category_route(request, slug)
+    if route is None:
+        raise Http404
+    if route.is_redirect:
+        return _redirect_to_canonical(route, lang)
     
-    topics = category.topics.all()
+    category = route.category
+    
+    # Keyset pagination over the precomputed cards (no description columns)
+    topics, next_cursor = keyset_page(
+        TopicCard.objects.filter(language=normalize_language(lang), category=category),
+        request.GET.get('cursor'),
+        id_field='topic_id',
+    )
+    next_url = f"{request.path}?{urlencode({'cursor': next_cursor})}" if next_cursor else ''
     context = {
         'category': category,
         'topics': topics,
+        'next_url': next_url,
     }
+    
+    # Incremental loading: return only the new cards
+    if request.GET.get('partial'):
+        html = render_to_string('topics/_topic_cards.html', context, request=request)
+        return JsonResponse({'html': html, 'next_url': next_url})
+    
     return render(request, 'topics/category_detail.html', context)
 
 
+@cache_public_page
+@conditional_page(topic_detail_validators)
 def topic_detail(request, category_slug, slug):
-    # Look up category by any of the three slugs
+    # Resolve category and topic through the slug routing index (one indexed lookup)
     from django.utils import translation
     lang = translation.get_language()
     
-    if lang == 'sr-cyrl':
-        category = get_object_or_404(
-            Category.objects.filter(Q(slug_sr_cyrl=category_slug) | Q(slug=category_slug))
-        )
-    elif lang == 'en':
-        category = get_object_or_404(
-            Category.objects.filter(Q(slug_en=category_slug) | Q(slug=category_slug))
-        )
-    else:
-        category = get_object_or_404(
-            Category.objects.filter(Q(slug=category_slug) | Q(slug_sr_cyrl=category_slug) | Q(slug_en=category_slug))
-        )
+    route = _topic_route(request, category_slug, slug)
+    if route is None:
+        raise Http404
+    if route.is_redirect:
+        return _redirect_to_canonical(route, lang)
     
-    # Look up topic by any of the three slugs
-    if lang == 'sr-cyrl':
-        topic = get_object_or_404(
-            Topic.objects.filter(Q(slug_sr_cyrl=slug) | Q(slug=slug), category=category)
-        )
-    elif lang == 'en':
-        topic = get_object_or_404(
-            Topic.objects.filter(Q(slug_en=slug) | Q(slug=slug), category=category)
-        )
-    else:
-        topic = get_object_or_404(
-            Topic.objects.filter(Q(slug=slug) | Q(slug_sr_cyrl=slug) | Q(slug_en=slug), category=category)
-        )
+    topic = route.topic
+    category = topic.category
+    
+    # Title, meta and descriptions for the active language only
+    content = get_topic_translation(topic.pk, lang)
     
-    recent_topics = Topic.objects.filter(category=category).exclude(id=topic.id)[:5]
+    recent_topics = TopicCard.objects.filter(
+        language=normalize_language(lang), category=category
+    ).exclude(topic_id=topic.id).order_by('-created_at', '-topic_id')[:5]
     
     context = {
         'category': category,
         'topic': topic,
+        'content': content,
         'recent_topics': recent_topics,
     }
     return render(request, 'topics/topic_detail.html', context)
+
+
+def _redirect_to_canonical(route, lang):
+    """Permanent redirect from an old slug to the current URL"""
+    from core.templatetags.core_urls import lang_url
+    
+    category_slug, topic_slug = canonical_slugs(route, lang)
+    if topic_slug:
+        url = lang_url({}, 'topics:topic_detail', category_slug, topic_slug)
+    else:
+        url = lang_url({}, 'topics:category_detail', category_slug)
+    return redirect(url, permanent=True)
+
+
+@require_GET
+def search(request):
+    """
+    JSON search endpoint for the header search overlay.
+    Searches the precomputed index in the active language and returns
+    ranked results with highlighted title and snippet HTML.
+    """
+    from core.templatetags.core_urls import lang_url
+    
+    query = request.GET.get('q', '').strip()
+    if len(query) < 2:
+        return JsonResponse({'query': query, 'results': []})
+    
+    lang = normalize_language(translation.get_language())
+    matches = search_index(query, lang, limit=10)
+    
+    # Topic URLs and thumbnails come from the listing cards
+    topic_ids = [match['object_id'] for match in matches if match['kind'] == 'topic']
+    cards = {
+        card.topic_id: card
+        for card in TopicCard.objects.filter(language=lang, topic_id__in=topic_ids).only(
+            'topic_id', 'slug', 'category_slug', 'thumbnail_url', 'thumbnail_derivatives'
+        )
+    }
+    
+    results = []
+    for match in matches:
+        if match['kind'] == 'topic':
+            card = cards.get(match['object_id'])
+            # Topics without a category have no public URL
+            if card is None or not card.category_slug:
+                continue
+            url = lang_url({}, 'topics:topic_detail', card.category_slug, card.slug)
+            # Search results show 60px thumbnails - the smallest derivative is plenty
+            thumbnail_url = derivative_url(card.thumbnail_derivatives, 120, card.thumbnail_url)
+        else:
+            url = lang_url({}, 'topics:category_detail', match['slug'])
+            thumbnail_url = ''
+        results.append({
+            'type': match['kind'],
+            'url': url,
+            'title': match['title_html'],
+            'snippet': match['snippet_html'],
+            'thumbnail': thumbnail_url,
+        })
+    
+    return JsonResponse({'query': query, 'results': results})